@@ -0,0 +1,47 @@
+import pytest
+
+pytest.importorskip("PIL")
+
+import zmxTOOL_Screenshot_Recorder as recorder
+
+
+def feed(encoder, size, frames, start=0):
+    for i in range(start, start + frames):
+        encoder.record(size, timestamp=float(i), codec="jpeg")
+
+
+def test_quality_and_scale_stay_within_bounds_under_pressure():
+    encoder = recorder.AdaptiveEncoder(75, 1.0, budget_mb_per_hour=1, allow_downscale=True)
+    feed(encoder, 10 * 1024 * 1024, 500)
+    assert encoder.quality == recorder.ADAPTIVE_MIN_QUALITY
+    assert encoder.scale_index == len(recorder.ADAPTIVE_SCALES) - 1
+
+
+def test_quality_recovers_but_never_exceeds_base_quality():
+    for base in (20, 75):
+        encoder = recorder.AdaptiveEncoder(base, 1.0, budget_mb_per_hour=1, allow_downscale=True)
+        feed(encoder, 10 * 1024 * 1024, 500)
+        feed(encoder, 1, 2000, start=500)
+        assert encoder.quality == base
+        assert encoder.scale_index == 0
+
+
+def test_without_downscale_scale_is_untouched():
+    encoder = recorder.AdaptiveEncoder(75, 1.0, budget_mb_per_hour=1, allow_downscale=False)
+    feed(encoder, 10 * 1024 * 1024, 500)
+    assert encoder.scale_index == 0
+    assert encoder.quality == recorder.ADAPTIVE_MIN_QUALITY
+
+
+def test_png_frames_are_not_budgeted():
+    encoder = recorder.AdaptiveEncoder(75, 1.0, budget_mb_per_hour=1)
+    for i in range(100):
+        encoder.record(10 * 1024 * 1024, timestamp=float(i), codec="png")
+    assert not encoder.history
+    assert encoder.quality == 75
+
+
+def test_no_budget_keeps_base_quality():
+    encoder = recorder.AdaptiveEncoder(60, 1.0)
+    feed(encoder, 10 * 1024 * 1024, 200)
+    assert encoder.quality == 60
@@ -0,0 +1,146 @@
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+
+import pytest
+
+import zmxTOOL_Screenshot_Recorder as recorder
+
+
+def test_parse_control_arguments():
+    assert recorder.parse_control_arguments(["status"]) == {"cmd": "status"}
+    assert recorder.parse_control_arguments(["set", "interval=2", "sensitivity=5.5"]) == {
+        "cmd": "set", "interval": 2, "sensitivity": 5.5}
+    assert recorder.parse_control_arguments(["session", "name=Demo"]) == {"cmd": "session", "name": "Demo"}
+    assert recorder.parse_control_arguments(["session", "name=a=b"]) == {"cmd": "session", "name": "a=b"}
+
+
+def test_parse_control_arguments_needs_key_value():
+    with pytest.raises(ValueError):
+        recorder.parse_control_arguments(["set", "interval"])
+
+
+def test_parse_control_address_tcp():
+    assert recorder.parse_control_address("127.0.0.1:47820") == (socket.AF_INET, ("127.0.0.1", 47820))
+    assert recorder.parse_control_address(":5000") == (socket.AF_INET, ("127.0.0.1", 5000))
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs Unix sockets")
+def test_parse_control_address_unix():
+    assert recorder.parse_control_address("/tmp/zmx.sock") == (socket.AF_UNIX, "/tmp/zmx.sock")
+    assert recorder.parse_control_address("/tmp/dir:1/zmx.sock") == (socket.AF_UNIX, "/tmp/dir:1/zmx.sock")
+
+
+unix_only = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs Unix sockets")
+
+
+@pytest.fixture
+def socket_path():
+    # pytest's tmp_path can exceed the ~100 character limit on Unix socket paths.
+    folder = tempfile.mkdtemp(prefix="zmx")
+    yield os.path.join(folder, "control.sock")
+    shutil.rmtree(folder, ignore_errors=True)
+
+
+@pytest.fixture
+def server(socket_path):
+    counter = {"captured": 0}
+    lock = threading.Lock()
+
+    def stats(request):
+        with lock:
+            counter["captured"] += 5
+            return {"ok": True, "captured": counter["captured"], "running": True}
+
+    def fail(request):
+        raise RuntimeError("boom")
+
+    server = recorder.ControlServer(socket_path, {"stats": stats, "fail": fail})
+    yield server
+    server.close()
+
+
+def call(address, *requests):
+    """Sends raw request lines and returns one decoded reply per line."""
+    with recorder.connect_control(address, timeout=5) as sock, sock.makefile("rwb") as stream:
+        replies = []
+        for request in requests:
+            stream.write(request + b"\n")
+            stream.flush()
+            replies.append(json.loads(stream.readline()))
+        return replies
+
+
+@unix_only
+def test_round_trip(server, socket_path):
+    stats, bad_json, not_object, unknown, failed = call(
+        socket_path, b'{"cmd": "stats"}', b"{oops", b'["stats"]', b'{"cmd": "reboot"}', b'{"cmd": "fail"}')
+    assert stats == {"ok": True, "captured": 5, "running": True}
+    assert not bad_json["ok"] and bad_json["error"].startswith("Bad request")
+    assert not not_object["ok"] and "cmd" in not_object["error"]
+    assert unknown == {"ok": False, "error": "Unknown command 'reboot'.", "commands": ["fail", "stats", "stream"]}
+    assert failed == {"ok": False, "error": "boom"}
+    assert os.stat(socket_path).st_mode & 0o777 == 0o600
+
+
+@unix_only
+def test_stream_reports_rates(server, socket_path):
+    with recorder.connect_control(socket_path, timeout=5) as sock, sock.makefile("rwb") as stream:
+        stream.write(b'{"cmd": "stream", "interval": 0.1}\n')
+        stream.flush()
+        first, second = json.loads(stream.readline()), json.loads(stream.readline())
+    assert "captured_per_sec" not in first
+    assert second["captured"] == first["captured"] + 5
+    assert second["captured_per_sec"] > 0
+
+
+@unix_only
+def test_stream_rejects_bad_interval(server, socket_path):
+    assert call(socket_path, b'{"cmd": "stream", "interval": "soon"}')[0]["ok"] is False
+
+
+@unix_only
+def test_second_server_is_refused(server, socket_path):
+    with pytest.raises(OSError):
+        recorder.ControlServer(socket_path, {})
+    # The running server is untouched.
+    assert call(socket_path, b'{"cmd": "stats"}')[0]["ok"]
+
+
+@unix_only
+def test_stale_socket_is_replaced(socket_path):
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(socket_path)
+    stale.close()
+    server = recorder.ControlServer(socket_path, {"stats": lambda request: {"ok": True}})
+    try:
+        assert call(socket_path, b'{"cmd": "stats"}') == [{"ok": True}]
+    finally:
+        server.close()
+    assert not os.path.exists(socket_path)
+
+
+@unix_only
+def test_refuses_to_replace_other_files(socket_path):
+    with open(socket_path, "w") as f:
+        f.write("keep me")
+    with pytest.raises(OSError):
+        recorder.ControlServer(socket_path, {})
+    with open(socket_path) as f:
+        assert f.read() == "keep me"
+
+
+def test_tcp_server_only_listens_on_localhost():
+    with pytest.raises(ValueError):
+        recorder.ControlServer("0.0.0.0:0", {})
+
+
+@unix_only
+def test_control_client(server, socket_path, capsys):
+    assert recorder.run_control_client(["stats"], socket_path) == 0
+    assert json.loads(capsys.readouterr().out) == {"ok": True, "captured": 5, "running": True}
+    assert recorder.run_control_client(["reboot"], socket_path) == 1
+    assert recorder.run_control_client(["stats"], socket_path + ".missing") == 2
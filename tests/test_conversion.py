@@ -0,0 +1,106 @@
+import json
+import os
+
+import pytest
+
+import zmxTOOL_Screenshot_Recorder as recorder
+
+
+@pytest.fixture
+def scheduler(tmp_path, monkeypatch):
+    # Jobs stay "running" without doing any work, so only the dispatch decisions are tested.
+    monkeypatch.setattr(recorder.ConversionScheduler, "run_job", lambda self, job: None)
+    return recorder.ConversionScheduler(str(tmp_path / recorder.CONVERSION_JOBS_FILENAME), max_concurrent=2)
+
+
+def make_job(tmp_path, session, output=None, priority=0):
+    return recorder.ConversionJob(str(tmp_path / session), session, str(tmp_path / (output or f"{session}.mp4")),
+                                  fps=10, resolution="320x240", priority=priority)
+
+
+def states(scheduler):
+    return {job.session: job.state for job in scheduler.jobs.values()}
+
+
+def test_dispatch_respects_limit_and_priority(tmp_path, scheduler):
+    scheduler.max_concurrent = 0  # hold everything back while queuing
+    scheduler.closing = True
+    for session, priority in (("A", 0), ("B", 0), ("C", 5)):
+        scheduler.submit(make_job(tmp_path, session, priority=priority))
+    scheduler.closing = False
+    scheduler.set_max_concurrent(2)
+    assert states(scheduler) == {"A": "running", "B": "queued", "C": "running"}
+    assert [job.session for job in scheduler.sorted_jobs()] == ["C", "A", "B"]
+
+
+def test_same_session_or_output_runs_one_at_a_time(tmp_path, scheduler):
+    first = scheduler.submit(make_job(tmp_path, "A"))
+    same_session = scheduler.submit(make_job(tmp_path, "A", output="other.mp4"))
+    same_output = scheduler.submit(make_job(tmp_path, "B", output="A.mp4"))
+    assert (first.state, same_session.state, same_output.state) == ("running", "queued", "queued")
+    with scheduler.lock:
+        first.state = "done"
+    scheduler.dispatch()
+    assert (same_session.state, same_output.state) == ("running", "running")
+
+
+def test_output_path_avoids_unfinished_jobs(tmp_path, scheduler):
+    scheduler.submit(make_job(tmp_path, "A"))
+    (tmp_path / "A_2.mp4").write_bytes(b"")
+    assert scheduler.output_path(str(tmp_path / "A.mp4")) == str(tmp_path / "A_3.mp4")
+    assert scheduler.output_path(str(tmp_path / "B.mp4")) == str(tmp_path / "B.mp4")
+
+
+def test_jobs_persist_and_resume(tmp_path, scheduler):
+    running = scheduler.submit(make_job(tmp_path, "A"))
+    queued = scheduler.submit(make_job(tmp_path, "A", output="A2.mp4"))
+    cancelled = scheduler.submit(make_job(tmp_path, "A", output="A3.mp4", priority=3))
+    scheduler.cancel(queued.job_id)
+    assert queued.state == "cancelled"
+    scheduler.resume(queued.job_id)
+    assert queued.state == "queued"
+    scheduler.cancel(cancelled.job_id)
+    scheduler.shutdown()
+    assert running.state == "queued" and running.cancel_event.is_set()
+
+    with open(scheduler.state_path) as f:
+        saved = json.load(f)
+    assert [job["job_id"] for job in saved] == [cancelled.job_id, running.job_id, queued.job_id]
+    reloaded = recorder.ConversionScheduler(scheduler.state_path)
+    assert {job_id: job.state for job_id, job in reloaded.jobs.items()} == {
+        running.job_id: "queued", queued.job_id: "queued", cancelled.job_id: "cancelled"}
+    assert reloaded.jobs[cancelled.job_id].output_file == cancelled.output_file
+
+
+def test_remove_deletes_prepared_frames(tmp_path, scheduler):
+    job = scheduler.submit(make_job(tmp_path, "A"))
+    os.makedirs(job.work_dir)
+    scheduler.remove(job.job_id)
+    assert job.job_id in scheduler.jobs  # running jobs are kept
+    scheduler.cancel(job.job_id)
+    with scheduler.lock:
+        job.state = "cancelled"
+    scheduler.remove(job.job_id)
+    assert job.job_id not in scheduler.jobs
+    assert not os.path.exists(job.work_dir)
+
+
+def test_prepared_frames_are_reused_until_the_source_changes(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    session_folder = tmp_path / "S"
+    session_folder.mkdir()
+    for n in range(1, 4):
+        Image.new("RGB", (64, 48), (n * 60, 0, 0)).save(session_folder / f"S_{n:06d}.jpeg")
+    job = recorder.ConversionJob(str(session_folder), "S", str(tmp_path / "S.mp4"), 10, "32x24", job_id=1)
+    assert recorder.prepare_conversion_frames(job) == 3
+    prepared = ["frame_000001.jpeg", "frame_000002.jpeg", "frame_000003.jpeg"]
+    assert set(os.listdir(job.work_dir)) == {recorder.CONVERSION_MANIFEST, *prepared}
+    with Image.open(os.path.join(job.work_dir, "frame_000001.jpeg")) as img:
+        assert img.size == (32, 24)
+
+    mtimes = {name: os.stat(os.path.join(job.work_dir, name)).st_mtime_ns for name in prepared}
+    os.utime(session_folder / "S_000002.jpeg", (1.0, 1.0))
+    assert recorder.prepare_conversion_frames(job) == 3
+    for name in ("frame_000001.jpeg", "frame_000003.jpeg"):
+        assert os.stat(os.path.join(job.work_dir, name)).st_mtime_ns == mtimes[name]
+    assert os.stat(os.path.join(job.work_dir, "frame_000002.jpeg")).st_mtime_ns != mtimes["frame_000002.jpeg"]
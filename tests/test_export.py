@@ -0,0 +1,69 @@
+import os
+from datetime import datetime
+
+import pytest
+
+import zmxTOOL_Screenshot_Recorder as recorder
+
+
+@pytest.fixture
+def session(tmp_path):
+    """Frames 1-4 packed at t=100..130 and frames 5-6 as files at t=140, 150; metadata for 1-4 only."""
+    writer = recorder.PackedFrameWriter(str(tmp_path), "S")
+    for n in range(1, 5):
+        writer.append(n, b"frame", timestamp=90.0 + 10 * n)
+    writer.close()
+    for n in (5, 6):
+        path = tmp_path / f"S_{n:06d}.jpeg"
+        path.write_bytes(b"frame")
+        os.utime(path, (90.0 + 10 * n, 90.0 + 10 * n))
+    with recorder.FrameMetadataStore(str(tmp_path)) as store:
+        store.add(frame=1, captured_at=100.0, diff_ratio=0.01, trigger="image")
+        store.add(frame=2, captured_at=110.0, diff_ratio=0.20, trigger="input")
+        store.add(frame=3, captured_at=120.0, diff_ratio=0.05, trigger="image+input")
+        store.add(frame=4, captured_at=130.0, diff_ratio=0.50, trigger="timer")
+    with recorder.SessionFrameReader(str(tmp_path), "S") as frames:
+        yield frames, str(tmp_path)
+
+
+def test_frame_range(session):
+    frames, folder = session
+    assert recorder.resolve_frame_selection(frames, folder) == [1, 2, 3, 4, 5, 6]
+    assert recorder.resolve_frame_selection(frames, folder, first_frame=3, last_frame=5) == [3, 4, 5]
+
+
+def test_time_range_falls_back_to_frame_timestamps(session):
+    frames, folder = session
+    assert recorder.resolve_frame_selection(frames, folder, start=110.0, end=150.0) == [2, 3, 4, 5]
+
+
+def test_filters_need_a_metadata_row(session):
+    frames, folder = session
+    assert recorder.resolve_frame_selection(frames, folder, min_diff=0.05) == [2, 4]
+    assert recorder.resolve_frame_selection(frames, folder, triggers=["input", "image+input"]) == [2, 3]
+
+
+def test_filters_without_metadata_are_refused(tmp_path):
+    (tmp_path / "S_000001.jpeg").write_bytes(b"frame")
+    frames = recorder.SessionFrameReader(str(tmp_path), "S")
+    assert recorder.resolve_frame_selection(frames, str(tmp_path), start=0.0) == [1]
+    with pytest.raises(ValueError):
+        recorder.resolve_frame_selection(frames, str(tmp_path), min_diff=0.1)
+
+
+def test_text_times_use_the_first_frame_date(session):
+    frames, folder = session
+    reference = datetime(2024, 5, 6, 12, 0).timestamp()
+    assert recorder.parse_time_bound("13:30", reference) == datetime(2024, 5, 6, 13, 30).timestamp()
+    assert recorder.parse_time_bound("2024-05-07 08:00", reference) == datetime(2024, 5, 7, 8, 0).timestamp()
+    with pytest.raises(ValueError):
+        recorder.parse_time_bound("noon", reference)
+    selection = {"start": datetime.fromtimestamp(105.0).strftime("%Y-%m-%d %H:%M:%S"),
+                 "end": datetime.fromtimestamp(125.0).strftime("%H:%M:%S")}
+    assert recorder.select_conversion_frames(frames, folder, selection) == [2, 3]
+
+
+def test_describe_selection():
+    assert recorder.describe_selection(None) == "all frames"
+    assert recorder.describe_selection({"first_frame": 5, "min_diff": 0.02, "triggers": ["input"]}) == (
+        "frames 5-end, diff > 2%, input only")
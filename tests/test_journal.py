@@ -0,0 +1,119 @@
+import os
+import time
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+import zmxTOOL_Screenshot_Recorder as recorder
+
+
+def write_frame(path, codec="jpeg"):
+    with open(path, "wb") as f:
+        f.write(recorder.encode_image(Image.new("RGB", (16, 16), (255, 0, 0)), codec))
+
+
+def test_journal_reads_newest_complete_commit(tmp_path):
+    journal = recorder.FrameJournal(str(tmp_path))
+    assert journal.read() is None
+    journal.commit(5, 5)
+    journal.commit(9, 8)
+    with open(journal.path, "a") as f:
+        f.write("commit 12 11")  # torn by a crash
+    assert recorder.FrameJournal(str(tmp_path)).read() == (9, 8)
+
+
+def test_journal_compacts_and_adjusts(tmp_path, monkeypatch):
+    monkeypatch.setattr(recorder, "JOURNAL_COMPACT_LINES", 3)
+    journal = recorder.FrameJournal(str(tmp_path))
+    for n in range(1, 8):
+        journal.commit(n, n)
+    with open(journal.path) as f:
+        assert len(f.readlines()) <= 3
+    journal.adjust_frames(-2)
+    assert journal.read() == (7, 5)
+
+
+@pytest.mark.parametrize("codec", ["jpeg", "png", "webp"])
+def test_frame_file_complete(tmp_path, codec):
+    if not recorder.codec_available(codec):
+        pytest.skip(f"{codec} is not supported by this Pillow")
+    path = str(tmp_path / f"frame.{codec}")
+    write_frame(path, codec)
+    assert recorder.frame_file_complete(path)
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 5)
+    assert not recorder.frame_file_complete(path)
+
+
+def test_frame_file_complete_rejects_unknown_data(tmp_path):
+    path = tmp_path / "frame.jpeg"
+    path.write_bytes(b"not an image")
+    assert not recorder.frame_file_complete(str(path))
+    assert not recorder.frame_file_complete(str(tmp_path / "missing.jpeg"))
+
+
+def test_recover_uncommitted_frames(tmp_path):
+    folder = str(tmp_path)
+    write_frame(os.path.join(folder, "S_000003.jpeg"))
+    write_frame(os.path.join(folder, "S_000004.jpeg.tmp"))
+    write_frame(os.path.join(folder, "S_000005.jpeg"))
+    with open(os.path.join(folder, "S_000005.jpeg"), "r+b") as f:
+        f.truncate(20)
+
+    assert recorder.recover_uncommitted_frames(folder, "S", 2, 2) == (4, 4)
+    assert os.path.exists(os.path.join(folder, "S_000004.jpeg"))
+    assert os.listdir(os.path.join(folder, recorder.QUARANTINE_FOLDER)) == ["S_000005.jpeg"]
+
+
+def test_quarantine_keeps_earlier_files(tmp_path):
+    folder = str(tmp_path)
+    for _ in range(2):
+        with open(os.path.join(folder, "S_000001.jpeg"), "wb") as f:
+            f.write(b"\xff\xd8partial")
+        assert recorder.recover_uncommitted_frames(folder, "S", 0, 0) == (0, 0)
+    assert sorted(os.listdir(os.path.join(folder, recorder.QUARANTINE_FOLDER))) == ["S_000001.jpeg", "S_000001_2.jpeg"]
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_group_commit_by_frame_count(tmp_path):
+    synced = []
+    committer = recorder.GroupCommitter(str(tmp_path), every_frames=3, every_ms=0,
+                                        sync_pack=lambda: synced.append(True))
+    for n in range(1, 4):
+        path = str(tmp_path / f"S_{n:06d}.jpeg")
+        write_frame(path)
+        committer.add(n, n, path)
+    wait_for(lambda: committer.commits == 1)
+    assert committer.journal.read() == (3, 3)
+    assert synced == [True]
+    committer.add(4, 4)
+    committer.close()
+    assert committer.commits == 2
+    assert committer.journal.read() == (4, 4)
+
+
+def test_group_commit_by_time(tmp_path):
+    committer = recorder.GroupCommitter(str(tmp_path), every_frames=0, every_ms=50)
+    try:
+        committer.add(1, 1)
+        wait_for(lambda: committer.commits == 1)
+        assert committer.journal.read() == (1, 1)
+    finally:
+        committer.close()
+
+
+def test_group_commit_keeps_frame_count_for_live_video(tmp_path):
+    recorder.FrameJournal(str(tmp_path)).commit(10, 7)
+    committer = recorder.GroupCommitter(str(tmp_path), every_frames=0, every_ms=0)
+    committer.add(11)
+    committer.add(12)
+    committer.close()
+    assert committer.commits == 1
+    assert committer.journal.read() == (12, 7)
@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import zmxTOOL_Screenshot_Recorder as recorder
+
+
+@pytest.fixture
+def fake_module(tmp_path, monkeypatch):
+    (tmp_path / "zmx_lazy_probe.py").write_text("VALUE = 42\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "zmx_lazy_probe", raising=False)
+    yield "zmx_lazy_probe"
+    sys.modules.pop("zmx_lazy_probe", None)
+
+
+def test_imports_on_first_use(fake_module):
+    module = recorder.LazyModule(fake_module)
+    assert fake_module not in sys.modules
+    assert module.VALUE == 42
+    assert fake_module in sys.modules
+
+
+def test_missing_optional_module_is_falsy_and_tried_once(monkeypatch):
+    attempts = []
+    real_import = recorder.importlib.import_module
+
+    def import_module(name):
+        attempts.append(name)
+        return real_import(name)
+
+    monkeypatch.setattr(recorder.importlib, "import_module", import_module)
+    module = recorder.LazyModule("zmx_no_such_module", optional=True)
+    assert not module
+    assert not module
+    assert attempts == ["zmx_no_such_module"]
+    with pytest.raises(ImportError):
+        module.anything
+
+
+def test_present_optional_module_is_truthy(fake_module):
+    module = recorder.LazyModule(fake_module, optional=True)
+    assert module
+    assert module.VALUE == 42
+
+
+def test_required_module_is_truthy_without_importing(fake_module):
+    assert recorder.LazyModule(fake_module)
+    assert fake_module not in sys.modules
+
+
+def test_startup_defers_heavy_imports():
+    code = ("import sys, zmxTOOL_Screenshot_Recorder; "
+            "print(sorted(m for m in ('PIL', 'mss', 'psutil', 'pynput') if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(recorder.__file__),
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
@@ -0,0 +1,58 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+import zmxTOOL_Screenshot_Recorder as recorder
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs FFmpeg")
+
+
+def write_segment(folder, index, size="64x48", rate=5):
+    path = recorder.live_segment_path(str(folder), "S", index)
+    subprocess.run(
+        ["ffmpeg", "-v", "error", "-f", "lavfi", "-i", f"testsrc=size={size}:rate={rate}", "-t", "1",
+         "-pix_fmt", "yuv420p", "-movflags", "+frag_keyframe+empty_moov", path],
+        check=True
+    )
+    return path
+
+
+def test_each_recording_gets_its_own_video(tmp_path):
+    write_segment(tmp_path, 0)
+    write_segment(tmp_path, 1)
+    first = recorder.join_live_segments(str(tmp_path), "S")
+    assert first == [str(tmp_path / "S.mp4")]
+    assert recorder.list_live_segments(str(tmp_path), "S") == []
+    before = os.stat(first[0])
+
+    write_segment(tmp_path, 0)
+    second = recorder.join_live_segments(str(tmp_path), "S")
+    assert second == [str(tmp_path / "S_2.mp4")]
+    # The first recording's video is not copied again.
+    after = os.stat(first[0])
+    assert (after.st_ino, after.st_mtime_ns, after.st_size) == (before.st_ino, before.st_mtime_ns, before.st_size)
+    assert recorder.probe_video(second[0])[:2] == (64, 48)
+
+
+def test_size_change_starts_a_new_video(tmp_path):
+    write_segment(tmp_path, 0)
+    write_segment(tmp_path, 1, size="32x32")
+    write_segment(tmp_path, 2, size="32x32")
+    written = recorder.join_live_segments(str(tmp_path), "S")
+    assert written == [str(tmp_path / "S.mp4"), str(tmp_path / "S_2.mp4")]
+    assert recorder.probe_video(written[0])[:2] == (64, 48)
+    assert recorder.probe_video(written[1])[:2] == (32, 32)
+
+
+def test_unreadable_segment_is_quarantined(tmp_path):
+    write_segment(tmp_path, 0)
+    broken = recorder.live_segment_path(str(tmp_path), "S", 1)
+    with open(broken, "wb") as f:
+        f.write(b"\x00" * 64)
+    messages = []
+    written = recorder.join_live_segments(str(tmp_path), "S", lambda message, level="INFO": messages.append(level))
+    assert written == [str(tmp_path / "S.mp4")]
+    assert os.listdir(tmp_path / recorder.QUARANTINE_FOLDER) == [os.path.basename(broken)]
+    assert messages == ["WARNING"]
@@ -0,0 +1,63 @@
+import sqlite3
+
+import zmxTOOL_Screenshot_Recorder as recorder
+
+
+def add_frames(store):
+    store.add(frame=1, captured_at=100.0, diff_ratio=0.01, trigger="image")
+    store.add(frame=2, captured_at=110.0, diff_ratio=0.20, trigger="input")
+    store.add(frame=3, captured_at=120.0, diff_ratio=0.05, trigger="image+input")
+    store.add(frame=4, captured_at=130.0, diff_ratio=0.50, trigger="timer")
+
+
+def frames(rows):
+    return [row[0] for row in rows]
+
+
+def test_query_filters(tmp_path):
+    with recorder.FrameMetadataStore(str(tmp_path)) as store:
+        add_frames(store)
+        assert frames(store.query()) == [1, 2, 3, 4]
+        assert frames(store.query(start=110.0, end=130.0)) == [2, 3]
+        assert frames(store.query(min_diff=0.05)) == [2, 4]
+        assert frames(store.query(triggers=("input", "image+input"))) == [2, 3]
+        assert frames(store.query(first_frame=2, last_frame=3)) == [2, 3]
+        assert frames(store.query(start=105.0, min_diff=0.1, triggers=["timer"])) == [4]
+        assert store.query(first_frame=4, columns=("frame", "captured_at", "trigger")) == [(4, 130.0, "timer")]
+
+
+def test_rows_are_batched(tmp_path):
+    store = recorder.FrameMetadataStore(str(tmp_path), batch_size=3, batch_seconds=3600)
+    other = sqlite3.connect(store.path)
+    count = lambda: other.execute("SELECT COUNT(*) FROM frames").fetchone()[0]
+    store.add(frame=1, captured_at=1.0)
+    store.add(frame=2, captured_at=2.0)
+    assert count() == 0
+    store.add(frame=3, captured_at=3.0)
+    assert count() == 3
+    store.add(frame=4, captured_at=4.0)
+    # Queries see buffered rows.
+    assert frames(store.query()) == [1, 2, 3, 4]
+    store.close()
+    assert count() == 4
+    other.close()
+
+
+def test_delete_and_replace(tmp_path):
+    with recorder.FrameMetadataStore(str(tmp_path)) as store:
+        add_frames(store)
+        store.delete([1, 3])
+        store.add(frame=2, captured_at=111.0, trigger="timer")
+        assert store.query(columns=("frame", "captured_at", "trigger")) == [(2, 111.0, "timer"), (4, 130.0, "timer")]
+
+
+def test_adds_region_column_to_old_databases(tmp_path):
+    connection = sqlite3.connect(str(tmp_path / recorder.METADATA_FILENAME))
+    connection.execute("CREATE TABLE frames (frame INTEGER PRIMARY KEY, captured_at REAL NOT NULL, diff_ratio REAL, "
+                       "detection TEXT, trigger TEXT, key_count INTEGER, mouse_count INTEGER, window_title TEXT, "
+                       "window_left INTEGER, window_top INTEGER, window_width INTEGER, window_height INTEGER, "
+                       "encoded_bytes INTEGER, encode_ms REAL, codec TEXT, quality INTEGER, scale REAL, storage TEXT)")
+    connection.close()
+    with recorder.FrameMetadataStore(str(tmp_path)) as store:
+        store.add(frame=1, captured_at=1.0, region=2)
+        assert store.query(columns=("region",)) == [(2,)]
@@ -0,0 +1,91 @@
+import io
+import os
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+ImageChops = pytest.importorskip("PIL.ImageChops")
+
+import zmxTOOL_Screenshot_Recorder as recorder
+
+
+def frame_bytes(n):
+    return bytes([n % 256]) * (100 + n)
+
+
+def test_pack_round_trip_across_segments(tmp_path):
+    writer = recorder.PackedFrameWriter(str(tmp_path), "S", max_segment_bytes=600)
+    for n in range(1, 11):
+        writer.append(n, frame_bytes(n), timestamp=1000.0 + n)
+    writer.close()
+
+    assert len(recorder.list_pack_segments(str(tmp_path), "S")) > 1
+    with recorder.PackedFrameReader(str(tmp_path), "S") as packed:
+        assert packed.frames == list(range(1, 11))
+        for n in packed.frames:
+            assert bytes(packed.read_bytes(n)) == frame_bytes(n)
+            assert packed.timestamp(n) == 1000.0 + n
+            assert not packed.is_delta(n)
+
+
+def test_pack_recovers_from_torn_tail(tmp_path):
+    writer = recorder.PackedFrameWriter(str(tmp_path), "S")
+    for n in range(1, 4):
+        writer.append(n, frame_bytes(n), timestamp=float(n))
+    writer.sync()
+    # Simulate a crash: no index or footer, and half of a record header at the end.
+    writer.file.close()
+    path = recorder.pack_segment_path(str(tmp_path), "S", writer.segment_index)
+    with open(path, "ab") as f:
+        f.write(recorder.PACK_RECORD.pack(recorder.PACK_RECORD_MAGIC, 0, 0, 4, 4.0, 500)[:10])
+
+    with recorder.PackedFrameReader(str(tmp_path), "S") as packed:
+        assert packed.frames == [1, 2, 3]
+
+    writer = recorder.PackedFrameWriter(str(tmp_path), "S")
+    writer.append(4, frame_bytes(4), timestamp=4.0)
+    writer.close()
+    with recorder.PackedFrameReader(str(tmp_path), "S") as packed:
+        assert packed.frames == [1, 2, 3, 4]
+        assert [bytes(packed.read_bytes(n)) for n in packed.frames] == [frame_bytes(n) for n in range(1, 5)]
+
+
+def test_tile_delta_round_trip():
+    first = Image.new("RGB", (200, 150), (10, 20, 30))
+    second = first.copy()
+    second.paste((200, 0, 0), (70, 70, 100, 90))
+    encoder = recorder.TileDeltaEncoder(keyframe_interval=10)
+
+    key_data, key_flags = encoder.encode(first, 90, "png")
+    encoder.commit()
+    delta_data, delta_flags = encoder.encode(second, 90, "png")
+    encoder.commit()
+
+    assert key_flags == 0
+    assert delta_flags == recorder.PACK_FLAG_DELTA
+    rebuilt = Image.open(io.BytesIO(key_data)).convert("RGB")
+    recorder.apply_tile_delta(rebuilt, delta_data)
+    assert ImageChops.difference(rebuilt, second).getbbox() is None
+
+
+def test_tile_delta_needs_committed_reference():
+    img = Image.new("RGB", (128, 128))
+    encoder = recorder.TileDeltaEncoder()
+    encoder.encode(img, 90, "png")
+    # Not committed (the write failed), so the next frame must be a keyframe.
+    assert encoder.encode(img, 90, "png")[1] == 0
+
+
+def test_apply_tile_delta_rejects_mismatched_frames():
+    encoder = recorder.TileDeltaEncoder()
+    base = Image.new("RGB", (128, 128))
+    encoder.encode(base, 90, "png")
+    encoder.commit()
+    changed = base.copy()
+    changed.putpixel((0, 0), (255, 255, 255))
+    delta_data, _ = encoder.encode(changed, 90, "png")
+
+    with pytest.raises(ValueError):
+        recorder.apply_tile_delta(Image.new("RGB", (64, 64)), delta_data)
+    with pytest.raises(ValueError):
+        recorder.apply_tile_delta(base.copy(), recorder.encode_image(base, "png"))
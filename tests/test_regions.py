@@ -0,0 +1,81 @@
+import threading
+import types
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+import zmxTOOL_Screenshot_Recorder as recorder
+
+
+class FakeScreenGrabber:
+    """Stands in for an mss instance; fills each region with a color derived from its offset."""
+
+    instances = []
+
+    def __init__(self):
+        self.thread = threading.get_ident()
+        self.closed = False
+        FakeScreenGrabber.instances.append(self)
+
+    def grab(self, region):
+        assert threading.get_ident() == self.thread, "mss instance used from another thread"
+        if region.get("fail"):
+            raise OSError("grab failed")
+        size = (region["width"], region["height"])
+        color = bytes([region["left"] % 256, region["top"] % 256, 0])
+        return types.SimpleNamespace(size=size, rgb=color * (size[0] * size[1]))
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_mss(monkeypatch):
+    FakeScreenGrabber.instances = []
+    monkeypatch.setattr(recorder, "mss", types.SimpleNamespace(mss=FakeScreenGrabber))
+    return FakeScreenGrabber
+
+
+def region(left, top, width=4, height=3, **extra):
+    return dict(left=left, top=top, width=width, height=height, **extra)
+
+
+def test_grabs_each_region_on_its_own_worker(fake_mss):
+    grabber = recorder.RegionGrabber()
+    regions = [region(0, 0), region(10, 0, width=6), region(0, 20)]
+    try:
+        results = grabber.grab(regions)
+        assert [img.size for img, _ in results] == [(4, 3), (6, 3), (4, 3)]
+        assert [img.getpixel((0, 0)) for img, _ in results] == [(0, 0, 0), (10, 0, 0), (0, 20, 0)]
+        assert all(ms >= 0 for _, ms in results)
+        grabber.grab(regions[:2])
+        # Workers and their mss instances are reused between frames.
+        assert len(fake_mss.instances) == 3
+        assert len({instance.thread for instance in fake_mss.instances}) == 3
+    finally:
+        grabber.close()
+    assert all(instance.closed for instance in fake_mss.instances)
+
+
+def test_worker_errors_are_raised(fake_mss):
+    grabber = recorder.RegionGrabber()
+    try:
+        with pytest.raises(OSError):
+            grabber.grab([region(0, 0), region(5, 0, fail=True)])
+        # The failed worker keeps serving later requests.
+        assert len(grabber.grab([region(0, 0), region(5, 0)])) == 2
+    finally:
+        grabber.close()
+
+
+def test_stitch_regions_places_images_at_their_offsets():
+    regions = [region(-4, 0), region(0, 2)]
+    images = [Image.new("RGB", (4, 3), "red"), Image.new("RGB", (4, 3), "blue")]
+    bounds = {"left": -4, "top": 0, "width": 8, "height": 5}
+    canvas = recorder.stitch_regions(images, regions, bounds)
+    assert canvas.size == (8, 5)
+    assert canvas.getpixel((0, 0)) == (255, 0, 0)
+    assert canvas.getpixel((4, 2)) == (0, 0, 255)
+    # Area not covered by any region stays black.
+    assert canvas.getpixel((7, 0)) == (0, 0, 0)
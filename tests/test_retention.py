@@ -0,0 +1,145 @@
+import threading
+import time
+
+import pytest
+
+import zmxTOOL_Screenshot_Recorder as recorder
+from zmxTOOL_Screenshot_Recorder import RetentionPolicy
+
+
+class FakeFrames:
+    def __init__(self, timestamps):
+        self.timestamps = timestamps
+
+    def frame_numbers(self):
+        return sorted(self.timestamps)
+
+    def timestamp(self, frame_number):
+        return self.timestamps[frame_number]
+
+
+def test_parse_retention_policies():
+    policies = recorder.parse_retention_policies("30d quality 40; 7d thin 60s;; 1.5d QUALITY 200")
+    assert policies == [
+        RetentionPolicy(1.5, "quality", 95),
+        RetentionPolicy(7.0, "thin", 60),
+        RetentionPolicy(30.0, "quality", 40),
+    ]
+    assert recorder.parse_retention_policies("") == []
+    assert [recorder.format_retention_policy(p) for p in policies] == ["1.5d quality 95", "7d thin 60s", "30d quality 40"]
+
+
+@pytest.mark.parametrize("text", ["7 thin 60s", "7d thin", "7d keep 5", "thin 60s"])
+def test_parse_retention_policies_rejects_bad_rules(text):
+    with pytest.raises(ValueError):
+        recorder.parse_retention_policies(text)
+
+
+@pytest.fixture
+def session_frames():
+    now = time.time()
+    base = (int(now) - 8 * 86400) // 60 * 60
+    timestamps = {n: base + (n - 1) * 20 for n in range(1, 7)}
+    timestamps[7] = now
+    return now, FakeFrames(timestamps)
+
+
+def test_plan_thins_old_frames(tmp_path, session_frames):
+    now, frames = session_frames
+    engine = recorder.RetentionEngine(str(tmp_path), [RetentionPolicy(7, "thin", 60)], throttle=None)
+    drop, reencode, done = engine.plan(frames, {}, now)
+    assert drop == {2, 3, 5, 6}
+    assert reencode == {}
+    assert done == {"7d thin 60s": 6}
+
+
+def test_plan_reencodes_survivors_only(tmp_path, session_frames):
+    now, frames = session_frames
+    policies = recorder.parse_retention_policies("7d thin 60s; 1d quality 40; 2d quality 30")
+    engine = recorder.RetentionEngine(str(tmp_path), policies, throttle=None)
+    drop, reencode, _ = engine.plan(frames, {}, now)
+    assert drop == {2, 3, 5, 6}
+    assert reencode == {1: 30, 4: 30}
+
+
+def test_plan_resumes_from_checkpoint(tmp_path, session_frames):
+    now, frames = session_frames
+    engine = recorder.RetentionEngine(str(tmp_path), [RetentionPolicy(7, "thin", 60)], throttle=None)
+    drop, _, done = engine.plan(frames, {"7d thin 60s": 3}, now)
+    # Frames up to the checkpoint are not revisited; frame 3 was the last kept in its bucket.
+    assert drop == {5, 6}
+    assert done == {"7d thin 60s": 6}
+
+
+def write_old_session(folder, session_frames):
+    now, frames = session_frames
+    folder.mkdir()
+    writer = recorder.PackedFrameWriter(str(folder), "S")
+    for n in frames.frame_numbers():
+        writer.append(n, bytes([n]) * 50, timestamp=frames.timestamp(n))
+    writer.close()
+
+
+def test_run_compacts_packed_session(tmp_path, session_frames):
+    write_old_session(tmp_path / "S", session_frames)
+    throttle = recorder.RetentionThrottle(0, 0, 0, threading.Event())
+    engine = recorder.RetentionEngine(str(tmp_path), [RetentionPolicy(7, "thin", 60)], throttle)
+    assert engine.run(["S"]) == (4, 0)
+    with recorder.PackedFrameReader(str(tmp_path / "S"), "S") as packed:
+        assert packed.frames == [1, 4, 7]
+        assert bytes(packed.read_bytes(4)) == bytes([4]) * 50
+    # A second pass has nothing left to do.
+    assert engine.run(["S"]) == (0, 0)
+
+
+def test_run_skips_busy_sessions(tmp_path, session_frames):
+    write_old_session(tmp_path / "S", session_frames)
+    locks = recorder.SessionLocks()
+    assert locks.acquire(str(tmp_path / "S"), "Pack") is None
+    assert locks.acquire(str(tmp_path / "S" / "."), "Capture") == "Pack"
+    messages = []
+    throttle = recorder.RetentionThrottle(0, 0, 0, threading.Event())
+    engine = recorder.RetentionEngine(str(tmp_path), [RetentionPolicy(7, "thin", 60)], throttle,
+                                      log=lambda message, level="INFO": messages.append(message), locks=locks)
+    assert engine.run(["S"]) == (0, 0)
+    assert "while Pack is working on it" in messages[0]
+    locks.release(str(tmp_path / "S"), "Capture")
+    assert locks.acquire(str(tmp_path / "S"), "Retention") == "Pack"
+    locks.release(str(tmp_path / "S"), "Pack")
+    assert engine.run(["S"]) == (4, 0)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+        self.waits = []
+
+    def monotonic(self):
+        return self.now
+
+    def wait(self, seconds):
+        self.waits.append(seconds)
+        self.now += seconds
+
+    def is_set(self):
+        return False
+
+
+def test_throttle_caps_saved_up_allowance(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(recorder.time, "monotonic", clock.monotonic)
+    throttle = recorder.RetentionThrottle(10, 0, 0, clock)
+    clock.now += 60  # a long idle stretch
+    for _ in range(20):
+        assert throttle.pace()
+    # 2 s of work at 10 frames/s, less at most RETENTION_BURST_SECONDS of saved-up allowance.
+    assert sum(clock.waits) == pytest.approx(2 - recorder.RETENTION_BURST_SECONDS)
+
+
+def test_throttle_halves_rate_while_busy(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(recorder.time, "monotonic", clock.monotonic)
+    throttle = recorder.RetentionThrottle(0, 1, 0, clock, busy=lambda: True)
+    for _ in range(4):
+        throttle.pace(nbytes=1024 * 1024)
+    assert sum(clock.waits) == pytest.approx(8)
@@ -0,0 +1,66 @@
+import threading
+
+import zmxTOOL_Screenshot_Recorder as recorder
+
+
+def fill(queue, count):
+    return [queue.put(n) for n in range(count)]
+
+
+def drain(queue):
+    queue.close()
+    return list(iter(queue.get, None))
+
+
+def test_drop_newest_keeps_queued_frames():
+    queue = recorder.FrameSaveQueue("drop-newest", maxsize=2)
+    assert fill(queue, 4) == [True, True, False, False]
+    assert queue.dropped == 2
+    assert drain(queue) == [0, 1]
+
+
+def test_drop_oldest_keeps_latest_frames():
+    queue = recorder.FrameSaveQueue("drop-oldest", maxsize=2)
+    assert fill(queue, 4) == [True, True, False, False]
+    assert queue.dropped == 2
+    assert queue.max_depth == 2
+    assert drain(queue) == [2, 3]
+
+
+def test_block_waits_for_room():
+    queue = recorder.FrameSaveQueue("block", maxsize=1)
+    queue.put("a")
+    results = []
+    producer = threading.Thread(target=lambda: results.append(queue.put("b")))
+    producer.start()
+    producer.join(0.3)
+    assert producer.is_alive()
+    assert queue.get() == "a"
+    producer.join(2)
+    assert results == [True]
+    assert drain(queue) == ["b"]
+
+
+def test_block_gives_up_when_stopped():
+    queue = recorder.FrameSaveQueue("block", maxsize=1)
+    queue.put("a")
+    stop = threading.Event()
+    threading.Timer(0.2, stop.set).start()
+    assert queue.put("b", stop) is False
+    assert queue.dropped == 1
+    assert drain(queue) == ["a"]
+
+
+def test_degrade_flags_until_queue_drains():
+    queue = recorder.FrameSaveQueue("degrade", maxsize=2)
+    fill(queue, 2)
+    stop = threading.Event()
+    stop.set()
+    queue.put("late", stop)
+    assert queue.degraded
+    queue.get()
+    assert not queue.degraded
+
+
+def test_unknown_policy_falls_back_to_block():
+    assert recorder.FrameSaveQueue("bogus").policy == "block"
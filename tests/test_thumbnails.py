@@ -0,0 +1,76 @@
+import os
+import threading
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+import zmxTOOL_Screenshot_Recorder as recorder
+
+
+def thumbnail_cache(session_folder):
+    return recorder.PackedFrameReader(os.path.join(session_folder, recorder.THUMBNAIL_FOLDER), recorder.THUMBNAIL_PACK)
+
+
+def test_build_adds_only_missing_thumbnails(tmp_path):
+    writer = recorder.PackedFrameWriter(str(tmp_path), "S")
+    for n in range(1, 4):
+        img = Image.new("RGB", (640, 480), (n * 60, 0, 0))
+        writer.append(n, recorder.encode_image(img), timestamp=1000.0 + n)
+    writer.close()
+    Image.new("RGB", (320, 200), "blue").save(tmp_path / "S_000004.jpeg")
+
+    seen = []
+    assert recorder.build_thumbnails(str(tmp_path), "S", workers=2,
+                                     progress=lambda done, total: seen.append(total)) == 4
+    assert seen == [4] * 4
+    assert recorder.build_thumbnails(str(tmp_path), "S") == 0
+    with thumbnail_cache(str(tmp_path)) as thumbs:
+        assert thumbs.frames == [1, 2, 3, 4]
+        assert thumbs.timestamp(2) == 1002.0
+        thumb = thumbs.open_image(1)
+        assert thumb.width <= recorder.THUMBNAIL_SIZE[0] and thumb.height <= recorder.THUMBNAIL_SIZE[1]
+
+
+def test_worker_reduces_frames_before_queuing(tmp_path, monkeypatch):
+    queued = []
+    started, release = threading.Event(), threading.Event()
+
+    def make_thumbnail(img):
+        queued.append(img.size)
+        started.set()
+        release.wait(5)
+        return recorder.encode_image(img.convert("RGB"))
+
+    monkeypatch.setattr(recorder, "make_thumbnail", make_thumbnail)
+    cache = str(tmp_path / recorder.THUMBNAIL_FOLDER)
+    os.makedirs(cache)
+    worker = recorder.ThumbnailWorker(cache)
+    big = Image.new("RGB", (3840, 2160))
+    worker.add(0, big, timestamp=0.0)
+    assert started.wait(5)
+    for n in range(1, recorder.THUMBNAIL_QUEUE_SIZE + 3):
+        worker.add(n, big, timestamp=float(n))
+    # One frame is being worked on, the queue is full and the rest were skipped.
+    assert worker.skipped == 2
+    release.set()
+    worker.close()
+    assert queued[0] == (3840 // 6, 2160 // 6)
+    with thumbnail_cache(str(tmp_path)) as thumbs:
+        assert len(thumbs.frames) == recorder.THUMBNAIL_QUEUE_SIZE + 1
+
+
+def test_contact_sheet_per_hour(tmp_path):
+    cache = str(tmp_path / recorder.THUMBNAIL_FOLDER)
+    os.makedirs(cache)
+    writer = recorder.PackedFrameWriter(cache, recorder.THUMBNAIL_PACK)
+    thumb = recorder.make_thumbnail(Image.new("RGB", (640, 360), "green"))
+    start = 1_700_000_000.0 - 1_700_000_000.0 % 3600
+    for n in range(5):
+        writer.append(n, thumb, timestamp=start + n * 1800)
+    writer.close()
+    paths = recorder.build_contact_sheets(str(tmp_path), "S", per_sheet=1)
+    assert len(paths) == 3
+    assert all(os.path.basename(path).startswith("contact_") for path in paths)
+    with Image.open(paths[0]) as sheet:
+        assert sheet.width > recorder.THUMBNAIL_SIZE[0] * recorder.CONTACT_SHEET_COLUMNS
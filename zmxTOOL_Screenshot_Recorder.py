@@ -1,38 +1,2443 @@
 import os
+import io
+import re
 import sys
 import json
+import mmap
+import queue
 import time
+import shutil
+import stat
+import bisect
+import struct
+import socket
+import sqlite3
+import argparse
+import importlib
 import threading
+import subprocess
+import statistics
+import socketserver
+import collections
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import mss
-from PIL import Image, ImageChops
-from pynput import keyboard
-import mouse
-import psutil
 import traceback
 
-try:
-    import win32gui
-except ImportError:
-    win32gui = None
+class LazyModule:
+    """Stands in for a module and imports it on first attribute access.
+
+    Optional modules are falsy when they cannot be imported, like the None placeholder they replace.
+    A failed import is remembered, so it is only attempted once.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, name, optional=False):
+        self._name = name
+        self._optional = optional
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        if self._module is LazyModule._MISSING:
+            raise ImportError(f"No module named '{self._name}'")
+        return getattr(self._load(), attr)
+
+    def __bool__(self):
+        if not self._optional:
+            return True
+        if self._module is None:
+            try:
+                self._load()
+            except ImportError:
+                self._module = LazyModule._MISSING
+        return self._module is not LazyModule._MISSING
+
+# Deferred so the window appears without waiting for these; each loads on first use.
+mss = LazyModule("mss")
+Image = LazyModule("PIL.Image")
+ImageChops = LazyModule("PIL.ImageChops")
+ImageDraw = LazyModule("PIL.ImageDraw")
+keyboard = LazyModule("pynput.keyboard")
+mouse = LazyModule("mouse")
+psutil = LazyModule("psutil")
+win32gui = LazyModule("win32gui", optional=True)
 
 MARKER_FILENAME = ".zmxTOOL_session"
+SESSION_SCAN_WORKERS = 16
+STARTUP_IMPORT_BUDGET_SECONDS = 0.5
+STARTUP_WINDOW_BUDGET_SECONDS = 1.0
+
+FRAME_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+PACK_EXTENSION = ".zmxpack"
+PACK_SEGMENT_MAX_BYTES = 512 * 1024 * 1024
+
+# Pack segment layout: header, then records (record header + encoded frame),
+# then on close an index of all records followed by a fixed-size footer.
+PACK_MAGIC = b"ZMXPACK1"
+PACK_VERSION = 1
+PACK_HEADER = struct.Struct("<8sHHI")          # magic, version, reserved, segment index
+PACK_RECORD_MAGIC = b"ZFRM"
+PACK_RECORD = struct.Struct("<4sHHQdI")        # magic, flags, reserved, frame, timestamp, length
+PACK_INDEX_ENTRY = struct.Struct("<QQIHd")     # frame, data offset, length, flags, timestamp
+PACK_FOOTER_MAGIC = b"ZMXINDEX"
+PACK_FOOTER = struct.Struct("<8sQI")           # magic, index offset, entry count
+PACK_FLAG_DELTA = 0x0001
+
+# Delta frames hold only the tiles that changed since the previous frame.
+DELTA_MAGIC = b"ZDLT"
+DELTA_HEADER = struct.Struct("<4sIIHI")        # magic, width, height, tile size, tile count
+DELTA_TILE = struct.Struct("<HHI")             # tile column, tile row, encoded length
+DELTA_TILE_SIZE = 64
+DELTA_KEYFRAME_INTERVAL = 60
+DELTA_MAX_CHANGED_RATIO = 0.6
+
+IMAGE_CODECS = ("jpeg", "webp", "png")
+ADAPTIVE_WINDOW = 20
+ADAPTIVE_MIN_QUALITY = 10
+ADAPTIVE_DOWNSCALE_QUALITY = 40
+ADAPTIVE_QUALITY_STEP = 5
+ADAPTIVE_SCALES = (1.0, 0.75, 0.5)
+ADAPTIVE_TEXT_MAX_COLORS = 512
+LOW_SPACE_FACTOR = 2
+
+LIVE_SEGMENT_MINUTES = 10
+
+MULTI_REGION_MODES = ("bounding box", "concurrent stitched", "concurrent separate")
+GRAB_LATENCY_SMOOTHING = 0.2
+BACKPRESSURE_POLICIES = ("block", "drop-oldest", "drop-newest", "degrade")
+SAVE_QUEUE_SIZE = 8
+SAVE_QUEUE_WAIT = 0.1
+START_RETRY_MS = 200
+QUIT_WAIT_SECONDS = 60
+CAPTURE_STATS_LOG_SECONDS = 60
+
+METADATA_FILENAME = "frames.db"
+METADATA_BATCH_SIZE = 50
+METADATA_BATCH_SECONDS = 5.0
+METADATA_COLUMNS = (
+    "frame", "captured_at", "diff_ratio", "detection", "trigger", "key_count", "mouse_count",
+    "window_title", "window_left", "window_top", "window_width", "window_height",
+    "encoded_bytes", "encode_ms", "codec", "quality", "scale", "storage", "region",
+)
+
+def resource_path(relative_path):
+    """Get absolute path to resource, works for dev and for PyInstaller."""
+    try:
+        base_path = sys._MEIPASS
+    except Exception:
+        base_path = os.path.abspath(".")
+    return os.path.join(base_path, relative_path)
+
+def find_sessions(save_directory):
+    """Returns the folders in save_directory that contain a session marker file.
+
+    Marker checks run in parallel, which matters on network shares where each one is a round trip.
+    """
+    with os.scandir(save_directory) as entries:
+        folders = [entry.name for entry in entries if entry.is_dir()]
+    with ThreadPoolExecutor(max_workers=SESSION_SCAN_WORKERS) as pool:
+        found = pool.map(lambda d: os.path.exists(os.path.join(save_directory, d, MARKER_FILENAME)), folders)
+    return [d for d, has_marker in zip(folders, found) if has_marker]
+
+def list_frame_files(session_folder, session):
+    """Returns {frame number: filename} for the per-file frames of a session."""
+    pattern = re.compile(rf"^{re.escape(session)}_(\d+)\.[^.]+$")
+    frames = {}
+    try:
+        names = os.listdir(session_folder)
+    except OSError:
+        return frames
+    for filename in names:
+        if not filename.lower().endswith(FRAME_EXTENSIONS):
+            continue
+        match = pattern.match(filename)
+        if match:
+            frames[int(match.group(1))] = filename
+    return frames
+
+def pack_segment_path(session_folder, session, index):
+    """Path of a session's pack segment with the given index."""
+    return os.path.join(session_folder, f"{session}.{index:04d}{PACK_EXTENSION}")
+
+def list_pack_segments(session_folder, session):
+    """Returns the sorted segment indexes of a session's pack container."""
+    pattern = re.compile(rf"^{re.escape(session)}\.(\d{{4}}){re.escape(PACK_EXTENSION)}$")
+    try:
+        names = os.listdir(session_folder)
+    except OSError:
+        return []
+    return sorted(int(m.group(1)) for m in map(pattern.match, names) if m)
+
+def frame_extension(data):
+    """Guesses the file extension of an encoded frame from its magic bytes."""
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    return "jpeg"
+
+def read_pack_segment_index(buf, size):
+    """Reads a segment's index from its footer, or rebuilds it by scanning records.
+
+    Returns (entries, data_end) where entries are (frame, offset, length, flags, timestamp)
+    tuples and data_end is the offset just past the last complete record.
+    """
+    if size < PACK_HEADER.size:
+        raise ValueError("Pack segment is truncated.")
+    magic, version, _, _ = PACK_HEADER.unpack_from(buf, 0)
+    if magic != PACK_MAGIC or version > PACK_VERSION:
+        raise ValueError("Not a zmxTOOL pack segment.")
+    if size >= PACK_HEADER.size + PACK_FOOTER.size:
+        footer_magic, index_offset, count = PACK_FOOTER.unpack_from(buf, size - PACK_FOOTER.size)
+        if (footer_magic == PACK_FOOTER_MAGIC
+                and index_offset + count * PACK_INDEX_ENTRY.size + PACK_FOOTER.size == size):
+            entries = [
+                PACK_INDEX_ENTRY.unpack_from(buf, index_offset + i * PACK_INDEX_ENTRY.size)
+                for i in range(count)
+            ]
+            return entries, index_offset
+    # No valid footer: the segment was still open or the writer crashed.
+    entries = []
+    pos = PACK_HEADER.size
+    while pos + PACK_RECORD.size <= size:
+        record_magic, flags, _, frame, timestamp, length = PACK_RECORD.unpack_from(buf, pos)
+        data_offset = pos + PACK_RECORD.size
+        if record_magic != PACK_RECORD_MAGIC or data_offset + length > size:
+            break
+        entries.append((frame, data_offset, length, flags, timestamp))
+        pos = data_offset + length
+    return entries, pos
+
+def scan_session_frames(session_folder, session, log=None):
+    """Counts a session's saved frames, loose and packed.
+
+    Returns (count, resumable) where resumable tells whether the session already holds
+    screenshots, i.e. whether starting capture continues it.
+    """
+    try:
+        names = os.listdir(session_folder)
+    except OSError:
+        return 0, False
+    prefix = f"{session}_"
+    loose = [f for f in names if f.startswith(prefix)]
+    count = sum(1 for f in loose if f.lower().endswith(FRAME_EXTENSIONS))
+    segments = list_pack_segments(session_folder, session)
+    for segment in segments:
+        try:
+            with open(pack_segment_path(session_folder, session, segment), "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                    count += len(read_pack_segment_index(buf, len(buf))[0])
+        except (OSError, ValueError) as e:
+            if log:
+                log(f"Error reading pack segment {segment:04d}: {e}", level="ERROR")
+    return count, bool(loose or segments)
+
+def encode_image(img, codec="jpeg", quality=75):
+    """Encodes an image with the given codec and returns the bytes."""
+    buffer = io.BytesIO()
+    if codec == "png":
+        img.save(buffer, "PNG", compress_level=6)
+    elif codec == "webp":
+        img.save(buffer, "WEBP", quality=quality, method=4)
+    else:
+        img.save(buffer, "JPEG", quality=quality)
+    return buffer.getvalue()
+
+def codec_available(codec):
+    """Checks whether Pillow was built with support for the codec."""
+    if codec == "webp":
+        from PIL import features
+        return features.check("webp")
+    return codec in IMAGE_CODECS
+
+class FrameMetadataStore:
+    """Per-session SQLite index of frame metadata, written in batches from the save thread."""
+
+    def __init__(self, session_folder, batch_size=METADATA_BATCH_SIZE, batch_seconds=METADATA_BATCH_SECONDS):
+        self.path = os.path.join(session_folder, METADATA_FILENAME)
+        self.batch_size = batch_size
+        self.batch_seconds = batch_seconds
+        self.pending = []
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS frames (
+                frame INTEGER PRIMARY KEY,
+                captured_at REAL NOT NULL,
+                diff_ratio REAL,
+                detection TEXT,
+                trigger TEXT,
+                key_count INTEGER,
+                mouse_count INTEGER,
+                window_title TEXT,
+                window_left INTEGER,
+                window_top INTEGER,
+                window_width INTEGER,
+                window_height INTEGER,
+                encoded_bytes INTEGER,
+                encode_ms REAL,
+                codec TEXT,
+                quality INTEGER,
+                scale REAL,
+                storage TEXT,
+                region INTEGER
+            )
+        """)
+        if "region" not in {row[1] for row in self.connection.execute("PRAGMA table_info(frames)")}:
+            # Databases written before per-region capture lack this column.
+            self.connection.execute("ALTER TABLE frames ADD COLUMN region INTEGER")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS frames_captured_at ON frames (captured_at)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS frames_trigger ON frames (trigger, captured_at)")
+        self.connection.commit()
+
+    def add(self, **row):
+        """Buffers one frame's metadata; the batch is written once it is large or old enough."""
+        with self.lock:
+            self.pending.append(tuple(row.get(column) for column in METADATA_COLUMNS))
+            if (len(self.pending) >= self.batch_size
+                    or time.monotonic() - self.last_flush >= self.batch_seconds):
+                self._flush()
+
+    def _flush(self):
+        if self.pending:
+            placeholders = ", ".join("?" for _ in METADATA_COLUMNS)
+            with self.connection:
+                self.connection.executemany(
+                    f"INSERT OR REPLACE INTO frames ({', '.join(METADATA_COLUMNS)}) VALUES ({placeholders})",
+                    self.pending
+                )
+            self.pending = []
+        self.last_flush = time.monotonic()
+
+    def flush(self):
+        """Writes any buffered rows."""
+        with self.lock:
+            self._flush()
+
+    def query(self, start=None, end=None, min_diff=None, triggers=None,
+              first_frame=None, last_frame=None, columns=("frame",)):
+        """Returns rows matching every given filter, ordered by frame number.
+
+        start/end are Unix timestamps (end exclusive), min_diff a diff ratio (0-1) that
+        frames must exceed, triggers an iterable such as ("input", "image+input").
+        """
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("captured_at >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("captured_at < ?")
+            params.append(end)
+        if min_diff is not None:
+            clauses.append("diff_ratio > ?")
+            params.append(min_diff)
+        if triggers:
+            triggers = list(triggers)
+            clauses.append(f"trigger IN ({', '.join('?' for _ in triggers)})")
+            params.extend(triggers)
+        if first_frame is not None:
+            clauses.append("frame >= ?")
+            params.append(first_frame)
+        if last_frame is not None:
+            clauses.append("frame <= ?")
+            params.append(last_frame)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self.lock:
+            self._flush()
+            return self.connection.execute(
+                f"SELECT {', '.join(columns)} FROM frames{where} ORDER BY frame", params
+            ).fetchall()
+
+    def delete(self, frames):
+        """Removes the rows of frames that no longer exist."""
+        with self.lock:
+            self._flush()
+            with self.connection:
+                self.connection.executemany("DELETE FROM frames WHERE frame = ?", [(f,) for f in frames])
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+THUMBNAIL_FOLDER = "_thumbnails"
+THUMBNAIL_PACK = "thumbs"
+THUMBNAIL_SIZE = (160, 90)
+THUMBNAIL_QUALITY = 70
+THUMBNAIL_QUEUE_SIZE = 8
+CONTACT_SHEET_COLUMNS = 10
+CONTACT_SHEET_PER_HOUR = 60
+
+def make_thumbnail(img):
+    """Returns a small JPEG of the frame for the thumbnail cache."""
+    thumb = img.convert("RGB")
+    thumb.thumbnail(THUMBNAIL_SIZE)
+    return encode_image(thumb, "jpeg", THUMBNAIL_QUALITY)
+
+class ThumbnailWorker:
+    """Adds thumbnails of frames being captured to the cache on its own thread.
+
+    The save thread only hands frames over. Frames arriving while the queue is full are skipped;
+    Build Thumbnails fills those gaps later.
+    """
+
+    def __init__(self, cache_folder, log=None):
+        self.writer = PackedFrameWriter(cache_folder, THUMBNAIL_PACK)
+        self.log = log or (lambda message, level="INFO": None)
+        self.queue = queue.Queue(maxsize=THUMBNAIL_QUEUE_SIZE)
+        self.skipped = 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def add(self, frame_number, img, timestamp=None):
+        """Queues a frame for its thumbnail, or skips it if the worker is behind.
+
+        The frame is box-reduced to about four times the thumbnail size first, so queued frames stay small.
+        """
+        if self.queue.full():
+            self.skipped += 1
+            return
+        factor = min(img.width // (THUMBNAIL_SIZE[0] * 4), img.height // (THUMBNAIL_SIZE[1] * 4))
+        if factor > 1:
+            img = img.reduce(factor)
+        try:
+            self.queue.put_nowait((frame_number, img, timestamp or time.time()))
+        except queue.Full:
+            self.skipped += 1
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            frame_number, img, timestamp = item
+            try:
+                self.writer.append(frame_number, make_thumbnail(img), timestamp=timestamp)
+            except Exception as e:
+                self.log(f"Error updating thumbnail cache: {e}", level="ERROR")
+
+    def close(self):
+        """Finishes the queued thumbnails and closes the cache."""
+        self.queue.put(None)
+        self.thread.join()
+        self.writer.close()
+        if self.skipped:
+            self.log(f"Skipped {self.skipped} live thumbnails; Build Thumbnails will add them.")
+
+def build_thumbnails(session_folder, session, workers=None, progress=None):
+    """Adds thumbnails for every frame missing from the session's thumbnail cache. Returns the count.
+
+    Frames are split into contiguous chunks decoded in parallel, each worker with its own
+    reader so delta frames are rebuilt sequentially within a chunk.
+    """
+    cache_folder = os.path.join(session_folder, THUMBNAIL_FOLDER)
+    os.makedirs(cache_folder, exist_ok=True)
+    with PackedFrameReader(cache_folder, THUMBNAIL_PACK) as cached:
+        have = set(cached.index)
+    with SessionFrameReader(session_folder, session) as frames:
+        missing = [n for n in frames.frame_numbers() if n not in have]
+    if not missing:
+        return 0
+    workers = workers or min(4, os.cpu_count() or 1)
+    chunk_size = -(-len(missing) // workers)
+    chunks = [missing[i:i + chunk_size] for i in range(0, len(missing), chunk_size)]
+    writer = PackedFrameWriter(cache_folder, THUMBNAIL_PACK)
+    done = [0]
+    done_lock = threading.Lock()
+
+    def work(numbers):
+        with SessionFrameReader(session_folder, session) as frames:
+            for frame_number in numbers:
+                img = frames.open_encoded(frame_number)
+                if img is None:
+                    img = frames.open_image(frame_number)
+                elif img.format == "JPEG":
+                    img.draft("RGB", THUMBNAIL_SIZE)
+                writer.append(frame_number, make_thumbnail(img), timestamp=frames.timestamp(frame_number))
+                with done_lock:
+                    done[0] += 1
+                    if progress:
+                        progress(done[0], len(missing))
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(work, chunks))
+    finally:
+        writer.close()
+    return done[0]
+
+def render_contact_sheet(thumbs, frame_numbers, title, columns=CONTACT_SHEET_COLUMNS):
+    """Lays out cached thumbnails in a labelled grid."""
+    cell_width, cell_height = THUMBNAIL_SIZE
+    label_height, title_height, pad = 14, 24, 4
+    rows = -(-len(frame_numbers) // columns)
+    sheet = Image.new(
+        "RGB",
+        (pad + columns * (cell_width + pad), title_height + rows * (cell_height + label_height + pad) + pad),
+        (32, 32, 32)
+    )
+    draw = ImageDraw.Draw(sheet)
+    draw.text((pad, 6), title, fill=(255, 255, 255))
+    for i, frame_number in enumerate(frame_numbers):
+        x = pad + (i % columns) * (cell_width + pad)
+        y = title_height + (i // columns) * (cell_height + label_height + pad)
+        thumb = Image.open(io.BytesIO(thumbs.read_bytes(frame_number)))
+        sheet.paste(thumb, (x + (cell_width - thumb.width) // 2, y + (cell_height - thumb.height) // 2))
+        captured = datetime.fromtimestamp(thumbs.timestamp(frame_number)).strftime("%H:%M:%S")
+        draw.text((x, y + cell_height + 1), f"#{frame_number} {captured}", fill=(200, 200, 200))
+    return sheet
+
+def build_contact_sheets(session_folder, session, per_sheet=CONTACT_SHEET_PER_HOUR, progress=None):
+    """Writes one contact sheet per hour of the session from the thumbnail cache. Returns the paths."""
+    cache_folder = os.path.join(session_folder, THUMBNAIL_FOLDER)
+    paths = []
+    with PackedFrameReader(cache_folder, THUMBNAIL_PACK) as thumbs:
+        hours = {}
+        for frame_number in thumbs.frames:
+            hour = datetime.fromtimestamp(thumbs.timestamp(frame_number)).strftime("%Y-%m-%d_%H")
+            hours.setdefault(hour, []).append(frame_number)
+        for i, (hour, numbers) in enumerate(hours.items(), start=1):
+            if len(numbers) > per_sheet:
+                step = len(numbers) / per_sheet
+                numbers = [numbers[int(j * step)] for j in range(per_sheet)]
+            title = f"{session}  {hour.replace('_', ' ')}:00  ({len(hours[hour])} frames)"
+            path = os.path.join(cache_folder, f"contact_{hour}.jpeg")
+            render_contact_sheet(thumbs, numbers, title).save(path, "JPEG", quality=85)
+            paths.append(path)
+            if progress:
+                progress(i, len(hours))
+    return paths
+
+INPUT_TRIGGERS = ("input", "image+input")
+TIME_BOUND_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%H:%M:%S", "%H:%M")
+
+def parse_time_bound(text, reference):
+    """Parses "YYYY-MM-DD HH:MM[:SS]" or "HH:MM[:SS]" (on the date of `reference`) to a timestamp."""
+    for fmt in TIME_BOUND_FORMATS:
+        try:
+            parsed = datetime.strptime(text.strip(), fmt)
+        except ValueError:
+            continue
+        if not fmt.startswith("%Y"):
+            day = datetime.fromtimestamp(reference)
+            parsed = parsed.replace(year=day.year, month=day.month, day=day.day)
+        return parsed.timestamp()
+    raise ValueError(f"Unrecognized time '{text}'. Use HH:MM or YYYY-MM-DD HH:MM.")
+
+def resolve_frame_selection(frames, session_folder, first_frame=None, last_frame=None,
+                            start=None, end=None, triggers=None, min_diff=None):
+    """Returns the frame numbers of a SessionFrameReader that match a selection, without decoding frames.
+
+    Frame ranges come from the reader's index. Time, trigger and diff filters use the session's
+    metadata database. Frames without a metadata row (saved before it existed, packed or unpacked
+    later, or not yet flushed) are matched on their stored timestamps and never pass trigger or
+    diff filters.
+    """
+    numbers = frames.frame_numbers()
+    lo = 0 if first_frame is None else bisect.bisect_left(numbers, first_frame)
+    hi = len(numbers) if last_frame is None else bisect.bisect_right(numbers, last_frame)
+    numbers = numbers[lo:hi]
+    if start is None and end is None and not triggers and min_diff is None:
+        return numbers
+    matching, recorded = set(), set()
+    if os.path.exists(os.path.join(session_folder, METADATA_FILENAME)):
+        with FrameMetadataStore(session_folder) as store:
+            rows = store.query(start=start, end=end, min_diff=min_diff, triggers=triggers,
+                               first_frame=first_frame, last_frame=last_frame)
+            recorded = {row[0] for row in store.query(first_frame=first_frame, last_frame=last_frame)}
+        matching = {row[0] for row in rows}
+    elif triggers or min_diff is not None:
+        raise ValueError("Trigger and difference filters need frame metadata, which this session does not have.")
+    unfiltered = not triggers and min_diff is None
+    return [n for n in numbers
+            if n in matching
+            or (n not in recorded and unfiltered
+                and (start is None or frames.timestamp(n) >= start) and (end is None or frames.timestamp(n) < end))]
+
+RETENTION_STATE_FILENAME = ".zmxTOOL_retention.json"
+RETENTION_EXAMPLE_RULES = "7d thin 60s; 30d quality 40"
+RETENTION_PERIOD_SECONDS = 3600
+RETENTION_FRAMES_PER_SECOND = 20
+RETENTION_MB_PER_SECOND = 10
+RETENTION_MAX_CPU_PERCENT = 50
+RETENTION_CPU_SAMPLE_SECONDS = 0.5
+RETENTION_BURST_SECONDS = 0.5
+RETENTION_CHECKPOINT_FRAMES = 100
+RetentionPolicy = collections.namedtuple("RetentionPolicy", "after_days action value")
+
+def parse_retention_policies(text):
+    """Parses rules like "7d thin 60s; 30d quality 40" into RetentionPolicy tuples, oldest-first order.
+
+    "thin Ns" keeps one frame per N seconds; "quality Q" re-encodes frames at Pillow quality Q.
+    """
+    policies = []
+    for rule in filter(None, (part.strip() for part in text.split(";"))):
+        match = re.fullmatch(r"(\d+(?:\.\d+)?)d\s+(?:thin\s+(\d+)s|quality\s+(\d+))", rule, re.IGNORECASE)
+        if not match:
+            raise ValueError(f"Unrecognized retention rule '{rule}'. Use e.g. '7d thin 60s' or '30d quality 40'.")
+        days = float(match.group(1))
+        if match.group(2):
+            policies.append(RetentionPolicy(days, "thin", int(match.group(2))))
+        else:
+            policies.append(RetentionPolicy(days, "quality", max(1, min(95, int(match.group(3))))))
+    return sorted(policies)
+
+def format_retention_policy(policy):
+    """Inverse of parse_retention_policies for a single policy; also used as its state key."""
+    days = f"{policy.after_days:g}d"
+    if policy.action == "thin":
+        return f"{days} thin {policy.value}s"
+    return f"{days} quality {policy.value}"
+
+def rewrite_pack_segment(folder, base, segment, drop, reencode, keep_last=True, pace=None):
+    """Rewrites one pack segment without dropped frames and with re-encoded ones. Returns bytes freed.
+
+    With keep_last, the last frame of a segment is kept even if dropped, so delta frames in the next
+    segment still apply. A delta frame whose predecessor was dropped becomes a keyframe; other delta
+    frames are copied. pace(frames, nbytes) is called for every frame; if it returns False the
+    segment is left untouched and None is returned.
+    """
+    path = pack_segment_path(folder, base, segment)
+    temp_path = f"{path}.compact"
+    with PackedFrameReader(folder, base) as packed:
+        slot = packed.segments.index(segment)
+        numbers = [n for n in packed.frames if packed.index[n][0] == slot]
+        entries = []
+        with open(temp_path, "wb") as f:
+            f.write(PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, 0, segment))
+            previous_kept = True
+            stopped = False
+            for frame_number in numbers:
+                _, _, _, flags, timestamp = packed.index[frame_number]
+                if frame_number in drop and not (keep_last and frame_number == numbers[-1]):
+                    previous_kept = False
+                    continue
+                data = packed.read_bytes(frame_number)
+                if pace is not None and not pace(1, len(data)):
+                    stopped = True
+                    break
+                is_delta = bool(flags & PACK_FLAG_DELTA)
+                codec = "jpeg" if is_delta else frame_extension(data)
+                if (is_delta and not previous_kept) or (frame_number in reencode and not is_delta and codec != "png"):
+                    quality = reencode.get(frame_number, 85)
+                    data = encode_image(packed.open_image(frame_number).convert("RGB"), codec, quality)
+                    flags &= ~PACK_FLAG_DELTA
+                offset = f.tell() + PACK_RECORD.size
+                f.write(PACK_RECORD.pack(PACK_RECORD_MAGIC, flags, 0, frame_number, timestamp, len(data)))
+                f.write(data)
+                entries.append((frame_number, offset, len(data), flags, timestamp))
+                previous_kept = True
+            index_offset = f.tell()
+            f.write(b"".join(PACK_INDEX_ENTRY.pack(*entry) for entry in entries))
+            f.write(PACK_FOOTER.pack(PACK_FOOTER_MAGIC, index_offset, len(entries)))
+            f.flush()
+            os.fsync(f.fileno())
+    if stopped:
+        os.remove(temp_path)
+        return None
+    freed = os.path.getsize(path) - os.path.getsize(temp_path)
+    os.replace(temp_path, path)
+    return freed
+
+class RetentionThrottle:
+    """Paces retention work to frame, byte and CPU limits; halves the rates while capture is running.
+
+    Work is metered as a token bucket holding at most RETENTION_BURST_SECONDS of unused allowance,
+    so idle time (CPU pauses, skipped sessions, planning) never turns into an unthrottled burst.
+    """
+
+    def __init__(self, frames_per_second, mb_per_second, max_cpu_percent, stop_event, busy=None):
+        self.frames_per_second = frames_per_second
+        self.bytes_per_second = mb_per_second * 1024 * 1024
+        self.max_cpu_percent = max_cpu_percent
+        self.stop_event = stop_event
+        self.busy = busy or (lambda: False)
+        self.checked = time.monotonic()
+        self.ahead = 0.0  # seconds of work done ahead of the allowed rate; negative is saved-up allowance
+        # Sampled from this process alone, so the CPU meter's psutil.cpu_percent baseline is untouched.
+        self.process = psutil.Process() if max_cpu_percent else None
+        self.cpu_sample = self.sample_cpu()
+        self.cpu_percent = 0.0
+
+    def sample_cpu(self):
+        if self.process is None:
+            return None
+        times = self.process.cpu_times()
+        return time.monotonic(), times.user + times.system
+
+    def process_cpu_percent(self):
+        """This process's CPU use, in percent of one core, over the last sampling window."""
+        sample = self.sample_cpu()
+        elapsed = sample[0] - self.cpu_sample[0]
+        if elapsed >= RETENTION_CPU_SAMPLE_SECONDS:
+            self.cpu_percent = 100 * (sample[1] - self.cpu_sample[1]) / elapsed
+            self.cpu_sample = sample
+        return self.cpu_percent
+
+    def pace(self, frames=1, nbytes=0):
+        """Waits as long as needed to stay within the limits. Returns False once stopped."""
+        factor = 2 if self.busy() else 1
+        cost = 0.0
+        if self.frames_per_second:
+            cost = max(cost, frames * factor / self.frames_per_second)
+        if self.bytes_per_second:
+            cost = max(cost, nbytes * factor / self.bytes_per_second)
+        now = time.monotonic()
+        self.ahead = max(-RETENTION_BURST_SECONDS, self.ahead - (now - self.checked)) + cost
+        self.checked = now
+        wait = self.ahead
+        if self.max_cpu_percent and self.process_cpu_percent() > self.max_cpu_percent:
+            wait = max(wait, 0.5)
+        if wait > 0:
+            self.stop_event.wait(wait)
+        return not self.stop_event.is_set()
+
+class SessionLocks:
+    """Marks sessions busy so captures, storage tasks and retention never work on one at the same time."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.owners = {}
+
+    def acquire(self, session_folder, owner):
+        """Marks the session busy for owner. Returns None, or the owner already working on it."""
+        key = os.path.abspath(session_folder)
+        with self.lock:
+            current = self.owners.get(key)
+            if current is None:
+                self.owners[key] = owner
+            return current
+
+    def release(self, session_folder, owner):
+        key = os.path.abspath(session_folder)
+        with self.lock:
+            if self.owners.get(key) == owner:
+                del self.owners[key]
+
+class RetentionEngine:
+    """Thins and re-encodes old frames of every session according to retention policies.
+
+    Progress is kept per session and policy in a state file in the save directory, so passes are
+    incremental and resume where an interrupted pass stopped. Frame numbers are never reused:
+    dropped frames leave gaps, and the metadata database and thumbnail cache are reindexed to match.
+    """
+
+    def __init__(self, save_directory, policies, throttle, log=None, locks=None):
+        self.save_directory = save_directory
+        self.policies = policies
+        self.throttle = throttle
+        self.log = log or (lambda message, level="INFO": None)
+        self.locks = locks or SessionLocks()
+        self.state_path = os.path.join(save_directory, RETENTION_STATE_FILENAME)
+        self.state = {}
+        if os.path.exists(self.state_path):
+            try:
+                with open(self.state_path, "r") as f:
+                    self.state = json.load(f)
+            except (OSError, ValueError) as e:
+                self.log(f"Ignoring unreadable retention state: {e}", level="WARNING")
+
+    def save_state(self):
+        temp_path = f"{self.state_path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.state, f, indent=4)
+        os.replace(temp_path, self.state_path)
+
+    def run(self, sessions, is_active=None):
+        """Runs one pass over the given sessions, skipping any being captured or otherwise busy.
+
+        Returns (dropped, re-encoded).
+        """
+        totals = [0, 0]
+        for session in sessions:
+            if self.throttle.stop_event.is_set():
+                break
+            if is_active is not None and is_active(session):
+                continue
+            session_folder = os.path.join(self.save_directory, session)
+            owner = self.locks.acquire(session_folder, "Retention")
+            if owner is not None:
+                self.log(f"Retention: skipping session '{session}' while {owner} is working on it.")
+                continue
+            try:
+                dropped, reencoded = self.process_session(session, is_active)
+            except Exception as e:
+                self.log(f"Retention failed for session '{session}': {e}", level="ERROR")
+                continue
+            finally:
+                self.locks.release(session_folder, "Retention")
+            totals[0] += dropped
+            totals[1] += reencoded
+            if dropped or reencoded:
+                self.log(f"Retention: session '{session}' dropped {dropped}, re-encoded {reencoded} frames.")
+        return tuple(totals)
+
+    def plan(self, frames, session_state, now):
+        """Decides, from timestamps only, which frames to drop and which to re-encode (and at what quality)."""
+        drop, reencode, done = set(), {}, {}
+        numbers = frames.frame_numbers()
+        for policy in self.policies:
+            key = format_retention_policy(policy)
+            done_through = session_state.get(key, 0)
+            cutoff = now - policy.after_days * 86400
+            last_bucket = None
+            if policy.action == "thin":
+                # The newest surviving frame at or before the checkpoint was the last one kept.
+                kept = [n for n in numbers[:bisect.bisect_right(numbers, done_through)] if n not in drop]
+                if kept:
+                    last_bucket = int(frames.timestamp(kept[-1]) // policy.value)
+            for frame_number in numbers[bisect.bisect_right(numbers, done_through):]:
+                timestamp = frames.timestamp(frame_number)
+                if timestamp >= cutoff:
+                    break
+                done_through = frame_number
+                if frame_number in drop:
+                    continue
+                if policy.action == "thin":
+                    bucket = int(timestamp // policy.value)
+                    if bucket == last_bucket:
+                        drop.add(frame_number)
+                    else:
+                        last_bucket = bucket
+                else:
+                    reencode[frame_number] = min(policy.value, reencode.get(frame_number, 100))
+            done[key] = done_through
+        for frame_number in drop:
+            reencode.pop(frame_number, None)
+        return drop, reencode, done
+
+    def process_session(self, session, is_active=None):
+        session_folder = os.path.join(self.save_directory, session)
+        session_state = self.state.setdefault(session, {})
+        for stale in os.listdir(session_folder):
+            if stale.endswith(f"{PACK_EXTENSION}.compact"):
+                os.remove(os.path.join(session_folder, stale))
+        with SessionFrameReader(session_folder, session) as frames:
+            drop, reencode, done = self.plan(frames, session_state, time.time())
+            files = dict(frames.files)
+            packed_frames = set(frames.packed.index) if frames.packed is not None else set()
+            segments = {}
+            if frames.packed is not None:
+                # rewrite_pack_segment keeps each segment's last frame, so it is not dropped.
+                last_frames = {}
+                for frame_number in frames.packed.frames:
+                    last_frames[frames.packed.index[frame_number][0]] = frame_number
+                drop -= set(last_frames.values())
+                for frame_number in drop | set(reencode):
+                    if frame_number in packed_frames:
+                        segments.setdefault(frames.packed.segments[frames.packed.index[frame_number][0]], []).append(frame_number)
+        if not drop and not reencode:
+            self.checkpoint(session_state, done, set())
+            return 0, 0
+
+        pending = drop | set(reencode)
+        applied = set()
+        completed = True
+        for i, frame_number in enumerate(sorted(pending - packed_frames), start=1):
+            if is_active is not None and is_active(session):
+                completed = False
+                break
+            path = os.path.join(session_folder, files[frame_number])
+            info = os.stat(path)
+            size = info.st_size
+            if frame_number in drop:
+                os.remove(path)
+            else:
+                with open(path, "rb") as f:
+                    codec = frame_extension(f.read(12))
+                if codec != "png":
+                    with Image.open(path) as img:
+                        data = encode_image(img.convert("RGB"), codec, reencode[frame_number])
+                    write_file_atomic(path, data)
+                    # The file's mtime is the frame's capture time.
+                    os.utime(path, (info.st_atime, info.st_mtime))
+            applied.add(frame_number)
+            if i % RETENTION_CHECKPOINT_FRAMES == 0:
+                self.checkpoint(session_state, done, pending - applied)
+            if not self.throttle.pace(nbytes=size):
+                completed = False
+                break
+        if completed:
+            for segment in sorted(segments):
+                if is_active is not None and is_active(session):
+                    completed = False
+                    break
+                self.log(f"Retention: compacting pack segment {segment:04d} of session '{session}'.")
+                if rewrite_pack_segment(session_folder, session, segment, drop, reencode,
+                                        pace=self.throttle.pace) is None:
+                    completed = False
+                    break
+                applied.update(segments[segment])
+                self.checkpoint(session_state, done, pending - applied)
+
+        removed = sorted(drop & applied)
+        self.reindex(session_folder, removed)
+        self.checkpoint(session_state, done, pending - applied)
+        return len(removed), len(set(reencode) & applied)
+
+    def checkpoint(self, session_state, done, remaining):
+        """Records each policy's progress up to the first frame whose action is still outstanding."""
+        applied_through = min(remaining) - 1 if remaining else float("inf")
+        for key, done_through in done.items():
+            session_state[key] = max(session_state.get(key, 0), min(done_through, applied_through))
+        self.save_state()
+
+    def reindex(self, session_folder, removed):
+        """Drops removed frames from the metadata database, the thumbnail cache and the journal's count."""
+        if not removed:
+            return
+        FrameJournal(session_folder).adjust_frames(-len(removed))
+        if os.path.exists(os.path.join(session_folder, METADATA_FILENAME)):
+            with FrameMetadataStore(session_folder) as store:
+                store.delete(removed)
+        thumbnail_folder = os.path.join(session_folder, THUMBNAIL_FOLDER)
+        if list_pack_segments(thumbnail_folder, THUMBNAIL_PACK):
+            with PackedFrameReader(thumbnail_folder, THUMBNAIL_PACK) as thumbs:
+                thumb_segments = sorted({thumbs.segments[thumbs.index[n][0]] for n in removed if n in thumbs.index})
+            for segment in thumb_segments:
+                rewrite_pack_segment(thumbnail_folder, THUMBNAIL_PACK, segment, set(removed), {}, keep_last=False)
+
+class GrabWorker(threading.Thread):
+    """Grabs one screen region per request with an mss instance that only this thread touches."""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.start()
+
+    def run(self):
+        try:
+            sct, error = mss.mss(), None
+        except Exception as e:
+            sct, error = None, e
+        try:
+            while True:
+                region = self.requests.get()
+                if region is None:
+                    break
+                if sct is None:
+                    self.results.put((None, 0.0, error))
+                    continue
+                started = time.perf_counter()
+                try:
+                    shot = sct.grab(region)
+                    img = Image.frombytes("RGB", shot.size, shot.rgb)
+                    self.results.put((img, (time.perf_counter() - started) * 1000, None))
+                except Exception as e:
+                    self.results.put((None, 0.0, e))
+        finally:
+            if sct is not None:
+                sct.close()
+
+class RegionGrabber:
+    """Grabs several screen regions at the same time, one long-lived worker per region.
+
+    mss objects are not thread-safe, so each worker creates, uses and closes its own instance.
+    """
+
+    def __init__(self):
+        self.workers = []
+
+    def grab(self, regions):
+        """Returns (image, grab ms) per region. Raises the first worker error, if any."""
+        while len(self.workers) < len(regions):
+            self.workers.append(GrabWorker())
+        workers = self.workers[:len(regions)]
+        for worker, region in zip(workers, regions):
+            worker.requests.put(region)
+        results = [worker.results.get() for worker in workers]
+        for _, _, error in results:
+            if error is not None:
+                raise error
+        return [(img, ms) for img, ms, _ in results]
+
+    def close(self):
+        for worker in self.workers:
+            worker.requests.put(None)
+        for worker in self.workers:
+            worker.join(timeout=5)
+        self.workers = []
+
+def stitch_regions(images, regions, bounds):
+    """Pastes region images into one canvas covering bounds, at their screen offsets."""
+    canvas = Image.new("RGB", (bounds['width'], bounds['height']))
+    for img, region in zip(images, regions):
+        canvas.paste(img, (region['left'] - bounds['left'], region['top'] - bounds['top']))
+    return canvas
+
+class FrameSaveQueue:
+    """Bounded hand-off from the capture loop to the save thread, applying a backpressure policy.
+
+    block:       the capture loop waits for room (ticks run late).
+    drop-oldest: the oldest queued frame is discarded to make room.
+    drop-newest: the new frame is discarded.
+    degrade:     like block, but sets `degraded` so frames are encoded cheaper until the queue drains.
+    """
+
+    def __init__(self, policy="block", maxsize=SAVE_QUEUE_SIZE):
+        self.policy = policy if policy in BACKPRESSURE_POLICIES else "block"
+        self.maxsize = max(1, maxsize)
+        self.items = collections.deque()
+        self.condition = threading.Condition()
+        self.closed = False
+        self.degraded = False
+        self.dropped = 0
+        self.max_depth = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def put(self, item, stop_event=None):
+        """Queues a frame. Returns False if a frame had to be dropped.
+
+        Blocking policies give up (dropping the new frame) once stop_event is set.
+        """
+        with self.condition:
+            dropped = False
+            if len(self.items) >= self.maxsize:
+                if self.policy == "drop-newest":
+                    self.dropped += 1
+                    return False
+                if self.policy == "drop-oldest":
+                    self.items.popleft()
+                    self.dropped += 1
+                    dropped = True
+                else:
+                    if self.policy == "degrade":
+                        self.degraded = True
+                    while len(self.items) >= self.maxsize and not self.closed:
+                        if stop_event is not None and stop_event.is_set():
+                            self.dropped += 1
+                            return False
+                        self.condition.wait(SAVE_QUEUE_WAIT)
+            self.items.append(item)
+            self.max_depth = max(self.max_depth, len(self.items))
+            self.condition.notify_all()
+            return not dropped
+
+    def get(self):
+        """Returns the next frame, or None once the queue is closed and drained."""
+        with self.condition:
+            while not self.items and not self.closed:
+                self.condition.wait()
+            if not self.items:
+                return None
+            item = self.items.popleft()
+            if self.degraded and len(self.items) <= self.maxsize // 2:
+                self.degraded = False
+            self.condition.notify_all()
+            return item
+
+    def close(self):
+        """Lets the save thread finish the frames already queued and exit."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+class AdaptiveEncoder:
+    """Picks quality, scale and codec per frame to keep encoded output within a byte budget.
+
+    Quality (and optionally scale) follow the byte rate of a moving window of recent frames, and never
+    rise above the user's base quality. Content is classified as "text" (few distinct colors) or
+    "photo" so each can use its own codec. PNG ignores quality, so PNG frames are left out of the budget.
+    """
+
+    def __init__(self, base_quality, interval, budget_mb_per_hour=0, allow_downscale=False,
+                 text_codec="jpeg", photo_codec="jpeg"):
+        self.base_quality = base_quality
+        self.quality = base_quality
+        self.interval = interval
+        self.budget_rate = budget_mb_per_hour * 1024 * 1024 / 3600.0
+        self.adaptive = self.budget_rate > 0
+        self.allow_downscale = allow_downscale
+        self.scale_index = 0
+        self.low_space = False
+        self.pressure = False
+        self.codecs = {
+            "text": text_codec if codec_available(text_codec) else "jpeg",
+            "photo": photo_codec if codec_available(photo_codec) else "jpeg",
+        }
+        self.history = collections.deque(maxlen=ADAPTIVE_WINDOW)
+        self.frames_since_adjust = 0
+
+    def classify(self, img):
+        """Returns "text" for flat UI/text screens and "photo" for everything else."""
+        sample = img.resize((160, 90), Image.NEAREST)
+        return "text" if sample.getcolors(ADAPTIVE_TEXT_MAX_COLORS) is not None else "photo"
+
+    def prepare(self, img):
+        """Returns (image, params): the frame scaled for encoding and the parameters to encode it with."""
+        content = self.classify(img)
+        scale = ADAPTIVE_SCALES[self.scale_index]
+        quality = self.quality
+        if self.low_space:
+            quality = ADAPTIVE_MIN_QUALITY
+            if self.allow_downscale:
+                scale = ADAPTIVE_SCALES[-1]
+        elif self.pressure:
+            quality = min(quality, ADAPTIVE_DOWNSCALE_QUALITY)
+            if self.allow_downscale:
+                scale = ADAPTIVE_SCALES[min(self.scale_index + 1, len(ADAPTIVE_SCALES) - 1)]
+        if scale != 1.0:
+            img = img.resize((max(1, int(img.width * scale)), max(1, int(img.height * scale))), Image.BILINEAR)
+        return img, {"codec": self.codecs[content], "quality": quality, "scale": scale, "content": content}
+
+    def record(self, size, timestamp=None, codec=None):
+        """Adds an encoded frame size to the window and adjusts quality/scale toward the budget."""
+        if codec == "png":
+            return
+        self.history.append((time.time() if timestamp is None else timestamp, size))
+        self.frames_since_adjust += 1
+        if not self.adaptive or len(self.history) < 3 or self.frames_since_adjust < ADAPTIVE_WINDOW // 4:
+            return
+        span = self.history[-1][0] - self.history[0][0] + self.interval
+        rate = sum(s for _, s in self.history) / span
+        if rate > self.budget_rate * 1.1:
+            self.frames_since_adjust = 0
+            if self.quality > ADAPTIVE_DOWNSCALE_QUALITY:
+                self.quality = max(ADAPTIVE_DOWNSCALE_QUALITY, self.quality - ADAPTIVE_QUALITY_STEP)
+            elif self.allow_downscale and self.scale_index < len(ADAPTIVE_SCALES) - 1:
+                self.scale_index += 1
+            elif self.quality > ADAPTIVE_MIN_QUALITY:
+                self.quality = max(ADAPTIVE_MIN_QUALITY, self.quality - ADAPTIVE_QUALITY_STEP)
+        elif rate < self.budget_rate * 0.8:
+            self.frames_since_adjust = 0
+            if self.quality < min(ADAPTIVE_DOWNSCALE_QUALITY, self.base_quality):
+                self.quality = min(ADAPTIVE_DOWNSCALE_QUALITY, self.base_quality, self.quality + ADAPTIVE_QUALITY_STEP)
+            elif self.scale_index > 0:
+                self.scale_index -= 1
+            elif self.quality < self.base_quality:
+                self.quality = min(self.base_quality, self.quality + ADAPTIVE_QUALITY_STEP)
+
+def apply_tile_delta(img, data):
+    """Pastes the changed tiles of a delta frame onto the previous reconstructed frame."""
+    magic, width, height, tile_size, count = DELTA_HEADER.unpack_from(data, 0)
+    if magic != DELTA_MAGIC:
+        raise ValueError("Not a delta frame.")
+    if img.size != (width, height):
+        raise ValueError("Delta frame does not match the size of its reference frame.")
+    pos = DELTA_HEADER.size
+    for _ in range(count):
+        column, row, length = DELTA_TILE.unpack_from(data, pos)
+        pos += DELTA_TILE.size
+        tile = Image.open(io.BytesIO(data[pos:pos + length]))
+        img.paste(tile, (column * tile_size, row * tile_size))
+        pos += length
+    return img
+
+class TileDeltaEncoder:
+    """Encodes frames as periodic full keyframes plus the tiles changed since the previous frame.
+
+    An encoded frame only becomes the reference for the next delta once commit() confirms it was
+    written, so a failed write cannot leave later deltas relative to a frame that is not stored.
+    """
+
+    def __init__(self, keyframe_interval=DELTA_KEYFRAME_INTERVAL, tile_size=DELTA_TILE_SIZE):
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.tile_size = tile_size
+        self.reference = None
+        self.since_keyframe = 0
+        self.pending = None
+
+    def encode(self, img, quality, codec="jpeg"):
+        """Returns (data, flags) for the frame; flags include PACK_FLAG_DELTA for delta frames."""
+        img = img.convert("RGB")
+        changed = None
+        if (self.reference is not None and self.reference.size == img.size
+                and self.since_keyframe < self.keyframe_interval):
+            changed = self._changed_tiles(img)
+        total_tiles = (-(-img.width // self.tile_size)) * (-(-img.height // self.tile_size))
+        if changed is None or len(changed) > total_tiles * DELTA_MAX_CHANGED_RATIO:
+            self.pending = (img, 1)
+            return encode_image(img, codec, quality), 0
+
+        self.pending = (img, self.since_keyframe + 1)
+        parts = [DELTA_HEADER.pack(DELTA_MAGIC, img.width, img.height, self.tile_size, len(changed))]
+        for column, row in changed:
+            left, top = column * self.tile_size, row * self.tile_size
+            box = (left, top, min(left + self.tile_size, img.width), min(top + self.tile_size, img.height))
+            tile_data = encode_image(img.crop(box), codec, quality)
+            parts.append(DELTA_TILE.pack(column, row, len(tile_data)))
+            parts.append(tile_data)
+        return b"".join(parts), PACK_FLAG_DELTA
+
+    def commit(self):
+        """Makes the last encoded frame the reference; call once it has been written."""
+        if self.pending is not None:
+            self.reference, self.since_keyframe = self.pending
+            self.pending = None
+
+    def _changed_tiles(self, img):
+        """Lists (column, row) of tiles whose pixels differ from the reference frame."""
+        diff = ImageChops.difference(img, self.reference)
+        bbox = diff.getbbox()
+        if bbox is None:
+            return []
+        size = self.tile_size
+        changed = []
+        for row in range(bbox[1] // size, (bbox[3] - 1) // size + 1):
+            for column in range(bbox[0] // size, (bbox[2] - 1) // size + 1):
+                box = (column * size, row * size,
+                       min((column + 1) * size, img.width), min((row + 1) * size, img.height))
+                if diff.crop(box).getbbox() is not None:
+                    changed.append((column, row))
+        return changed
+
+def fit_to_resolution(img, target_width, target_height, resample=None):
+    """Scales an image to fit the target size, centered on a black background."""
+    aspect_ratio = img.width / img.height
+    target_ratio = target_width / target_height
+    if aspect_ratio > target_ratio:
+        new_width = target_width
+        new_height = int(target_width / aspect_ratio)
+    else:
+        new_height = target_height
+        new_width = int(target_height * aspect_ratio)
+    img_resized = img.resize((new_width, new_height), resample=Image.LANCZOS if resample is None else resample)
+
+    new_img = Image.new("RGB", (target_width, target_height), (0,0,0))
+    x_offset = (target_width - new_width) // 2
+    y_offset = (target_height - new_height) // 2
+    new_img.paste(img_resized, (x_offset, y_offset))
+    return new_img
+
+def live_segment_path(session_folder, session, index):
+    """Path of a live-encoded video segment."""
+    return os.path.join(session_folder, f"{session}_live_{index:04d}.mp4")
+
+def list_live_segments(session_folder, session):
+    """Returns the sorted indexes of a session's live-encoded video segments."""
+    pattern = re.compile(rf"^{re.escape(session)}_live_(\d{{4}})\.mp4$")
+    try:
+        names = os.listdir(session_folder)
+    except OSError:
+        return []
+    return sorted(int(m.group(1)) for m in map(pattern.match, names) if m)
+
+class LiveVideoEncoder:
+    """Pipes raw frames into a persistent FFmpeg process, rolling to a new MP4 segment periodically.
+
+    Segments are fragmented MP4s, so one torn by a crash stays playable up to its last keyframe.
+    """
+
+    def __init__(self, session_folder, session, fps, resolution, segment_seconds, log=None):
+        self.session_folder = session_folder
+        self.session = session
+        self.fps = fps
+        self.size = resolution
+        self.segment_seconds = segment_seconds
+        self.log = log or (lambda message, level="INFO": None)
+        existing = list_live_segments(session_folder, session)
+        self.segment_index = existing[-1] if existing else 0
+        self.process = None
+        self.segment_started = 0.0
+        self.frames_in_segment = 0
+        self.finishers = []
+
+    def _start_segment(self):
+        """Starts a new FFmpeg process for the next segment."""
+        self.segment_index += 1
+        path = live_segment_path(self.session_folder, self.session, self.segment_index)
+        width, height = self.size
+        cmd = [
+            "ffmpeg", "-y",
+            "-f", "rawvideo", "-pix_fmt", "rgb24",
+            "-s", f"{width}x{height}",
+            "-framerate", str(self.fps),
+            "-i", "-",
+            "-c:v", "libx264",
+            "-preset", "veryfast",
+            "-pix_fmt", "yuv420p",
+            "-movflags", "+frag_keyframe+empty_moov",
+            path
+        ]
+        stderr = open(os.path.join(self.session_folder, "ffmpeg_live.log"), "ab")
+        try:
+            self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=stderr)
+        finally:
+            stderr.close()
+        self.segment_started = time.time()
+        self.frames_in_segment = 0
+        self.log(f"Started live segment {os.path.basename(path)}.")
+
+    def _finish_segment(self):
+        """Closes FFmpeg's input; the segment is finalized in the background."""
+        process, index, frames = self.process, self.segment_index, self.frames_in_segment
+        self.process = None
+        process.stdin.close()
+
+        def wait():
+            if process.wait() != 0:
+                self.log(f"FFmpeg exited with code {process.returncode} for live segment {index:04d}.", level="ERROR")
+            else:
+                self.log(f"Finished live segment {index:04d} ({frames} frames).")
+
+        finisher = threading.Thread(target=wait, daemon=True)
+        finisher.start()
+        self.finishers.append(finisher)
+
+    def write(self, img):
+        """Scales a frame to the video resolution and writes it to the current segment."""
+        if self.process is not None and time.time() - self.segment_started >= self.segment_seconds:
+            self._finish_segment()
+        if self.process is None:
+            self._start_segment()
+        frame = fit_to_resolution(img.convert("RGB"), *self.size, resample=Image.BILINEAR)
+        self.process.stdin.write(frame.tobytes())
+        self.frames_in_segment += 1
+
+    def close(self):
+        """Finishes the current segment and waits for every segment to be finalized."""
+        if self.process is not None:
+            self._finish_segment()
+        for finisher in self.finishers:
+            finisher.join()
+        self.finishers = []
+
+def probe_video(path):
+    """Returns (width, height, fps) of a video's first stream, or None if FFmpeg cannot read it."""
+    result = subprocess.run(["ffmpeg", "-hide_banner", "-i", path], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    info = result.stderr.decode(errors="replace")
+    match = re.search(r"Stream #.*?Video: .*?(\d{2,5})x(\d{2,5}).*?([\d.]+) (?:fps|tbr)", info)
+    if match is None or "Invalid data" in info or "moov atom not found" in info:
+        return None
+    return int(match.group(1)), int(match.group(2)), float(match.group(3))
+
+def quarantine_file(session_folder, path, log=None):
+    """Moves a damaged file into the session's quarantine folder without overwriting earlier ones."""
+    folder = os.path.join(session_folder, QUARANTINE_FOLDER)
+    os.makedirs(folder, exist_ok=True)
+    target = unique_output_path(os.path.join(folder, os.path.basename(path)))
+    os.replace(path, target)
+    if log:
+        renamed = "" if os.path.basename(target) == os.path.basename(path) else f" as {os.path.basename(target)}"
+        log(f"Quarantined {os.path.basename(path)}{renamed}.", level="WARNING")
+    return target
+
+def concat_videos(session_folder, inputs, output):
+    """Joins videos with identical streams into output without re-encoding."""
+    list_path = os.path.join(session_folder, "_live_segments.txt")
+    with open(list_path, "w") as f:
+        for path in inputs:
+            f.write("file '{}'\n".format(os.path.abspath(path).replace("'", "'\\''")))
+    temp_output = os.path.join(session_folder, f"{os.path.splitext(os.path.basename(output))[0]}.joining.mp4")
+    try:
+        result = subprocess.run(
+            ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy", temp_output],
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+        )
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.decode(errors="replace")[-500:])
+        os.replace(temp_output, output)
+    finally:
+        os.remove(list_path)
+        if os.path.exists(temp_output):
+            os.remove(temp_output)
+
+def join_live_segments(session_folder, session, log=None):
+    """Joins a recording's live segments into a session video without re-encoding.
+
+    Segments FFmpeg cannot read are quarantined. Stream copy needs identical size and frame rate, so
+    each run of matching segments becomes its own video: <session>.mp4 for a session's first
+    recording, numbered videos (<session>_2.mp4, ...) after that, so earlier videos are never
+    copied again. The segments are removed once joined. Returns the paths of the videos written.
+    """
+    log = log or (lambda message, level="INFO": None)
+    runs = []
+    for index in list_live_segments(session_folder, session):
+        path = live_segment_path(session_folder, session, index)
+        params = probe_video(path)
+        if params is None:
+            quarantine_file(session_folder, path, log)
+        elif runs and runs[-1][0] == params:
+            runs[-1][1].append(path)
+        else:
+            runs.append((params, [path]))
+    written = []
+    for params, segments in runs:
+        target = unique_output_path(os.path.join(session_folder, f"{session}.mp4"))
+        if written:
+            log(f"Live segments switch to {params[0]}x{params[1]} at {params[2]:g} fps; "
+                f"writing {os.path.basename(target)}.", level="WARNING")
+        concat_videos(session_folder, segments, target)
+        for path in segments:
+            os.remove(path)
+        written.append(target)
+    return written
+
+JOURNAL_FILENAME = ".zmxTOOL_journal"
+JOURNAL_COMPACT_LINES = 1000
+QUARANTINE_FOLDER = "_quarantine"
+GROUP_COMMIT_FRAMES = 20
+GROUP_COMMIT_MS = 1000
+
+def write_file_atomic(path, data, mtime=None):
+    """Writes data to a temporary file and renames it into place, so path never holds a partial frame.
+
+    mtime, if given, is stamped on the file (frames carry their capture time this way).
+    """
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    if mtime is not None:
+        os.utime(temp_path, (mtime, mtime))
+    os.replace(temp_path, path)
+
+def fsync_file(path):
+    with open(path, "rb+") as f:
+        os.fsync(f.fileno())
+
+def fsync_directory(path):
+    """Makes renames in a directory durable; a no-op on Windows, where directories cannot be opened."""
+    if os.name == "nt":
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def frame_file_complete(path):
+    """Cheap structural check (no decoding) that an encoded frame file was written to the end."""
+    try:
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            head = f.read(12)
+            if head.startswith(b"\xff\xd8"):
+                f.seek(-2, os.SEEK_END)
+                return f.read(2) == b"\xff\xd9"
+            if head.startswith(b"\x89PNG"):
+                f.seek(-12, os.SEEK_END)
+                return f.read(12)[4:8] == b"IEND"
+            if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+                return struct.unpack("<I", head[4:8])[0] + 8 == size
+    except OSError:
+        pass
+    return False
+
+class FrameJournal:
+    """Append-only record of committed frames, so a session resumes its counter without a scan.
+
+    Each line is "commit <last frame> <frames in session> <unix time>". A torn final line left by a
+    crash is ignored; the file is rewritten with just the newest commit once it grows long.
+    """
+
+    def __init__(self, session_folder):
+        self.session_folder = session_folder
+        self.path = os.path.join(session_folder, JOURNAL_FILENAME)
+        self.lines = None
+
+    def read(self):
+        """Returns (last frame, frame count) from the newest complete commit, or None."""
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                f.seek(max(0, f.tell() - 4096))
+                tail = f.read()
+        except OSError:
+            return None
+        # Only newline-terminated lines are complete.
+        for line in reversed(tail.split(b"\n")[:-1]):
+            fields = line.split()
+            if len(fields) == 4 and fields[0] == b"commit":
+                try:
+                    return int(fields[1]), int(fields[2])
+                except ValueError:
+                    continue
+        return None
+
+    def commit(self, last_frame, frames, sync=True):
+        line = f"commit {last_frame} {frames} {time.time():.3f}\n"
+        if self.lines is None:
+            try:
+                with open(self.path, "rb") as f:
+                    self.lines = f.read().count(b"\n")
+            except OSError:
+                self.lines = 0
+        if self.lines >= JOURNAL_COMPACT_LINES:
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+            fsync_directory(self.session_folder)
+            self.lines = 1
+            return
+        with open(self.path, "a") as f:
+            f.write(line)
+            f.flush()
+            if sync:
+                os.fsync(f.fileno())
+        self.lines += 1
+
+    def adjust_frames(self, delta):
+        """Records a change in the session's frame count (e.g. after retention) without a new frame."""
+        committed = self.read()
+        if committed is not None:
+            self.commit(committed[0], max(0, committed[1] + delta))
+
+def recover_uncommitted_frames(session_folder, session, last_frame, frames, log=None):
+    """Checks the frames written after the last journal commit. Returns the updated (last frame, count).
+
+    Only that tail is examined, by probing the next frame numbers. Complete frames are kept (complete
+    temp files are renamed into place); partial ones are moved to the quarantine folder so they are
+    never fed to FFmpeg.
+    """
+    log = log or (lambda message, level="INFO": None)
+
+    def quarantine(path):
+        quarantine_file(session_folder, path, log)
+
+    frame_number = last_frame + 1
+    while True:
+        found = False
+        for codec in IMAGE_CODECS:
+            path = os.path.join(session_folder, f"{session}_{frame_number:06d}.{codec}")
+            temp_path = f"{path}.tmp"
+            if os.path.exists(temp_path):
+                found = True
+                if not os.path.exists(path) and frame_file_complete(temp_path):
+                    os.replace(temp_path, path)
+                else:
+                    quarantine(temp_path)
+            if os.path.exists(path):
+                found = True
+                if frame_file_complete(path):
+                    last_frame = frame_number
+                    frames += 1
+                else:
+                    quarantine(path)
+        if not found:
+            return last_frame, frames
+        frame_number += 1
+
+class GroupCommitter:
+    """Makes saved frames durable in groups, off the save path.
+
+    The save thread only records what it wrote. A committer thread fsyncs the batch once every_frames
+    frames are pending or the oldest has waited every_ms, then appends a commit to the session journal.
+    A limit of 0 disables that trigger; with both at 0 everything is synced once, on close.
+    """
+
+    def __init__(self, session_folder, every_frames=GROUP_COMMIT_FRAMES, every_ms=GROUP_COMMIT_MS,
+                 sync_pack=None, log=None):
+        self.session_folder = session_folder
+        self.journal = FrameJournal(session_folder)
+        self.every_frames = max(0, every_frames)
+        self.every_seconds = max(0, every_ms) / 1000.0
+        self.sync_pack = sync_pack
+        self.log = log or (lambda message, level="INFO": None)
+        self.cond = threading.Condition()
+        self.paths = []
+        self.pending = 0
+        self.oldest = None
+        self.last = None
+        self.closing = False
+        self.commits = 0
+        self.commit_ms = 0.0
+        committed = self.journal.read()
+        self.committed_frames = committed[1] if committed is not None else 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def add(self, frame_number, frames=None, path=None):
+        """Notes a saved frame (and its file, if stored as one) for the next commit.
+
+        frames=None leaves the journaled frame count as it is, for frames that are not stored as
+        frames (live video), so a crash never leaves the journal counting frames that were lost.
+        """
+        with self.cond:
+            if frames is None:
+                frames = self.last[1] if self.last is not None else self.committed_frames
+            if path is not None:
+                self.paths.append(path)
+            self.pending += 1
+            self.last = (frame_number, frames)
+            if self.oldest is None:
+                self.oldest = time.monotonic()
+            # The first pending frame starts the time limit; the committer may be waiting without one.
+            if self.pending == 1 or (self.every_frames and self.pending >= self.every_frames):
+                self.cond.notify()
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.closing:
+                    if self.every_frames and self.pending >= self.every_frames:
+                        break
+                    if self.pending and self.every_seconds:
+                        wait = self.oldest + self.every_seconds - time.monotonic()
+                        if wait <= 0:
+                            break
+                        self.cond.wait(wait)
+                    else:
+                        self.cond.wait()
+                closing = self.closing
+                paths, self.paths = self.paths, []
+                pending, last = self.pending, self.last
+                self.pending, self.oldest = 0, None
+            if pending:
+                self.commit(paths, last)
+            if closing:
+                return
+
+    def commit(self, paths, last):
+        started = time.perf_counter()
+        try:
+            for path in paths:
+                try:
+                    fsync_file(path)
+                except FileNotFoundError:
+                    pass
+            if self.sync_pack is not None:
+                self.sync_pack()
+            if paths:
+                fsync_directory(self.session_folder)
+            self.journal.commit(*last)
+        except OSError as e:
+            self.log(f"Error committing frames to disk: {e}", level="ERROR")
+            return
+        self.commits += 1
+        self.commit_ms += (time.perf_counter() - started) * 1000
+
+    def close(self):
+        """Commits whatever is still pending and stops the committer thread."""
+        with self.cond:
+            self.closing = True
+            self.cond.notify()
+        self.thread.join()
+
+class PackedFrameWriter:
+    """Appends encoded frames to a session's segmented pack container."""
+
+    def __init__(self, session_folder, session, max_segment_bytes=PACK_SEGMENT_MAX_BYTES):
+        self.session_folder = session_folder
+        self.session = session
+        self.max_segment_bytes = max_segment_bytes
+        self.lock = threading.Lock()
+        self.file = None
+        self.entries = []
+        segments = list_pack_segments(session_folder, session)
+        self._open_segment(segments[-1] if segments else 0)
+
+    def _open_segment(self, index):
+        """Opens a segment for appending, dropping its index and any partial record."""
+        path = pack_segment_path(self.session_folder, self.session, index)
+        entries = []
+        if os.path.exists(path) and os.path.getsize(path) >= PACK_HEADER.size:
+            with open(path, "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                    entries, data_end = read_pack_segment_index(buf, len(buf))
+            self.file = open(path, "r+b")
+            self.file.truncate(data_end)
+            self.file.seek(data_end)
+        else:
+            self.file = open(path, "wb")
+            self.file.write(PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, 0, index))
+        self.segment_index = index
+        self.entries = list(entries)
+
+    def _finish_segment(self):
+        """Writes the trailing index and footer and closes the current segment."""
+        index_offset = self.file.tell()
+        self.file.write(b"".join(PACK_INDEX_ENTRY.pack(*entry) for entry in self.entries))
+        self.file.write(PACK_FOOTER.pack(PACK_FOOTER_MAGIC, index_offset, len(self.entries)))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        self.file = None
+
+    def append(self, frame_number, data, timestamp=None, flags=0):
+        """Appends one encoded frame, rolling over to a new segment when full."""
+        with self.lock:
+            if self.file is None:
+                raise ValueError("Pack writer is closed.")
+            if self.entries and self.file.tell() + PACK_RECORD.size + len(data) > self.max_segment_bytes:
+                self._finish_segment()
+                self._open_segment(self.segment_index + 1)
+            if timestamp is None:
+                timestamp = time.time()
+            offset = self.file.tell()
+            self.file.write(PACK_RECORD.pack(PACK_RECORD_MAGIC, flags, 0, frame_number, timestamp, len(data)))
+            self.file.write(data)
+            self.file.flush()
+            self.entries.append((frame_number, offset + PACK_RECORD.size, len(data), flags, timestamp))
+
+    def sync(self):
+        """Flushes the open segment to disk (used by group commit)."""
+        with self.lock:
+            if self.file is not None:
+                os.fsync(self.file.fileno())
+
+    def close(self):
+        """Finishes the current segment so readers can load its index directly."""
+        with self.lock:
+            if self.file is not None:
+                self._finish_segment()
+
+class PackedFrameReader:
+    """Memory-maps a session's pack segments for O(1) random access by frame number."""
+
+    def __init__(self, session_folder, session):
+        self.files = []
+        self.maps = []
+        self.segments = []
+        self.index = {}
+        self._cache = None
+        for segment in list_pack_segments(session_folder, session):
+            path = pack_segment_path(session_folder, session, segment)
+            if os.path.getsize(path) < PACK_HEADER.size:
+                continue
+            f = open(path, "rb")
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.files.append(f)
+            self.maps.append(buf)
+            self.segments.append(segment)
+            slot = len(self.maps) - 1
+            entries, _ = read_pack_segment_index(buf, len(buf))
+            for frame, offset, length, flags, timestamp in entries:
+                self.index[frame] = (slot, offset, length, flags, timestamp)
+        self.frames = sorted(self.index)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def read_bytes(self, frame_number):
+        """Returns the encoded bytes of a frame."""
+        slot, offset, length, _, _ = self.index[frame_number]
+        return self.maps[slot][offset:offset + length]
+
+    def timestamp(self, frame_number):
+        """Returns the capture timestamp stored with a frame."""
+        return self.index[frame_number][4]
+
+    def is_delta(self, frame_number):
+        return bool(self.index[frame_number][3] & PACK_FLAG_DELTA)
+
+    def open_image(self, frame_number):
+        """Decodes a frame, rebuilding delta frames from the nearest keyframe or cached frame."""
+        if self._cache is not None and self._cache[0] == frame_number:
+            return self._cache[1].copy()
+        if not self.is_delta(frame_number):
+            img = Image.open(io.BytesIO(self.read_bytes(frame_number)))
+            self._cache = (frame_number, img.convert("RGB"))
+            return img
+        position = bisect.bisect_left(self.frames, frame_number)
+        start = position
+        while True:
+            number = self.frames[start]
+            if start < position and self._cache is not None and self._cache[0] == number:
+                img = self._cache[1].copy()
+                break
+            if not self.is_delta(number):
+                img = Image.open(io.BytesIO(self.read_bytes(number))).convert("RGB")
+                break
+            if start == 0:
+                raise ValueError(f"Delta frame {frame_number} has no preceding keyframe.")
+            start -= 1
+        for number in self.frames[start + 1:position + 1]:
+            apply_tile_delta(img, self.read_bytes(number))
+        self._cache = (frame_number, img.copy())
+        return img
+
+    def close(self):
+        self._cache = None
+        for buf in self.maps:
+            buf.close()
+        for f in self.files:
+            f.close()
+        self.maps = []
+        self.files = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class SessionFrameReader:
+    """Random access to every frame of a session, whether stored as files or packed."""
+
+    def __init__(self, session_folder, session):
+        self.session_folder = session_folder
+        self.files = list_frame_files(session_folder, session)
+        self.packed = None
+        if list_pack_segments(session_folder, session):
+            self.packed = PackedFrameReader(session_folder, session)
+        numbers = set(self.files)
+        if self.packed is not None:
+            numbers.update(self.packed.index)
+        self.frames = sorted(numbers)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def frame_numbers(self):
+        return self.frames
+
+    def read_bytes(self, frame_number):
+        """Returns the encoded bytes of a frame."""
+        if self.packed is not None and frame_number in self.packed.index:
+            return self.packed.read_bytes(frame_number)
+        with open(os.path.join(self.session_folder, self.files[frame_number]), "rb") as f:
+            return f.read()
+
+    def timestamp(self, frame_number):
+        """Returns when a frame was captured (file mtime for per-file frames)."""
+        if self.packed is not None and frame_number in self.packed.index:
+            return self.packed.timestamp(frame_number)
+        return os.path.getmtime(os.path.join(self.session_folder, self.files[frame_number]))
+
+    def open_encoded(self, frame_number):
+        """Opens a frame without decoding it (so it can still be drafted), or None for delta frames."""
+        if self.packed is not None and frame_number in self.packed.index:
+            if self.packed.is_delta(frame_number):
+                return None
+            return Image.open(io.BytesIO(self.packed.read_bytes(frame_number)))
+        return Image.open(os.path.join(self.session_folder, self.files[frame_number]))
+
+    def signature(self, frame_number):
+        """[frame, size, timestamp] of a frame; changes whenever the stored frame is rewritten."""
+        if self.packed is not None and frame_number in self.packed.index:
+            _, _, length, _, timestamp = self.packed.index[frame_number]
+            return [frame_number, length, timestamp]
+        info = os.stat(os.path.join(self.session_folder, self.files[frame_number]))
+        return [frame_number, info.st_size, info.st_mtime]
+
+    def open_image(self, frame_number):
+        """Decodes a frame into a PIL image."""
+        if self.packed is not None and frame_number in self.packed.index:
+            return self.packed.open_image(frame_number)
+        return Image.open(os.path.join(self.session_folder, self.files[frame_number]))
+
+    def close(self):
+        if self.packed is not None:
+            self.packed.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def pack_session_files(session_folder, session, remove_files=True, progress=None):
+    """Moves a session's per-file frames into its pack container. Returns the frame count."""
+    files = list_frame_files(session_folder, session)
+    if not files:
+        return 0
+    with PackedFrameReader(session_folder, session) as packed:
+        already_packed = set(packed.index)
+    writer = PackedFrameWriter(session_folder, session)
+    numbers = sorted(n for n in files if n not in already_packed)
+    try:
+        for i, frame_number in enumerate(numbers, start=1):
+            path = os.path.join(session_folder, files[frame_number])
+            with open(path, "rb") as f:
+                writer.append(frame_number, f.read(), timestamp=os.path.getmtime(path))
+            if progress:
+                progress(i, len(numbers))
+    finally:
+        writer.close()
+    if remove_files:
+        for filename in files.values():
+            os.remove(os.path.join(session_folder, filename))
+    return len(numbers)
+
+def unpack_session_files(session_folder, session, remove_pack=True, progress=None):
+    """Writes every packed frame back out as an individual file. Returns the frame count."""
+    with PackedFrameReader(session_folder, session) as packed:
+        for i, frame_number in enumerate(packed.frames, start=1):
+            if packed.is_delta(frame_number):
+                buffer = io.BytesIO()
+                packed.open_image(frame_number).save(buffer, "JPEG", quality=95)
+                data = buffer.getvalue()
+            else:
+                data = packed.read_bytes(frame_number)
+            path = os.path.join(session_folder, f"{session}_{frame_number:06d}.{frame_extension(data)}")
+            with open(path, "wb") as f:
+                f.write(data)
+            timestamp = packed.timestamp(frame_number)
+            os.utime(path, (timestamp, timestamp))
+            if progress:
+                progress(i, len(packed.frames))
+        count = len(packed.frames)
+    if remove_pack:
+        for segment in list_pack_segments(session_folder, session):
+            os.remove(pack_segment_path(session_folder, session, segment))
+    return count
+
+CONVERSION_JOBS_FILENAME = "conversion_jobs.json"
+CONVERSION_MAX_CONCURRENT = max(1, (os.cpu_count() or 1) // 4)
+CONVERSION_WORK_FOLDER = "_processed_video"
+CONVERSION_MANIFEST = "frames.json"
+
+def unique_output_path(path):
+    """Returns path, or path with a numeric suffix if a file of that name already exists."""
+    root, ext = os.path.splitext(path)
+    candidate, n = path, 2
+    while os.path.exists(candidate):
+        candidate = f"{root}_{n}{ext}"
+        n += 1
+    return candidate
+
+def select_conversion_frames(frames, session_folder, selection=None):
+    """Resolves a stored range selection (times may still be text) against a session's frames."""
+    frame_numbers = frames.frame_numbers()
+    if not selection or not frame_numbers:
+        return frame_numbers
+    selection = dict(selection)
+    reference = frames.timestamp(frame_numbers[0])
+    for key in ("start", "end"):
+        if isinstance(selection.get(key), str):
+            selection[key] = parse_time_bound(selection[key], reference)
+    return resolve_frame_selection(frames, session_folder, **selection)
+
+def describe_selection(selection):
+    """Short human-readable summary of a range selection for the job list."""
+    if not selection:
+        return "all frames"
+    parts = []
+    if selection.get("first_frame") is not None or selection.get("last_frame") is not None:
+        parts.append(f"frames {selection.get('first_frame') or 1}-{selection.get('last_frame') or 'end'}")
+    if selection.get("start") or selection.get("end"):
+        parts.append(f"{selection.get('start') or 'start'} to {selection.get('end') or 'end'}")
+    if selection.get("min_diff") is not None:
+        parts.append(f"diff > {selection['min_diff'] * 100:g}%")
+    if selection.get("triggers"):
+        parts.append("input only")
+    return ", ".join(parts) or "all frames"
+
+class ConversionJob:
+    """One queued session-to-video conversion. Everything except the runtime handles is persisted."""
+
+    FIELDS = ("job_id", "session_folder", "session", "output_file", "fps", "resolution", "selection",
+              "priority", "state", "stage", "progress", "total_frames", "error", "created")
+
+    def __init__(self, session_folder, session, output_file, fps, resolution, selection=None, priority=0,
+                 job_id=None, state="queued", stage="", progress=0.0, total_frames=0, error="", created=None):
+        self.job_id = job_id
+        self.session_folder = session_folder
+        self.session = session
+        self.output_file = output_file
+        self.fps = fps
+        self.resolution = resolution
+        self.selection = selection
+        self.priority = priority
+        self.state = state
+        self.stage = stage
+        self.progress = progress
+        self.total_frames = total_frames
+        self.error = error
+        self.created = created or time.time()
+        self.cancel_event = threading.Event()
+        self.process = None
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{name: data[name] for name in cls.FIELDS if name in data})
+
+    @property
+    def work_dir(self):
+        """Per-job folder of resized frames; kept across cancel/resume so prepared frames are reused."""
+        return os.path.join(self.session_folder, CONVERSION_WORK_FOLDER, f"job_{self.job_id}")
+
+    def describe_progress(self):
+        if self.state == "running":
+            return f"{self.stage} {self.progress * 100:.0f}%"
+        if self.state in ("queued", "cancelled") and self.progress:
+            return f"{self.stage} {self.progress * 100:.0f}%"
+        return self.error if self.state == "failed" else ""
+
+def prepare_conversion_frames(job, progress=None):
+    """Writes the job's selected frames, fitted to its resolution, as numbered JPEGs in its work dir.
+
+    Frames already present from an earlier, cancelled run are reused if a manifest of frame numbers,
+    sizes and timestamps shows the same source frame is still in that position. Returns the frame
+    count, or None if the job was cancelled.
+    """
+    target_width, target_height = map(int, job.resolution.split('x'))
+    with SessionFrameReader(job.session_folder, job.session) as frames:
+        frame_numbers = select_conversion_frames(frames, job.session_folder, job.selection)
+        if not frame_numbers:
+            raise ValueError("No frames match the selected range.")
+        signatures = [frames.signature(n) for n in frame_numbers]
+        job.total_frames = len(frame_numbers)
+        os.makedirs(job.work_dir, exist_ok=True)
+        manifest_path = os.path.join(job.work_dir, CONVERSION_MANIFEST)
+        try:
+            with open(manifest_path, "r") as f:
+                prepared = json.load(f)
+        except (OSError, ValueError):
+            prepared = []
+        for name in os.listdir(job.work_dir):
+            match = re.fullmatch(r"frame_(\d{6})\.jpeg", name)
+            if match:
+                i = int(match.group(1))
+                if i > len(signatures) or i > len(prepared) or prepared[i - 1] != signatures[i - 1]:
+                    os.remove(os.path.join(job.work_dir, name))
+        write_file_atomic(manifest_path, json.dumps(signatures).encode())
+        for i, frame_number in enumerate(frame_numbers, start=1):
+            if job.cancel_event.is_set():
+                return None
+            path = os.path.join(job.work_dir, f"frame_{i:06d}.jpeg")
+            if not os.path.exists(path):
+                img = fit_to_resolution(frames.open_image(frame_number), target_width, target_height)
+                img.save(f"{path}.tmp", "JPEG", quality=95)
+                os.replace(f"{path}.tmp", path)
+            if progress:
+                progress(i, len(frame_numbers))
+    return len(frame_numbers)
+
+def encode_conversion_frames(job, threads, progress=None):
+    """Encodes the job's prepared frames with FFmpeg, reporting -progress frame counts.
+
+    Writes to a temporary file that replaces the output only on success. Returns True on success,
+    False if cancelled; raises RuntimeError with FFmpeg's last output lines on failure.
+    """
+    root, ext = os.path.splitext(job.output_file)
+    temp_output = f"{root}.job{job.job_id}.partial{ext}"
+    cmd = [
+        "ffmpeg", "-y", "-nostats", "-loglevel", "error",
+        "-framerate", str(job.fps),
+        "-i", os.path.join(job.work_dir, "frame_%06d.jpeg"),
+        "-c:v", "libx264",
+        "-pix_fmt", "yuv420p",
+        "-threads", str(threads),
+        "-progress", "pipe:1",
+        temp_output
+    ]
+    job.process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+    if job.cancel_event.is_set():
+        job.process.terminate()
+    messages = collections.deque(maxlen=10)
+    for line in job.process.stdout:
+        key, sep, value = line.strip().partition("=")
+        if not sep:
+            messages.append(line.strip())
+        elif key == "frame" and progress:
+            try:
+                progress(int(value), job.total_frames)
+            except ValueError:
+                pass
+    job.process.wait()
+    returncode, job.process = job.process.returncode, None
+    if job.cancel_event.is_set():
+        if os.path.exists(temp_output):
+            os.remove(temp_output)
+        return False
+    if returncode != 0:
+        if os.path.exists(temp_output):
+            os.remove(temp_output)
+        raise RuntimeError(f"FFmpeg failed with return code {returncode}: {' '.join(messages)}")
+    os.replace(temp_output, job.output_file)
+    return True
+
+class ConversionScheduler:
+    """Runs queued conversion jobs, highest priority first, with at most max_concurrent at a time.
+
+    Jobs for the same session or output file run one after another. FFmpeg's encoder threads are
+    split between the concurrent slots so a full queue uses every core without oversubscribing them.
+    Job state is saved to a JSON file on every change; jobs that were running when the application
+    exited are queued again on the next start.
+    """
+
+    def __init__(self, state_path, max_concurrent=CONVERSION_MAX_CONCURRENT, log=None, on_change=None):
+        self.state_path = state_path
+        self.max_concurrent = max(1, max_concurrent)
+        self.log = log or (lambda message, level="INFO": None)
+        self.on_change = on_change or (lambda: None)
+        self.lock = threading.RLock()
+        self.jobs = {}
+        self.closing = False
+        if os.path.exists(state_path):
+            try:
+                with open(state_path, "r") as f:
+                    for data in json.load(f):
+                        job = ConversionJob.from_dict(data)
+                        if job.state == "running":
+                            job.state = "queued"
+                        self.jobs[job.job_id] = job
+            except (OSError, ValueError, TypeError) as e:
+                self.log(f"Ignoring unreadable conversion queue: {e}", level="WARNING")
+
+    def save(self):
+        with self.lock:
+            data = [job.to_dict() for job in self.sorted_jobs()]
+        temp_path = f"{self.state_path}.tmp"
+        try:
+            with open(temp_path, "w") as f:
+                json.dump(data, f, indent=4)
+            os.replace(temp_path, self.state_path)
+        except OSError as e:
+            self.log(f"Error saving conversion queue: {e}", level="ERROR")
+
+    def changed(self):
+        self.save()
+        self.on_change()
+
+    def sorted_jobs(self):
+        """Jobs in the order they will run: highest priority first, then oldest."""
+        with self.lock:
+            return sorted(self.jobs.values(), key=lambda job: (-job.priority, job.job_id))
+
+    def submit(self, job):
+        with self.lock:
+            job.job_id = max(self.jobs, default=0) + 1
+            self.jobs[job.job_id] = job
+        self.log(f"Queued conversion job {job.job_id}: session '{job.session}' ({describe_selection(job.selection)}).")
+        self.changed()
+        self.dispatch()
+        return job
+
+    def set_priority(self, job_id, priority):
+        with self.lock:
+            self.jobs[job_id].priority = priority
+        self.changed()
+
+    def cancel(self, job_id):
+        """Stops a queued or running job; its prepared frames are kept for a later resume."""
+        with self.lock:
+            job = self.jobs[job_id]
+            if job.state not in ("queued", "running"):
+                return
+            job.cancel_event.set()
+            if job.process is not None:
+                job.process.terminate()
+            if job.state == "queued":
+                job.state = "cancelled"
+        self.changed()
+
+    def resume(self, job_id):
+        """Re-queues a cancelled or failed job."""
+        with self.lock:
+            job = self.jobs[job_id]
+            if job.state not in ("cancelled", "failed"):
+                return
+            job.state, job.error = "queued", ""
+            job.cancel_event = threading.Event()
+        self.changed()
+        self.dispatch()
+
+    def remove(self, job_id):
+        """Forgets a job that is not running and deletes its prepared frames."""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.state == "running":
+                return
+            del self.jobs[job_id]
+        shutil.rmtree(job.work_dir, ignore_errors=True)
+        self.changed()
+
+    def set_max_concurrent(self, max_concurrent):
+        with self.lock:
+            self.max_concurrent = max(1, max_concurrent)
+        self.dispatch()
+
+    def output_path(self, path):
+        """Like unique_output_path, but also avoids outputs of jobs that have not finished yet."""
+        with self.lock:
+            claimed = {job.output_file for job in self.jobs.values() if job.state != "done"}
+        root, ext = os.path.splitext(path)
+        candidate, n = path, 2
+        while candidate in claimed or os.path.exists(candidate):
+            candidate = f"{root}_{n}{ext}"
+            n += 1
+        return candidate
+
+    def counts(self):
+        with self.lock:
+            return collections.Counter(job.state for job in self.jobs.values())
+
+    def dispatch(self):
+        """Starts the highest-priority queued jobs until the concurrency limit is reached."""
+        with self.lock:
+            if self.closing:
+                return
+            active = [job for job in self.jobs.values() if job.state == "running"]
+            for job in self.sorted_jobs():
+                if len(active) >= self.max_concurrent:
+                    break
+                if job.state == "queued" and not any(
+                        other.session_folder == job.session_folder or other.output_file == job.output_file
+                        for other in active):
+                    job.state, job.progress = "running", 0.0
+                    active.append(job)
+                    threading.Thread(target=self.run_job, args=(job,), daemon=True).start()
+        self.changed()
+
+    def run_job(self, job):
+        last_reported = [None]
+
+        def progress(stage, done, total):
+            job.stage = stage
+            job.progress = done / total if total else 0.0
+            percent = int(job.progress * 100)
+            if (stage, percent) != last_reported[0]:
+                last_reported[0] = (stage, percent)
+                self.on_change()
+
+        self.log(f"Starting conversion job {job.job_id} for session '{job.session}'.")
+        try:
+            threads = max(1, (os.cpu_count() or 1) // self.max_concurrent)
+            completed = (
+                prepare_conversion_frames(job, lambda done, total: progress("preparing", done, total)) is not None
+                and encode_conversion_frames(job, threads, lambda done, total: progress("encoding", done, total))
+            )
+            if completed:
+                shutil.rmtree(job.work_dir, ignore_errors=True)
+                state = "done"
+                self.log(f"Converted session '{job.session}' to video file {job.output_file} at {job.fps}fps.")
+            else:
+                # Frames prepared so far stay in the work dir for resume.
+                state = "queued" if self.closing else "cancelled"
+                self.log(f"Conversion job {job.job_id} {'interrupted' if self.closing else 'cancelled'}.")
+        except Exception as e:
+            state, job.error = "failed", str(e)
+            self.log(f"Conversion job {job.job_id} for session '{job.session}' failed: {e}", level="ERROR")
+        with self.lock:
+            job.state = state
+            if state == "done":
+                job.stage, job.progress = "done", 1.0
+        self.dispatch()
+
+    def shutdown(self):
+        """Stops running jobs so they are resumed on the next start."""
+        with self.lock:
+            self.closing = True
+            for job in self.jobs.values():
+                if job.state == "running":
+                    job.cancel_event.set()
+                    if job.process is not None:
+                        job.process.terminate()
+                    job.state = "queued"
+        self.save()
+
+CONTROL_DEFAULT_ADDRESS = (
+    os.path.join(os.path.expanduser("~"), ".zmxTOOL_control.sock") if hasattr(socket, "AF_UNIX")
+    else "127.0.0.1:47820"
+)
+CONTROL_CALL_TIMEOUT = 10.0
+CONTROL_STREAM_INTERVAL = 1.0
+CONTROL_STREAM_MIN_INTERVAL = 0.1
+CONTROL_RATE_KEYS = ("captured", "saved", "skipped", "dropped", "bytes")
+
+def parse_control_address(address):
+    """Returns (family, address): localhost TCP for "host:port" or ":port", otherwise a Unix socket path."""
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and os.sep not in host:
+        return socket.AF_INET, (host or "127.0.0.1", int(port))
+    if not hasattr(socket, "AF_UNIX"):
+        raise ValueError(f"Unix sockets are not available here; use a localhost address such as {CONTROL_DEFAULT_ADDRESS}.")
+    return socket.AF_UNIX, address
+
+def connect_control(address, timeout=None):
+    """Opens a client connection to a control server."""
+    family, target = parse_control_address(address)
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(target)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+class ControlRequestHandler(socketserver.StreamRequestHandler):
+    """Reads newline-delimited JSON requests and writes one JSON reply line per request."""
+
+    def handle(self):
+        control = self.server.control
+        try:
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict) or not isinstance(request.get("cmd"), str):
+                        raise ValueError("expected an object with a 'cmd' string")
+                except ValueError as e:
+                    self.send({"ok": False, "error": f"Bad request: {e}"})
+                    continue
+                if request["cmd"] == "stream":
+                    control.stream(request, self.send)
+                    return
+                self.send(control.dispatch(request))
+        except OSError:
+            pass  # The client went away.
+
+    def send(self, message):
+        self.wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+class ControlServer:
+    """Local control API: newline-delimited JSON commands over a Unix socket or localhost TCP.
+
+    commands maps a command name to a callable taking the request dict and returning a reply dict.
+    "stream" is built in: it repeats the "stats" reply every interval seconds, adding per-second rates
+    for CONTROL_RATE_KEYS, until the client disconnects. Each connection is served on its own thread.
+    """
+
+    def __init__(self, address, commands, log=None):
+        self.address = address
+        self.commands = commands
+        self.log = log or (lambda message, level="INFO": None)
+        self.stopping = threading.Event()
+        family, target = parse_control_address(address)
+        if family == socket.AF_INET:
+            if target[0] not in ("127.0.0.1", "localhost", "::1"):
+                raise ValueError("The control server only listens on localhost.")
+            self.server = socketserver.ThreadingTCPServer(target, ControlRequestHandler, bind_and_activate=False)
+            self.server.allow_reuse_address = True
+        else:
+            self.remove_stale_socket(target)
+            self.server = socketserver.ThreadingUnixStreamServer(target, ControlRequestHandler, bind_and_activate=False)
+        self.server.daemon_threads = True
+        self.server.control = self
+        self.socket_id = None
+        try:
+            if family == socket.AF_INET:
+                self.server.server_bind()
+            else:
+                # Created owner-only from the start, so there is no window before a chmod.
+                umask = os.umask(0o177)
+                try:
+                    self.server.server_bind()
+                finally:
+                    os.umask(umask)
+                info = os.lstat(target)
+                self.socket_id = (info.st_dev, info.st_ino)
+            self.server.server_activate()
+        except OSError:
+            self.server.server_close()
+            raise
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def remove_stale_socket(self, path):
+        """Removes a socket file left behind by a crashed instance; refuses if one is still listening.
+
+        Anything at the path that is not a socket is left alone.
+        """
+        try:
+            info = os.lstat(path)
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(info.st_mode):
+            raise OSError(f"{path} exists and is not a socket; choose another control address.")
+        try:
+            connect_control(path, timeout=1.0).close()
+        except OSError:
+            os.remove(path)
+            return
+        raise OSError(f"Another recorder is already listening on {path}.")
+
+    def dispatch(self, request):
+        handler = self.commands.get(request["cmd"])
+        if handler is None:
+            return {"ok": False, "error": f"Unknown command '{request['cmd']}'.",
+                    "commands": sorted(self.commands) + ["stream"]}
+        try:
+            return handler(request)
+        except Exception as e:
+            self.log(f"Control command '{request['cmd']}' failed: {e}", level="ERROR")
+            return {"ok": False, "error": str(e)}
+
+    def stream(self, request, send):
+        try:
+            interval = max(CONTROL_STREAM_MIN_INTERVAL, float(request.get("interval", CONTROL_STREAM_INTERVAL)))
+        except (TypeError, ValueError):
+            send({"ok": False, "error": "interval must be a number of seconds."})
+            return
+        previous = None
+        while not self.stopping.is_set():
+            stats = self.dispatch({"cmd": "stats"})
+            now = time.monotonic()
+            if previous is not None and stats.get("ok"):
+                elapsed = now - previous[0]
+                for key in CONTROL_RATE_KEYS:
+                    if key in stats and key in previous[1]:
+                        stats[f"{key}_per_sec"] = max(0.0, (stats[key] - previous[1][key]) / elapsed)
+            previous = (now, stats)
+            send(stats)
+            if self.stopping.wait(interval):
+                break
 
-def resource_path(relative_path):
-    """Get absolute path to resource, works for dev and for PyInstaller."""
+    def close(self):
+        self.stopping.set()
+        self.server.shutdown()
+        self.server.server_close()
+        family, target = parse_control_address(self.address)
+        if self.socket_id is not None:
+            try:
+                info = os.lstat(target)
+            except FileNotFoundError:
+                return
+            # Only remove the socket this server created, not one a newer instance bound since.
+            if stat.S_ISSOCK(info.st_mode) and (info.st_dev, info.st_ino) == self.socket_id:
+                os.remove(target)
+
+def parse_control_arguments(args):
+    """Turns ["set", "interval=2", "sensitivity=5"] into {"cmd": "set", "interval": 2, "sensitivity": 5}."""
+    request = {"cmd": args[0]}
+    for arg in args[1:]:
+        key, sep, value = arg.partition("=")
+        if not sep:
+            raise ValueError(f"Expected key=value, got '{arg}'.")
+        try:
+            request[key] = json.loads(value)
+        except ValueError:
+            request[key] = value
+    return request
+
+def run_control_client(args, address=None):
+    """Stand-in client: sends one command to a running recorder and prints each reply line."""
     try:
-        base_path = sys._MEIPASS
-    except Exception:
-        base_path = os.path.abspath(".")
-    return os.path.join(base_path, relative_path)
+        request = parse_control_arguments(args)
+        sock = connect_control(address or CONTROL_DEFAULT_ADDRESS)
+    except (ValueError, OSError) as e:
+        print(f"Control error: {e}", file=sys.stderr)
+        return 2
+    ok = True
+    try:
+        with sock, sock.makefile("rwb") as stream:
+            stream.write(json.dumps(request).encode("utf-8") + b"\n")
+            stream.flush()
+            for line in stream:
+                reply = json.loads(line)
+                print(json.dumps(reply), flush=True)
+                ok = reply.get("ok", False)
+                if request["cmd"] != "stream":
+                    break
+    except KeyboardInterrupt:
+        pass
+    return 0 if ok else 1
 
 class ScreenshotApp:
     def __init__(self, root):
         self.root = root
         self.root.title("zmxTOOL Screen(shot) Recorder")
-        self.root.geometry("800x700")
+        self.root.geometry("800x990")
         self.root.resizable(False, False)
 
         # Initialize variables
@@ -48,15 +2453,57 @@ class ScreenshotApp:
         self.enable_logging = tk.BooleanVar(value=True)
         self.session_name = tk.StringVar(value="")
         self.sessions = []
+        self.session_scan = 0
+        self.session_thread = None
+        self.session_locks = SessionLocks()
+        self.capture_session_folder = None
+        self.quitting = False
+        self.monitors = []
+        self.monitor_vars = {}
+        self.monitor_thread = None
+        self.storage_backend = tk.StringVar(value="files")
+        self.keyframe_interval = tk.IntVar(value=DELTA_KEYFRAME_INTERVAL)
+        self.live_segment_minutes = tk.IntVar(value=LIVE_SEGMENT_MINUTES)
+        self.budget_mb_per_hour = tk.DoubleVar(value=0.0)
+        self.session_budget_mb = tk.IntVar(value=0)
+        self.allow_downscale = tk.BooleanVar(value=False)
+        self.text_codec = tk.StringVar(value="jpeg")
+        self.photo_codec = tk.StringVar(value="jpeg")
+        self.min_free_space_mb = tk.IntVar(value=500)
+        self.backpressure_policy = tk.StringVar(value="block")
+        self.save_queue_size = tk.IntVar(value=SAVE_QUEUE_SIZE)
+        self.live_thumbnails = tk.BooleanVar(value=True)
+        self.retention_rules = tk.StringVar(value="")
+        self.retention_background = tk.BooleanVar(value=False)
+        self.retention_frames_per_second = tk.IntVar(value=RETENTION_FRAMES_PER_SECOND)
+        self.retention_mb_per_second = tk.IntVar(value=RETENTION_MB_PER_SECOND)
+        self.retention_max_cpu = tk.IntVar(value=RETENTION_MAX_CPU_PERCENT)
+        self.conversion_max_concurrent = tk.IntVar(value=CONVERSION_MAX_CONCURRENT)
 
         self.is_running = False
         self.thread = None
         self.stop_event = threading.Event()
         self.counter = 1
+        self.frames_in_session = 0
+        self.pack_writer = None
+        self.delta_encoder = None
+        self.encoder_controller = None
+        self.live_encoder = None
+        self.session_bytes = 0
+        self.save_queue = None
+        self.save_thread = None
+        self.metadata_store = None
+        self.thumbnail_worker = None
+        self.committer = None
+        self.retention_thread = None
+        self.retention_stop = threading.Event()
+        self.capture_stats = self.new_capture_stats()
 
         self.log_file = None
         self.previous_image = None
         self.input_activity = False
+        self.key_count = 0
+        self.mouse_count = 0
         self.input_lock = threading.Lock()
 
         self.keyboard_listener = None
@@ -70,12 +2517,31 @@ class ScreenshotApp:
         style.configure("red.Horizontal.TProgressbar", foreground='red', background='red')
 
         self.capture_mode = tk.StringVar(value="monitors")
+        self.multi_region_mode = tk.StringVar(value=MULTI_REGION_MODES[0])
+        self.group_commit_frames = tk.IntVar(value=GROUP_COMMIT_FRAMES)
+        self.group_commit_ms = tk.IntVar(value=GROUP_COMMIT_MS)
+        self.control_enabled = tk.BooleanVar(value=False)
+        self.control_address = tk.StringVar(value=CONTROL_DEFAULT_ADDRESS)
+        self.control_server = None
         self.selected_resolution = tk.StringVar(value="1920x1080")
 
         # Create the UI
         self.create_widgets()
         self.load_settings()
         self.populate_monitors()
+        self.root.after(60 * 1000, self.schedule_retention)
+
+        self.conversion_window = None
+        self.conversion_scheduler = ConversionScheduler(
+            os.path.join(os.path.dirname(self.settings_file), CONVERSION_JOBS_FILENAME),
+            max_concurrent=self.conversion_max_concurrent.get(), log=self.log_event,
+            on_change=lambda: self.root.after(0, self.refresh_conversion_queue)
+        )
+        self.conversion_max_concurrent.trace_add('write', lambda *args: self.on_conversion_limit_change())
+        # Jobs left queued by the last run resume once the window is up.
+        self.root.after(5 * 1000, self.conversion_scheduler.dispatch)
+        if self.control_enabled.get():
+            self.toggle_control_server()
 
         self.mouse_pressed = False
 
@@ -120,6 +2586,17 @@ class ScreenshotApp:
         self.interval_spinbox.set(5.0)
         self.settings_widgets.append(self.interval_spinbox)
 
+        control_frame = ttk.Frame(file_frame)
+        control_frame.pack(fill='x', **padding)
+        ttk.Label(control_frame, text="Control Server:").pack(side='left')
+        self.control_check = ttk.Checkbutton(
+            control_frame, text="Enable", variable=self.control_enabled, command=self.toggle_control_server
+        )
+        self.control_check.pack(side='left', padx=(5,5))
+        ttk.Label(control_frame, text="Address (socket path or host:port):").pack(side='left', padx=(5,0))
+        self.control_address_entry = ttk.Entry(control_frame, textvariable=self.control_address, width=30)
+        self.control_address_entry.pack(side='left', padx=(5,5))
+
         session_frame = ttk.Frame(file_frame)
         session_frame.pack(fill='x', **padding)
         ttk.Label(session_frame, text="Session:").pack(side='left')
@@ -133,12 +2610,146 @@ class ScreenshotApp:
         self.new_session_entry.bind("<KeyRelease>", self.on_session_name_change)
         self.settings_widgets.append(self.new_session_entry)
 
+        storage_frame = ttk.Frame(file_frame)
+        storage_frame.pack(fill='x', **padding)
+        ttk.Label(storage_frame, text="Storage:").pack(side='left')
+        self.storage_selector = ttk.Combobox(
+            storage_frame, textvariable=self.storage_backend,
+            values=["files", "pack", "delta", "live"], state='readonly', width=8
+        )
+        self.storage_selector.pack(side='left', padx=(5,5))
+        self.settings_widgets.append(self.storage_selector)
+        ttk.Label(storage_frame, text="Keyframe every:").pack(side='left', padx=(5,0))
+        self.keyframe_spinbox = ttk.Spinbox(
+            storage_frame, textvariable=self.keyframe_interval, from_=1, to=600,
+            increment=1, width=5
+        )
+        self.keyframe_spinbox.pack(side='left', padx=(5,5))
+        self.settings_widgets.append(self.keyframe_spinbox)
+        self.pack_button = ttk.Button(storage_frame, text="Pack Session", command=self.pack_session)
+        self.pack_button.pack(side='left', padx=(10,5))
+        self.settings_widgets.append(self.pack_button)
+        self.unpack_button = ttk.Button(storage_frame, text="Unpack Session", command=self.unpack_session)
+        self.unpack_button.pack(side='left', padx=(5,5))
+        self.settings_widgets.append(self.unpack_button)
+
+        browse_frame = ttk.Frame(file_frame)
+        browse_frame.pack(fill='x', **padding)
+        self.browse_frames_button = ttk.Button(browse_frame, text="Browse Frames", command=self.open_frame_browser)
+        self.browse_frames_button.pack(side='left')
+        self.build_thumbnails_button = ttk.Button(browse_frame, text="Build Thumbnails", command=self.build_session_thumbnails)
+        self.build_thumbnails_button.pack(side='left', padx=(10,5))
+        self.settings_widgets.append(self.build_thumbnails_button)
+        self.contact_sheets_button = ttk.Button(browse_frame, text="Contact Sheets", command=self.build_session_contact_sheets)
+        self.contact_sheets_button.pack(side='left', padx=(5,5))
+        self.settings_widgets.append(self.contact_sheets_button)
+        self.retention_button = ttk.Button(browse_frame, text="Retention...", command=self.open_retention_dialog)
+        self.retention_button.pack(side='left', padx=(5,5))
+        self.live_thumbnails_check = ttk.Checkbutton(
+            browse_frame, text="Update thumbnails while capturing", variable=self.live_thumbnails
+        )
+        self.live_thumbnails_check.pack(side='left', padx=(10,0))
+        self.settings_widgets.append(self.live_thumbnails_check)
+
+        live_frame = ttk.Frame(file_frame)
+        live_frame.pack(fill='x', **padding)
+        ttk.Label(live_frame, text="Live video segment (minutes):").pack(side='left')
+        self.live_segment_spinbox = ttk.Spinbox(
+            live_frame, textvariable=self.live_segment_minutes, from_=1, to=240,
+            increment=1, width=5
+        )
+        self.live_segment_spinbox.pack(side='left', padx=(5,5))
+        self.settings_widgets.append(self.live_segment_spinbox)
+        ttk.Label(live_frame, text="(\"live\" storage encodes at the Video Conversion FPS and resolution)").pack(side='left', padx=(5,0))
+
         log_frame = ttk.Frame(file_frame)
         log_frame.pack(fill='x', **padding)
         self.logging_check = ttk.Checkbutton(log_frame, text="Enable Logging", variable=self.enable_logging)
         self.logging_check.pack(side='left')
         self.settings_widgets.append(self.logging_check)
 
+        # --- Encoding ---
+        encoding_frame = ttk.LabelFrame(self.root, text="Encoding")
+        encoding_frame.pack(fill='x', padx=10, pady=5)
+
+        budget_frame = ttk.Frame(encoding_frame)
+        budget_frame.pack(fill='x', **padding)
+        ttk.Label(budget_frame, text="Budget (MB/hour, 0 = off):").pack(side='left')
+        self.budget_spinbox = ttk.Spinbox(
+            budget_frame, textvariable=self.budget_mb_per_hour, from_=0, to=100000,
+            increment=50, width=8
+        )
+        self.budget_spinbox.pack(side='left', padx=(5,5))
+        self.settings_widgets.append(self.budget_spinbox)
+        ttk.Label(budget_frame, text="Session cap (MB):").pack(side='left', padx=(10,0))
+        self.session_budget_spinbox = ttk.Spinbox(
+            budget_frame, textvariable=self.session_budget_mb, from_=0, to=10000000,
+            increment=100, width=8
+        )
+        self.session_budget_spinbox.pack(side='left', padx=(5,5))
+        self.settings_widgets.append(self.session_budget_spinbox)
+        self.downscale_check = ttk.Checkbutton(budget_frame, text="Allow downscale", variable=self.allow_downscale)
+        self.downscale_check.pack(side='left', padx=(10,0))
+        self.settings_widgets.append(self.downscale_check)
+
+        codec_frame = ttk.Frame(encoding_frame)
+        codec_frame.pack(fill='x', **padding)
+        ttk.Label(codec_frame, text="Text/UI codec:").pack(side='left')
+        self.text_codec_selector = ttk.Combobox(
+            codec_frame, textvariable=self.text_codec,
+            values=list(IMAGE_CODECS), state='readonly', width=6
+        )
+        self.text_codec_selector.pack(side='left', padx=(5,5))
+        self.settings_widgets.append(self.text_codec_selector)
+        ttk.Label(codec_frame, text="Photo codec:").pack(side='left', padx=(10,0))
+        self.photo_codec_selector = ttk.Combobox(
+            codec_frame, textvariable=self.photo_codec,
+            values=list(IMAGE_CODECS), state='readonly', width=6
+        )
+        self.photo_codec_selector.pack(side='left', padx=(5,5))
+        self.settings_widgets.append(self.photo_codec_selector)
+        ttk.Label(codec_frame, text="Min free space (MB):").pack(side='left', padx=(10,0))
+        self.min_free_spinbox = ttk.Spinbox(
+            codec_frame, textvariable=self.min_free_space_mb, from_=0, to=1000000,
+            increment=100, width=8
+        )
+        self.min_free_spinbox.pack(side='left', padx=(5,5))
+        self.settings_widgets.append(self.min_free_spinbox)
+
+        backpressure_frame = ttk.Frame(encoding_frame)
+        backpressure_frame.pack(fill='x', **padding)
+        ttk.Label(backpressure_frame, text="When saving lags behind:").pack(side='left')
+        self.backpressure_selector = ttk.Combobox(
+            backpressure_frame, textvariable=self.backpressure_policy,
+            values=list(BACKPRESSURE_POLICIES), state='readonly', width=12
+        )
+        self.backpressure_selector.pack(side='left', padx=(5,5))
+        self.settings_widgets.append(self.backpressure_selector)
+        ttk.Label(backpressure_frame, text="Queue size:").pack(side='left', padx=(10,0))
+        self.save_queue_spinbox = ttk.Spinbox(
+            backpressure_frame, textvariable=self.save_queue_size, from_=1, to=256,
+            increment=1, width=5
+        )
+        self.save_queue_spinbox.pack(side='left', padx=(5,5))
+        self.settings_widgets.append(self.save_queue_spinbox)
+
+        durability_frame = ttk.Frame(encoding_frame)
+        durability_frame.pack(fill='x', **padding)
+        ttk.Label(durability_frame, text="Sync to disk every").pack(side='left')
+        self.group_commit_frames_spinbox = ttk.Spinbox(
+            durability_frame, textvariable=self.group_commit_frames, from_=0, to=10000,
+            increment=1, width=6
+        )
+        self.group_commit_frames_spinbox.pack(side='left', padx=(5,5))
+        ttk.Label(durability_frame, text="frames or").pack(side='left')
+        self.group_commit_ms_spinbox = ttk.Spinbox(
+            durability_frame, textvariable=self.group_commit_ms, from_=0, to=600000,
+            increment=100, width=8
+        )
+        self.group_commit_ms_spinbox.pack(side='left', padx=(5,5))
+        ttk.Label(durability_frame, text="ms (0 = only on stop)").pack(side='left')
+        self.settings_widgets.extend([self.group_commit_frames_spinbox, self.group_commit_ms_spinbox])
+
         # --- Capture Mode ---
         capture_mode_frame = ttk.LabelFrame(self.root, text="Capture Mode")
         capture_mode_frame.pack(fill='x', padx=10, pady=5)
@@ -156,6 +2767,13 @@ class ScreenshotApp:
             command=self.on_capture_mode_change
         )
         rb_active.pack(side='left', padx=(5,5))
+        ttk.Label(capture_mode_frame, text="Multiple monitors:").pack(side='left', padx=(15,5))
+        self.multi_region_selector = ttk.Combobox(
+            capture_mode_frame, textvariable=self.multi_region_mode,
+            values=MULTI_REGION_MODES, state='readonly', width=18
+        )
+        self.multi_region_selector.pack(side='left', padx=(5,5))
+        self.settings_widgets.append(self.multi_region_selector)
 
         # Monitors selection frame
         self.monitors_frame = ttk.LabelFrame(self.root, text="Select Monitors")
@@ -234,6 +2852,8 @@ class ScreenshotApp:
 
         self.status_label = ttk.Label(status_frame, text="Status: Idle")
         self.status_label.pack(fill='x', padx=10, pady=5)
+        self.pipeline_label = ttk.Label(status_frame, text="Pipeline: idle")
+        self.pipeline_label.pack(fill='x', padx=10, pady=5)
 
         # --- Video Conversion ---
         convert_frame = ttk.LabelFrame(self.root, text="Video Conversion")
@@ -264,6 +2884,16 @@ class ScreenshotApp:
             command=self.convert_session_to_video
         )
         self.convert_button.pack(side='left', padx=(10,5))
+        self.export_range_button = ttk.Button(
+            convert_frame, text="Export Range...",
+            command=self.open_range_export
+        )
+        self.export_range_button.pack(side='left', padx=(5,5))
+        self.conversion_queue_button = ttk.Button(
+            convert_frame, text="Queue...",
+            command=self.open_conversion_queue
+        )
+        self.conversion_queue_button.pack(side='left', padx=(5,5))
 
         self.conversion_status = ttk.Label(convert_frame, text="")
         self.conversion_status.pack(side='left', padx=(10,5))
@@ -286,22 +2916,13 @@ class ScreenshotApp:
     def on_session_name_change(self, event):
         self.update_start_button_label()
 
-    def update_start_button_label(self):
-        """Changes the Start button label to 'Continue' if session folder has screenshots."""
-        session = self.session_name.get()
-        save_dir = self.save_directory.get()
-        if not session or not save_dir:
-            self.start_button.config(text="Start")
-            return
-        session_folder = os.path.join(save_dir, session)
-        if os.path.isdir(session_folder):
-            files = [f for f in os.listdir(session_folder) if f.startswith(f"{session}_")]
-            if files:
-                self.start_button.config(text="Continue")
-            else:
-                self.start_button.config(text="Start")
-        else:
-            self.start_button.config(text="Start")
+    def update_start_button_label(self, resumable=None):
+        """Changes the Start button label to 'Continue' if session folder has screenshots, or is known to."""
+        if resumable is None:
+            session = self.session_name.get()
+            save_dir = self.save_directory.get()
+            resumable = bool(session and save_dir) and scan_session_frames(os.path.join(save_dir, session), session)[1]
+        self.start_button.config(text="Continue" if resumable else "Start")
 
     def disable_settings(self):
         """Disable all setting widgets to prevent changes during capturing."""
@@ -326,8 +2947,8 @@ class ScreenshotApp:
             self.save_directory.set(directory)
             self.session_name.set("")
             self.sessions = []
-            self.load_sessions()
             self.update_session_dropdown()
+            self.load_sessions()
             self.save_settings()
 
     def initialize_logging_and_counter(self):
@@ -343,23 +2964,156 @@ class ScreenshotApp:
             self.load_counter()
 
     def load_counter(self):
-        """Finds the largest existing screenshot number and increments from there."""
-        session_folder = os.path.join(self.save_directory.get(), self.session_name.get())
+        """Resumes the screenshot counter from the session journal, scanning every frame only if there is none.
+
+        Frames written after the journal's last commit are checked, and partial ones quarantined.
+        """
+        session = self.session_name.get()
+        session_folder = os.path.join(self.save_directory.get(), session)
         os.makedirs(session_folder, exist_ok=True)
-        prefix = f"{self.session_name.get()}_"
+        journal = FrameJournal(session_folder)
         max_counter = 0
-        for filename in os.listdir(session_folder):
-            if filename.startswith(prefix):
-                parts = filename.split('_')
-                if len(parts) > 1:
-                    num_part = parts[-1].split('.')[0]
-                    try:
-                        num = int(num_part)
-                        max_counter = max(max_counter, num)
-                    except:
-                        pass
+        try:
+            committed = journal.read()
+            if committed is None:
+                with SessionFrameReader(session_folder, session) as frames:
+                    if len(frames):
+                        max_counter = frames.frame_numbers()[-1]
+                    self.frames_in_session = len(frames)
+            else:
+                max_counter, self.frames_in_session = recover_uncommitted_frames(
+                    session_folder, session, *committed, log=self.log_event
+                )
+                if list_pack_segments(session_folder, session):
+                    with PackedFrameReader(session_folder, session) as packed:
+                        uncommitted = [n for n in packed.frames if n > max_counter]
+                    if uncommitted:
+                        max_counter = uncommitted[-1]
+                        self.frames_in_session += len(uncommitted)
+            journal.commit(max_counter, self.frames_in_session)
+        except Exception as e:
+            self.log_event(f"Error reading existing frames: {e}", level="ERROR")
         self.counter = max_counter + 1
 
+    def open_frame_store(self):
+        """Sets up the session's frame store (pack container or live video) and encoders."""
+        self.close_frame_store()
+        backend = self.storage_backend.get()
+        session_folder = os.path.join(self.save_directory.get(), self.session_name.get())
+        try:
+            self.metadata_store = FrameMetadataStore(session_folder)
+        except sqlite3.Error as e:
+            self.log_event(f"Frame metadata disabled: {e}", level="ERROR")
+        if self.live_thumbnails.get():
+            thumbnail_folder = os.path.join(session_folder, THUMBNAIL_FOLDER)
+            os.makedirs(thumbnail_folder, exist_ok=True)
+            self.thumbnail_worker = ThumbnailWorker(thumbnail_folder, log=self.log_event)
+        if backend in ("pack", "delta"):
+            self.pack_writer = PackedFrameWriter(session_folder, self.session_name.get())
+            self.log_event(f"Writing frames to pack segment {self.pack_writer.segment_index:04d}.")
+        if backend == "live":
+            width, height = map(int, self.selected_resolution.get().split('x'))
+            self.live_encoder = LiveVideoEncoder(
+                session_folder, self.session_name.get(), self.selected_fps.get(), (width, height),
+                self.live_segment_minutes.get() * 60, log=self.log_event
+            )
+            self.log_event(f"Live encoding at {width}x{height}, {self.selected_fps.get()}fps, "
+                           f"{self.live_segment_minutes.get()} minute segments.")
+        self.committer = GroupCommitter(
+            session_folder, self.group_commit_frames.get(), self.group_commit_ms.get(),
+            sync_pack=self.pack_writer.sync if self.pack_writer is not None else None, log=self.log_event
+        )
+        if backend == "delta":
+            self.delta_encoder = TileDeltaEncoder(keyframe_interval=self.keyframe_interval.get())
+            self.log_event(f"Delta encoding with a keyframe every {self.delta_encoder.keyframe_interval} frames.")
+        self.encoder_controller = AdaptiveEncoder(
+            self.pillow_quality(), self.interval.get(),
+            budget_mb_per_hour=self.budget_mb_per_hour.get(),
+            allow_downscale=self.allow_downscale.get(),
+            text_codec=self.text_codec.get(), photo_codec=self.photo_codec.get()
+        )
+        for content, requested in (("text", self.text_codec.get()), ("photo", self.photo_codec.get())):
+            if self.encoder_controller.codecs[content] != requested:
+                self.log_event(f"{requested} is not supported by Pillow; using JPEG for {content} frames.", level="WARNING")
+        if self.encoder_controller.adaptive:
+            self.log_event(f"Adaptive encoding targeting {self.budget_mb_per_hour.get()} MB/hour.")
+            if "png" in self.encoder_controller.codecs.values():
+                self.log_event("PNG ignores quality: PNG frames are not budgeted, so the budget may not be met.",
+                               level="WARNING")
+        self.session_bytes = 0
+        if self.session_budget_mb.get() > 0:
+            self.session_bytes = sum(
+                os.path.getsize(os.path.join(session_folder, f)) for f in os.listdir(session_folder)
+                if f.lower().endswith(FRAME_EXTENSIONS + (PACK_EXTENSION,))
+            )
+
+    def pillow_quality(self):
+        """Maps the 1-10 JPEG quality slider to Pillow's quality scale."""
+        if self.jpeg_quality.get() == 10:
+            return 95
+        return max(1, min(95, int((self.jpeg_quality.get() / 10) * 95)))
+
+    def check_storage_limits(self, session_folder):
+        """Returns False when capture must stop for lack of disk space or session budget."""
+        min_free = self.min_free_space_mb.get() * 1024 * 1024
+        session_cap = self.session_budget_mb.get() * 1024 * 1024
+        free = shutil.disk_usage(session_folder).free
+        if min_free and free < min_free:
+            message = f"Stopped: free disk space below {self.min_free_space_mb.get()} MB."
+        elif session_cap and self.session_bytes >= session_cap:
+            message = f"Stopped: session reached its {self.session_budget_mb.get()} MB budget."
+        else:
+            low_space = (min_free and free < min_free * LOW_SPACE_FACTOR) or \
+                        (session_cap and self.session_bytes >= session_cap * 0.9)
+            if self.encoder_controller is not None and bool(low_space) != self.encoder_controller.low_space:
+                self.encoder_controller.low_space = bool(low_space)
+                if low_space:
+                    self.log_event("Approaching storage limit: encoding at minimum quality.", level="WARNING")
+            return True
+        self.queue_status(message)
+        self.log_event(message, level="WARNING")
+        self.stop_event.set()
+        self.root.after(0, self.stop_capturing)
+        return False
+
+    def close_frame_store(self):
+        """Finishes the pack container (writing its index) or the live video, and the metadata store."""
+        if self.metadata_store is not None:
+            try:
+                self.metadata_store.close()
+            except sqlite3.Error as e:
+                self.log_event(f"Error closing frame metadata: {e}", level="ERROR")
+            self.metadata_store = None
+        if self.thumbnail_worker is not None:
+            try:
+                self.thumbnail_worker.close()
+            except Exception as e:
+                self.log_event(f"Error closing thumbnail cache: {e}", level="ERROR")
+            self.thumbnail_worker = None
+        if self.committer is not None:
+            self.committer.close()
+            self.log_event(f"Group commit: {self.committer.commits} commits, {self.committer.commit_ms:.0f} ms syncing.")
+            self.committer = None
+        if self.pack_writer is not None:
+            try:
+                self.pack_writer.close()
+            except Exception as e:
+                self.log_event(f"Error closing pack container: {e}", level="ERROR")
+            self.pack_writer = None
+        if self.live_encoder is not None:
+            live_encoder, self.live_encoder = self.live_encoder, None
+            try:
+                live_encoder.close()
+                outputs = join_live_segments(live_encoder.session_folder, live_encoder.session, self.log_event)
+                for output in outputs:
+                    self.log_event(f"Live video written to {output}.")
+                if outputs:
+                    self.queue_status(f"Live video written to {', '.join(map(os.path.basename, outputs))}")
+            except Exception as e:
+                self.log_event(f"Error finishing live video: {e}", level="ERROR")
+        self.delta_encoder = None
+        self.encoder_controller = None
+
     def log_event(self, message, level="INFO"):
         """Writes a log entry to the session's log file, if logging is enabled."""
         if not self.enable_logging.get():
@@ -373,22 +3127,38 @@ class ScreenshotApp:
                 messagebox.showerror("Logging Error", f"Failed to write to log file: {e}")
 
     def populate_monitors(self):
-        """Refreshes the monitor selection checkboxes from mss."""
-        with mss.mss() as sct:
-            monitors = sct.monitors
-            self.monitors = monitors
-            for child in self.monitors_frame.winfo_children():
-                child.destroy()
-            self.monitor_vars = {}
-            for idx, monitor in enumerate(monitors[1:], start=1):
-                var = tk.BooleanVar(value=False)
-                self.monitor_vars[idx] = var
-                cb = ttk.Checkbutton(
-                    self.monitors_frame,
-                    text=f"Monitor {idx}: {monitor['width']}x{monitor['height']} @ {monitor['left']},{monitor['top']}",
-                    variable=var
-                )
-                cb.pack(anchor='w')
+        """Enumerates monitors with mss in a background thread, then refreshes the monitor checkboxes."""
+        for child in self.monitors_frame.winfo_children():
+            child.destroy()
+        ttk.Label(self.monitors_frame, text="Detecting monitors...").pack(anchor='w')
+
+        def enumerate_monitors():
+            try:
+                with mss.mss() as sct:
+                    monitors = sct.monitors
+            except Exception as e:
+                self.log_event(f"Error enumerating monitors: {e}", level="ERROR")
+                monitors = []
+            self.root.after(0, self.show_monitors, monitors)
+
+        self.monitor_thread = threading.Thread(target=enumerate_monitors, daemon=True)
+        self.monitor_thread.start()
+
+    def show_monitors(self, monitors):
+        """Replaces the monitor selection checkboxes with one per enumerated monitor."""
+        self.monitors = monitors
+        for child in self.monitors_frame.winfo_children():
+            child.destroy()
+        self.monitor_vars = {}
+        for idx, monitor in enumerate(monitors[1:], start=1):
+            var = tk.BooleanVar(value=False)
+            self.monitor_vars[idx] = var
+            cb = ttk.Checkbutton(
+                self.monitors_frame,
+                text=f"Monitor {idx}: {monitor['width']}x{monitor['height']} @ {monitor['left']},{monitor['top']}",
+                variable=var
+            )
+            cb.pack(anchor='w')
 
     def on_quality_change(self, value):
         """Update JPEG quality based on the slider."""
@@ -428,27 +3198,43 @@ class ScreenshotApp:
             self.input_status_label.pack_forget()
 
     def load_sessions(self):
-        """Loads valid sessions (those containing the marker file) from the save directory."""
-        if self.save_directory.get() and os.path.isdir(self.save_directory.get()):
-            try:
-                all_dirs = [
-                    d for d in os.listdir(self.save_directory.get()) 
-                    if os.path.isdir(os.path.join(self.save_directory.get(), d))
-                ]
-                valid_sessions = []
-                for d in all_dirs:
-                    marker_path = os.path.join(self.save_directory.get(), d, MARKER_FILENAME)
-                    if os.path.exists(marker_path):
-                        valid_sessions.append(d)
-                self.sessions = valid_sessions
-            except Exception as e:
-                self.log_event(f"Error reading session folders: {e}", level="ERROR")
-                self.sessions = []
-        else:
-            self.sessions = []
+        """Finds valid sessions (those containing the marker file) in a background thread.
+
+        The session list and dropdown are updated in the main thread when the scan finishes; results
+        of a scan overtaken by a newer one (e.g. after changing the save directory) are discarded.
+        The frames of the session the dropdown will select are counted in the scan as well.
+        """
+        save_dir = self.save_directory.get()
+        current = self.session_name.get()
+        self.session_scan += 1
+        scan = self.session_scan
+
+        def find():
+            sessions = []
+            if save_dir and os.path.isdir(save_dir):
+                try:
+                    sessions = find_sessions(save_dir)
+                except Exception as e:
+                    self.log_event(f"Error reading session folders: {e}", level="ERROR")
+            selected = current if current in sessions else (sessions[0] if sessions else "")
+            frames = (0, False)
+            if selected:
+                frames = scan_session_frames(os.path.join(save_dir, selected), selected, self.log_event)
+            self.root.after(0, show, sessions, selected, frames)
+
+        def show(sessions, selected, frames):
+            if scan == self.session_scan:
+                self.sessions = sessions
+                self.update_session_dropdown(selected, frames)
+
+        self.session_thread = threading.Thread(target=find, daemon=True)
+        self.session_thread.start()
 
-    def update_session_dropdown(self):
-        """Updates the session dropdown menu items and sets the default selection."""
+    def update_session_dropdown(self, selected=None, frames=None):
+        """Updates the session dropdown menu items and sets the default selection.
+
+        frames is the (count, resumable) pair of the selected session if the caller already scanned it.
+        """
         menu = self.session_dropdown["menu"]
         menu.delete(0, "end")
         for session in self.sessions:
@@ -458,8 +3244,11 @@ class ScreenshotApp:
                 self.session_name.set(self.sessions[0])
         else:
             self.session_name.set("")
-        self.update_start_button_label()
-        self.update_frame_count()
+        if frames is None or self.session_name.get() != selected:
+            frames = (None, None)
+        count, resumable = frames
+        self.update_start_button_label(resumable)
+        self.update_frame_count(count)
 
     def on_session_select(self, value):
         """Handles user selecting a session from the dropdown."""
@@ -468,23 +3257,59 @@ class ScreenshotApp:
         self.update_start_button_label()
         self.update_frame_count()
 
-    def start_capturing(self):
-        """Initiates the screenshot capturing process."""
+    def start_capturing(self, quiet=False):
+        """Initiates the screenshot capturing process.
+
+        Returns an error message if capture cannot start (shown in a dialog unless quiet), else None.
+        Capture may start later, once a previous capture or retention pass has finished.
+        """
+        if self.is_running or self.quitting:
+            return None
+        error = None
         if not self.save_directory.get():
-            messagebox.showwarning("Input Error", "Please select a save directory.")
-            return
-        if not os.path.isdir(self.save_directory.get()):
-            messagebox.showwarning("Input Error", "Selected save directory does not exist.")
-            return
-        try:
-            interval = self.interval.get()
-            if interval <= 0:
-                raise ValueError
-        except:
-            messagebox.showwarning("Input Error", "Interval must be a positive number.")
-            return
+            error = "Please select a save directory."
+        elif not os.path.isdir(self.save_directory.get()):
+            error = "Selected save directory does not exist."
+        else:
+            try:
+                if self.interval.get() <= 0:
+                    raise ValueError
+            except (tk.TclError, ValueError):
+                error = "Interval must be a positive number."
+        if error:
+            if not quiet:
+                messagebox.showwarning("Input Error", error)
+            return error
 
+        if self.thread is not None and self.thread.is_alive():
+            # The previous capture thread still owns the frame store; start once it has closed it.
+            self.stop_event.set()
+            self.update_status("Waiting for the previous capture to finish")
+            self.root.after(START_RETRY_MS, self.start_capturing, quiet)
+            return None
+        if self.retention_thread is not None and self.retention_thread.is_alive():
+            self.retention_stop.set()
+            self.update_status("Waiting for the retention pass to stop")
+            self.root.after(START_RETRY_MS, self.start_capturing, quiet)
+            return None
+        # A pack or unpack task would be appending to the same segments as the new writer.
+        session_folder = os.path.join(self.save_directory.get(), self.session_name.get())
+        owner = self.session_locks.acquire(session_folder, "Capture")
+        if owner is not None:
+            error = f"{owner} is still working on this session; start once it has finished."
+            if not quiet:
+                messagebox.showwarning("Busy", error)
+            return error
+        self.capture_session_folder = session_folder
         self.initialize_logging_and_counter()
+        try:
+            self.open_frame_store()
+        except Exception as e:
+            self.session_locks.release(session_folder, "Capture")
+            self.log_event(f"Error opening pack container: {e}", level="ERROR")
+            if not quiet:
+                messagebox.showerror("Storage Error", f"Failed to open pack container: {e}")
+            return f"Failed to open pack container: {e}"
         self.log_event("Starting screenshot capture.")
         self.disable_settings()
         self.start_button.config(state='disabled')
@@ -515,14 +3340,30 @@ class ScreenshotApp:
             self.stop_input_listeners()
             self.save_settings()
             self.load_sessions()
-            self.update_session_dropdown()
 
     def capture_screenshots(self):
         """Threaded function that captures screenshots at intervals, optionally using motion detection."""
+        self.capture_stats = self.new_capture_stats()
+        self.save_queue = FrameSaveQueue(self.backpressure_policy.get(), self.save_queue_size.get())
+        self.save_thread = threading.Thread(target=self.process_save_queue, daemon=True)
+        self.save_thread.start()
+        self.log_event(f"Backpressure policy: {self.save_queue.policy} (queue size {self.save_queue.maxsize}).")
+        last_stats_log = time.monotonic()
+        grabber = RegionGrabber()
+        multi_region_mode = self.multi_region_mode.get()
+        if multi_region_mode == "concurrent separate" and self.storage_backend.get() in ("delta", "live"):
+            self.log_event(
+                "Separate monitor frames alternate in size; delta and live storage work best with stitched frames.",
+                level="WARNING"
+            )
         try:
             with mss.mss() as sct:
                 current_date = datetime.now().strftime("%Y-%m-%d")
                 while not self.stop_event.is_set():
+                    tick_start = time.monotonic()
+                    diff_ratio = None
+                    trigger = "always"
+                    regions = None
                     if self.capture_mode.get() == "active_window" and win32gui:
                         hwnd = win32gui.GetForegroundWindow()
                         if hwnd == self.root.winfo_id():
@@ -534,7 +3375,8 @@ class ScreenshotApp:
                         height = bottom - top
                         region = {'left': left, 'top': top, 'width': width, 'height': height}
                     else:
-                        selected_monitors = [self.monitors[idx] for idx, var in self.monitor_vars.items() if var.get()]
+                        selected = [idx for idx, var in self.monitor_vars.items() if var.get()]
+                        selected_monitors = [self.monitors[idx] for idx in selected]
                         if not selected_monitors:
                             time.sleep(self.interval.get())
                             continue
@@ -545,10 +3387,22 @@ class ScreenshotApp:
                         width = right - left
                         height = bottom - top
                         region = {'left': left, 'top': top, 'width': width, 'height': height}
+                        if multi_region_mode != "bounding box" and len(selected_monitors) > 1:
+                            regions = selected_monitors
 
                     try:
-                        sct_img = sct.grab(region)
-                        img = Image.frombytes("RGB", sct_img.size, sct_img.rgb)
+                        captured_at = time.time()
+                        if regions is None:
+                            grab_started = time.perf_counter()
+                            sct_img = sct.grab(region)
+                            img = Image.frombytes("RGB", sct_img.size, sct_img.rgb)
+                            self.record_grab_latency({"screen": (time.perf_counter() - grab_started) * 1000})
+                            region_images = None
+                        else:
+                            grabbed = grabber.grab(regions)
+                            self.record_grab_latency({f"M{idx}": ms for idx, (_, ms) in zip(selected, grabbed)})
+                            region_images = [region_img for region_img, _ in grabbed]
+                            img = stitch_regions(region_images, regions, region)
                     except Exception as e:
                         self.queue_status(f"Error capturing screen: {e}")
                         self.log_event(f"Error capturing screen: {e}", level="ERROR")
@@ -569,6 +3423,7 @@ class ScreenshotApp:
                             with self.input_lock:
                                 if self.input_activity:
                                     movement_detected = True
+                                    trigger = "input"
                                     self.input_activity = False
                                     self.log_event("Input-based movement detected.", level="INFO")
                                     self.movement_status_label.config(text="Movement: Detected", foreground="green")
@@ -577,6 +3432,7 @@ class ScreenshotApp:
                         elif mode == "image":
                             if self.previous_image is None:
                                 movement_detected = True
+                                trigger = "initial"
                                 self.log_event("Initial image captured for movement detection.", level="INFO")
                                 self.movement_status_label.config(text="Movement: Detected", foreground="green")
                             else:
@@ -588,6 +3444,7 @@ class ScreenshotApp:
                                 threshold = self.movement_sensitivity.get() / 100.0
                                 if diff_ratio > threshold:
                                     movement_detected = True
+                                    trigger = "image"
                                     self.log_event(f"Image-based movement detected (diff_ratio={diff_ratio:.4f}).", level="INFO")
                                     self.movement_status_label.config(text="Movement: Detected", foreground="green")
                                 else:
@@ -620,53 +3477,219 @@ class ScreenshotApp:
                                     self.movement_status_label.config(text="Movement: Detected", foreground="green")
                             if image_movement or input_movement:
                                 movement_detected = True
+                                if self.previous_image is None:
+                                    trigger = "initial"
+                                else:
+                                    trigger = ("image+input" if image_movement and input_movement
+                                               else "image" if image_movement else "input")
                             else:
                                 movement_detected = False
 
+                    self.capture_stats["captured"] += 1
                     if movement_detected:
-                        self.save_screenshot(img, current_date, detection_type=mode if self.enable_motion_detection.get() else "none")
+                        detection_type = mode if self.enable_motion_detection.get() else "none"
+                        with self.input_lock:
+                            key_count, mouse_count = self.key_count, self.mouse_count
+                            self.key_count = self.mouse_count = 0
+                        window_title, window_rect = self.foreground_window_info()
+                        frame_info = {
+                            "captured_at": captured_at, "diff_ratio": diff_ratio, "trigger": trigger,
+                            "key_count": key_count, "mouse_count": mouse_count,
+                            "window_title": window_title,
+                        }
+                        if window_rect:
+                            frame_info.update(
+                                window_left=window_rect[0], window_top=window_rect[1],
+                                window_width=window_rect[2] - window_rect[0],
+                                window_height=window_rect[3] - window_rect[1]
+                            )
+                        dropped_before = self.save_queue.dropped
+                        if region_images is not None and multi_region_mode == "concurrent separate":
+                            for idx, region_img in zip(selected, region_images):
+                                self.save_queue.put((region_img, current_date, detection_type, dict(frame_info, region=idx)),
+                                                    self.stop_event)
+                        else:
+                            self.save_queue.put((img, current_date, detection_type, frame_info), self.stop_event)
+                        self.capture_stats["dropped"] = self.save_queue.dropped
+                        if self.save_queue.dropped > dropped_before:
+                            self.log_event(
+                                f"Save queue full: dropped a frame ({self.save_queue.policy}).",
+                                level="WARNING"
+                            )
                         self.queue_status("Running")
                     else:
+                        self.capture_stats["skipped"] += 1
                         self.queue_status("Paused: No movement detected.")
                         self.log_event("No movement detected. Pausing capture.", level="INFO")
 
                     if self.movement_detection_mode.get() in ["image", "combined"] and self.enable_motion_detection.get():
                         self.previous_image = img.copy()
 
-                    if self.stop_event.wait(self.interval.get()):
+                    if time.monotonic() - last_stats_log >= CAPTURE_STATS_LOG_SECONDS:
+                        last_stats_log = time.monotonic()
+                        self.log_event(f"Capture stats: {self.format_capture_stats()}")
+
+                    self.capture_stats["tick_ms"] = (time.monotonic() - tick_start) * 1000
+                    remaining = self.interval.get() - (time.monotonic() - tick_start)
+                    if remaining < 0:
+                        self.capture_stats["late"] += 1
+                        remaining = 0
+                    if self.stop_event.wait(remaining):
                         break
         except Exception as e:
             tb = traceback.format_exc()
             self.log_event(f"Fatal error in capture_screenshots: {tb}", level="FATAL")
             self.queue_status("Fatal Error: Check log for details.")
             self.stop_event.set()
+        finally:
+            grabber.close()
+            self.save_queue.close()
+            self.save_thread.join()
+            summary = self.format_capture_stats()
+            self.log_event(f"Capture stats: {summary}")
+            self.root.after(0, lambda: self.pipeline_label.config(text=f"Pipeline: {summary}"))
+            self.close_frame_store()
+            self.session_locks.release(self.capture_session_folder, "Capture")
 
-    def save_screenshot(self, img, current_date, detection_type="unknown"):
+    def new_capture_stats(self):
+        """Returns zeroed counters for the capture/save pipeline."""
+        return {"captured": 0, "skipped": 0, "saved": 0, "dropped": 0, "late": 0,
+                "bytes": 0, "queue_max": 0, "save_ms": 0.0, "grab_ms": {}, "tick_ms": 0.0,
+                "started": time.monotonic()}
+
+    def record_grab_latency(self, latencies):
+        """Updates the moving average grab time of each region (or of the single grab)."""
+        averages = self.capture_stats["grab_ms"]
+        for label, ms in latencies.items():
+            previous = averages.get(label, ms)
+            averages[label] = previous + GRAB_LATENCY_SMOOTHING * (ms - previous)
+
+    def format_capture_stats(self):
+        """One-line summary of the pipeline counters for the log and status area."""
+        stats = self.capture_stats
+        queue = self.save_queue
+        committer = self.committer
+        depth = f"{len(queue)}/{queue.maxsize}" if queue is not None else "-"
+        return (f"captured {stats['captured']}, saved {stats['saved']}, skipped {stats['skipped']}, "
+                f"dropped {stats['dropped']}, late {stats['late']}, queue {depth} (max {stats['queue_max']}), "
+                f"last save {stats['save_ms']:.0f} ms, "
+                f"grab {', '.join(f'{label} {ms:.0f}' for label, ms in list(stats['grab_ms'].items())) or '-'} ms"
+                + (f", {committer.commits} commits" if committer is not None else ""))
+
+    def process_save_queue(self):
+        """Save thread: encodes and writes queued frames until the queue is closed and drained."""
+        while True:
+            item = self.save_queue.get()
+            if item is None:
+                break
+            try:
+                img, current_date, detection_type, frame_info = item
+                if self.encoder_controller is not None:
+                    self.encoder_controller.pressure = self.save_queue.degraded
+                started = time.monotonic()
+                self.save_screenshot(img, current_date, detection_type=detection_type, frame_info=frame_info)
+                self.capture_stats["save_ms"] = (time.monotonic() - started) * 1000
+                self.capture_stats["queue_max"] = self.save_queue.max_depth
+            except Exception:
+                self.log_event(f"Error in save thread: {traceback.format_exc()}", level="ERROR")
+                self.stop_event.set()
+
+    def foreground_window_info(self):
+        """Returns (title, (left, top, right, bottom)) of the foreground window, or (None, None)."""
+        if not win32gui:
+            return None, None
+        try:
+            hwnd = win32gui.GetForegroundWindow()
+            return win32gui.GetWindowText(hwnd), win32gui.GetWindowRect(hwnd)
+        except Exception:
+            return None, None
+
+    def record_frame_metadata(self, frame_info, detection_type, **encoding):
+        """Adds a saved frame's capture and encoding details to the session's metadata store."""
+        if self.metadata_store is None:
+            return
+        try:
+            self.metadata_store.add(
+                frame=self.counter, detection=detection_type,
+                storage=self.storage_backend.get(), **(frame_info or {}), **encoding
+            )
+        except sqlite3.Error as e:
+            self.log_event(f"Error recording frame metadata: {e}", level="ERROR")
+
+    def add_live_thumbnail(self, img, frame_info):
+        """Hands the frame being saved to the thumbnail worker."""
+        if self.thumbnail_worker is not None:
+            self.thumbnail_worker.add(self.counter, img, (frame_info or {}).get("captured_at"))
+
+    def save_screenshot(self, img, current_date, detection_type="unknown", frame_info=None):
         """Saves the captured screenshot to the designated folder."""
-        counter_str = f"{self.counter:06d}"
-        extension = "jpeg"
-        filename = f"{self.session_name.get()}_{counter_str}.{extension}"
         session_folder = os.path.join(self.save_directory.get(), self.session_name.get())
-        os.makedirs(session_folder, exist_ok=True)
-        filepath = os.path.join(session_folder, filename)
-
         try:
-            self.screenshot_label.config(text=f"Saving: {filename}")
+            os.makedirs(session_folder, exist_ok=True)
+            if not self.check_storage_limits(session_folder):
+                return
             img = img.convert("RGB")
-            if self.jpeg_quality.get() == 10:
-                pillow_quality = 95
+            if self.live_encoder is not None:
+                encode_started = time.monotonic()
+                self.live_encoder.write(img)
+                self.record_frame_metadata(
+                    frame_info, detection_type, encode_ms=(time.monotonic() - encode_started) * 1000
+                )
+                self.add_live_thumbnail(img, frame_info)
+                self.committer.add(self.counter)
+                segment = live_segment_path(session_folder, self.session_name.get(), self.live_encoder.segment_index)
+                filename = f"frame {self.counter} -> {os.path.basename(segment)}"
+                self.queue_status(f"Encoded: {filename} ({detection_type.capitalize()} Detection)")
+                self.log_event(f"Encoded: {filename} ({detection_type.capitalize()} Detection)")
+                self.counter += 1
+                self.frames_in_session += 1
+                self.capture_stats["saved"] += 1
+                self.screenshot_label.config(text=f"Encoded: {filename}")
+                self.update_frame_count(self.frames_in_session)
+                return
+            img, params = self.encoder_controller.prepare(img)
+            counter_str = f"{self.counter:06d}"
+            filename = f"{self.session_name.get()}_{counter_str}.{params['codec']}"
+            filepath = os.path.join(session_folder, filename)
+            self.screenshot_label.config(text=f"Saving: {filename}")
+            encode_started = time.monotonic()
+            if self.delta_encoder is not None:
+                data, flags = self.delta_encoder.encode(img, params["quality"], params["codec"])
             else:
-                pillow_quality = max(1, min(95, int((self.jpeg_quality.get() / 10) * 95)))
-            img.save(filepath, "JPEG", quality=pillow_quality)
+                data, flags = encode_image(img, params["codec"], params["quality"]), 0
+            encode_ms = (time.monotonic() - encode_started) * 1000
+            captured_at = (frame_info or {}).get("captured_at")
+            if self.pack_writer is not None:
+                self.pack_writer.append(self.counter, data, timestamp=captured_at, flags=flags)
+                if self.delta_encoder is not None:
+                    self.delta_encoder.commit()
+                self.committer.add(self.counter, self.frames_in_session + 1)
+                kind = "delta" if flags & PACK_FLAG_DELTA else "packed"
+                filename = f"{filename} ({kind})"
+            else:
+                write_file_atomic(filepath, data, captured_at)
+                self.committer.add(self.counter, self.frames_in_session + 1, filepath)
+            self.encoder_controller.record(len(data), codec=params["codec"])
+            self.session_bytes += len(data)
+            self.capture_stats["saved"] += 1
+            self.capture_stats["bytes"] += len(data)
+            self.record_frame_metadata(
+                frame_info, detection_type, encoded_bytes=len(data), encode_ms=encode_ms,
+                codec=params["codec"], quality=params["quality"], scale=params["scale"]
+            )
+            self.add_live_thumbnail(img, frame_info)
+            encoding = (f"{params['codec']} q={params['quality']} scale={params['scale']:.2f} "
+                        f"{params['content']}, {len(data) // 1024} KB")
             self.queue_status(f"Saved: {filename} ({detection_type.capitalize()} Detection)")
-            self.log_event(f"Saved: {filename} ({detection_type.capitalize()} Detection)")
+            self.log_event(f"Saved: {filename} ({detection_type.capitalize()} Detection; {encoding})")
             self.counter += 1
-            if self.counter > 999999:
+            self.frames_in_session += 1
+            if self.pack_writer is None and self.counter > 999999:
                 self.queue_status("Error: Maximum screenshot limit reached.")
                 self.log_event("Error: Maximum screenshot limit reached.", level="ERROR")
                 self.stop_event.set()
             self.screenshot_label.config(text=f"Saved: {filename}")
-            self.update_frame_count()
+            self.update_frame_count(self.frames_in_session)
         except Exception as e:
             self.queue_status(f"Error saving screenshot: {e}")
             self.log_event(f"Error saving screenshot: {e}", level="ERROR")
@@ -680,21 +3703,235 @@ class ScreenshotApp:
         """Updates the status label with the provided message."""
         self.status_label.config(text=f"Status: {message}")
 
-    def update_frame_count(self):
-        """Updates the frame count label based on saved screenshots."""
+    def update_frame_count(self, count=None):
+        """Updates the frame count label based on saved screenshots, or a known count."""
         session = self.session_name.get()
         save_dir = self.save_directory.get()
-        count = 0
-        if session and save_dir:
-            session_folder = os.path.join(save_dir, session)
-            if os.path.isdir(session_folder):
-                prefix = f"{session}_"
-                count = sum(1 for f in os.listdir(session_folder)
-                            if f.startswith(prefix) and f.lower().endswith((".jpg", ".jpeg")))
+        if count is None:
+            count = 0
+            if session and save_dir:
+                count = scan_session_frames(os.path.join(save_dir, session), session, self.log_event)[0]
         self.frames_count_label.config(text=f"Frames in session: {count}")
 
-    def convert_session_to_video(self):
-        """Converts saved screenshots in the session to a video file using FFmpeg."""
+    def run_storage_task(self, title, task, unit="frames"):
+        """Runs a pack/unpack/thumbnail task for the selected session in a background thread."""
+        session = self.session_name.get()
+        save_dir = self.save_directory.get()
+        if not session or not save_dir or self.is_running:
+            messagebox.showwarning("Error", "Please select a valid session that is not being captured.")
+            return
+        session_folder = os.path.join(save_dir, session)
+        if not os.path.isdir(session_folder):
+            messagebox.showwarning("Error", "Session folder does not exist.")
+            return
+        if self.retention_thread is not None and self.retention_thread.is_alive():
+            messagebox.showwarning("Busy", "A retention pass is running; stop it or wait for it to finish.")
+            return
+        owner = self.session_locks.acquire(session_folder, title)
+        if owner is not None:
+            messagebox.showwarning("Busy", f"{owner} is still working on this session.")
+            return
+
+        def progress(done, total):
+            self.queue_status(f"{title}: {done}/{total} {unit}")
+
+        def run():
+            try:
+                count = task(session_folder, session, progress=progress)
+                self.log_event(f"{title}: {count} {unit} in session '{session}'.", level="INFO")
+                self.queue_status(f"{title} complete: {count} {unit}")
+            except Exception as e:
+                self.log_event(f"{title} failed for session '{session}': {e}", level="ERROR")
+                self.queue_status(f"{title} failed: {e}")
+            finally:
+                self.session_locks.release(session_folder, title)
+            self.root.after(0, self.update_frame_count)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def pack_session(self):
+        """Moves the selected session's frame files into its pack container."""
+        self.run_storage_task("Pack", pack_session_files)
+
+    def build_session_thumbnails(self):
+        """Fills the selected session's thumbnail cache with any missing frames."""
+        self.run_storage_task("Thumbnails", build_thumbnails)
+
+    def build_session_contact_sheets(self):
+        """Writes hourly contact sheets for the selected session, building missing thumbnails first."""
+        def task(session_folder, session, progress=None):
+            build_thumbnails(session_folder, session)
+            return len(build_contact_sheets(session_folder, session, progress=progress))
+        self.run_storage_task("Contact sheets", task, unit="sheets")
+
+    def unpack_session(self):
+        """Exports the selected session's packed frames as individual files."""
+        self.run_storage_task("Unpack", unpack_session_files)
+
+    def open_frame_browser(self):
+        """Opens a window for stepping through the frames of the selected session."""
+        session = self.session_name.get()
+        save_dir = self.save_directory.get()
+        session_folder = os.path.join(save_dir, session) if session and save_dir else ""
+        if not os.path.isdir(session_folder):
+            messagebox.showwarning("Error", "Please select a valid session and save directory.")
+            return
+        from PIL import ImageTk
+        frames = SessionFrameReader(session_folder, session)
+        if not len(frames):
+            frames.close()
+            messagebox.showwarning("Warning", "No frames found in the session.")
+            return
+
+        window = tk.Toplevel(self.root)
+        window.title(f"Frames: {session}")
+        image_label = ttk.Label(window)
+        image_label.pack(padx=10, pady=5)
+        info_label = ttk.Label(window, text="")
+        info_label.pack(padx=10)
+        position = tk.IntVar(value=0)
+
+        def show(value):
+            index = int(float(value))
+            frame_number = frames.frame_numbers()[index]
+            try:
+                img = frames.open_image(frame_number)
+                img.thumbnail((760, 430))
+                photo = ImageTk.PhotoImage(img)
+                image_label.config(image=photo)
+                image_label.image = photo
+                captured = datetime.fromtimestamp(frames.timestamp(frame_number)).strftime("%Y-%m-%d %H:%M:%S")
+                info_label.config(text=f"Frame {frame_number} ({index + 1}/{len(frames)}) captured {captured}")
+            except Exception as e:
+                info_label.config(text=f"Error loading frame {frame_number}: {e}")
+
+        slider = ttk.Scale(
+            window, from_=0, to=len(frames) - 1, orient='horizontal',
+            variable=position, command=show, length=600
+        )
+        slider.pack(fill='x', padx=10, pady=10)
+
+        def on_close():
+            frames.close()
+            window.destroy()
+
+        window.protocol("WM_DELETE_WINDOW", on_close)
+        show(0)
+
+    def open_retention_dialog(self):
+        """Opens the retention settings with controls to run or stop a pass."""
+        window = tk.Toplevel(self.root)
+        window.title("Retention")
+        window.resizable(False, False)
+        ttk.Label(window, text="Rules:").grid(row=0, column=0, sticky='w', padx=10, pady=5)
+        ttk.Entry(window, textvariable=self.retention_rules, width=40).grid(row=0, column=1, columnspan=2, padx=10, pady=5)
+        ttk.Label(window, text=f"e.g. \"{RETENTION_EXAMPLE_RULES}\"").grid(row=1, column=1, columnspan=2, sticky='w', padx=10)
+        limits = [
+            ("Max frames/second:", self.retention_frames_per_second, 1000),
+            ("Max MB/second:", self.retention_mb_per_second, 1000),
+            ("Pause above app CPU (% of a core):", self.retention_max_cpu, 100),
+        ]
+        for row, (label, var, maximum) in enumerate(limits, start=2):
+            ttk.Label(window, text=label).grid(row=row, column=0, sticky='w', padx=10, pady=5)
+            ttk.Spinbox(window, textvariable=var, from_=0, to=maximum, increment=1, width=8).grid(
+                row=row, column=1, sticky='w', padx=10, pady=5
+            )
+        ttk.Checkbutton(
+            window, text=f"Run every {RETENTION_PERIOD_SECONDS // 60} minutes in the background",
+            variable=self.retention_background
+        ).grid(row=5, column=0, columnspan=3, sticky='w', padx=10, pady=5)
+        ttk.Button(window, text="Run Now", command=self.run_retention).grid(row=6, column=1, pady=10)
+        ttk.Button(window, text="Stop", command=self.retention_stop.set).grid(row=6, column=2, pady=10)
+
+    def run_retention(self, quiet=False):
+        """Runs one throttled retention pass over every session in a background thread."""
+        if self.retention_thread is not None and self.retention_thread.is_alive():
+            return
+        save_dir = self.save_directory.get()
+        try:
+            policies = parse_retention_policies(self.retention_rules.get())
+        except ValueError as e:
+            if not quiet:
+                messagebox.showwarning("Input Error", str(e))
+            self.log_event(f"Retention not run: {e}", level="ERROR")
+            return
+        if not policies or not save_dir or not os.path.isdir(save_dir):
+            if not quiet:
+                messagebox.showwarning("Input Error", "Please enter retention rules and select a save directory.")
+            return
+        self.save_settings()
+        self.retention_stop.clear()
+        throttle = RetentionThrottle(
+            self.retention_frames_per_second.get(), self.retention_mb_per_second.get(),
+            self.retention_max_cpu.get(), self.retention_stop, busy=lambda: self.is_running
+        )
+        engine = RetentionEngine(save_dir, policies, throttle, log=self.log_event, locks=self.session_locks)
+        sessions = list(self.sessions)
+
+        def is_active(session):
+            return self.is_running and session == self.session_name.get()
+
+        def run():
+            self.log_event(f"Retention pass started: {'; '.join(map(format_retention_policy, policies))}.")
+            dropped, reencoded = engine.run(sessions, is_active=is_active)
+            stopped = " (stopped)" if self.retention_stop.is_set() else ""
+            self.log_event(f"Retention pass finished{stopped}: dropped {dropped}, re-encoded {reencoded} frames.")
+            if not self.is_running:
+                self.queue_status(f"Retention{stopped}: dropped {dropped}, re-encoded {reencoded} frames")
+                self.root.after(0, self.update_frame_count)
+
+        self.retention_thread = threading.Thread(target=run, daemon=True)
+        self.retention_thread.start()
+
+    def schedule_retention(self):
+        """Runs a background retention pass if enabled, then reschedules itself."""
+        if self.retention_background.get() and self.retention_rules.get().strip():
+            self.run_retention(quiet=True)
+        self.root.after(RETENTION_PERIOD_SECONDS * 1000, self.schedule_retention)
+
+    def open_range_export(self):
+        """Opens a dialog for exporting a frame range, time range or filtered frames to video."""
+        window = tk.Toplevel(self.root)
+        window.title("Export Range")
+        window.resizable(False, False)
+        fields = [
+            ("First frame:", tk.StringVar()),
+            ("Last frame:", tk.StringVar()),
+            ("From time (HH:MM or YYYY-MM-DD HH:MM):", tk.StringVar()),
+            ("To time:", tk.StringVar()),
+            ("Min difference (%):", tk.StringVar()),
+        ]
+        for row, (label, var) in enumerate(fields):
+            ttk.Label(window, text=label).grid(row=row, column=0, sticky='w', padx=10, pady=5)
+            ttk.Entry(window, textvariable=var, width=20).grid(row=row, column=1, padx=10, pady=5)
+        input_only = tk.BooleanVar(value=False)
+        ttk.Checkbutton(window, text="Only input-triggered frames", variable=input_only).grid(
+            row=len(fields), column=0, columnspan=2, sticky='w', padx=10, pady=5
+        )
+
+        def export():
+            first, last, start, end, min_diff = (var.get().strip() for _, var in fields)
+            try:
+                selection = {
+                    "first_frame": int(first) if first else None,
+                    "last_frame": int(last) if last else None,
+                    "start": start or None,
+                    "end": end or None,
+                    "min_diff": float(min_diff) / 100.0 if min_diff else None,
+                    "triggers": INPUT_TRIGGERS if input_only.get() else None,
+                }
+            except ValueError:
+                messagebox.showwarning("Input Error", "Frame numbers and difference must be numbers.", parent=window)
+                return
+            window.destroy()
+            self.convert_session_to_video(selection)
+
+        ttk.Button(window, text="Export", command=export).grid(
+            row=len(fields) + 1, column=0, columnspan=2, pady=10
+        )
+
+    def convert_session_to_video(self, selection=None):
+        """Queues a conversion of the session's saved screenshots (or a selection of them) to a video file."""
         session = self.session_name.get()
         save_dir = self.save_directory.get()
         if not session or not save_dir:
@@ -706,112 +3943,143 @@ class ScreenshotApp:
             messagebox.showwarning("Error", "Session folder does not exist.")
             return
 
-        fps = self.selected_fps.get()
+        with SessionFrameReader(session_folder, session) as frames:
+            if not len(frames):
+                messagebox.showwarning("Warning", "No screenshot images found in the session folder.")
+                return
+            try:
+                frame_numbers = select_conversion_frames(frames, session_folder, selection)
+            except (ValueError, sqlite3.Error) as e:
+                messagebox.showwarning("Input Error", str(e))
+                return
+            if not frame_numbers:
+                messagebox.showwarning("Warning", "No frames match the selected range.")
+                return
+            if selection:
+                self.log_event(f"Selected {len(frame_numbers)} of {len(frames)} frames for export.", level="INFO")
+
         output_file = filedialog.asksaveasfilename(
             defaultextension=".mp4",
             initialdir=save_dir,
+            initialfile=f"{session}.mp4",
             title="Save video as",
             filetypes=[("MP4 files", "*.mp4"), ("All files", "*.*")]
         )
         if not output_file:
             return
+        self.queue_conversion(session_folder, session, output_file, selection)
 
-        resolution = self.selected_resolution.get()
-        target_width, target_height = map(int, resolution.split('x'))
-
-        processed_dir = os.path.join(session_folder, "_processed_video")
-        os.makedirs(processed_dir, exist_ok=True)
-
-        files = sorted(
-            f for f in os.listdir(session_folder)
-            if f.lower().endswith((".jpg",".jpeg")) and f.startswith(f"{session}_")
+    def queue_conversion(self, session_folder, session, output_file, selection=None, priority=0):
+        """Adds a conversion job at the current FPS and resolution settings."""
+        job = ConversionJob(
+            session_folder, session, output_file, self.selected_fps.get(), self.selected_resolution.get(),
+            selection=selection, priority=priority
         )
+        self.conversion_scheduler.submit(job)
+        return job
 
-        if not files:
-            messagebox.showwarning("Warning", "No screenshot images found in the session folder.")
+    def open_conversion_queue(self):
+        """Opens the conversion queue: add sessions, reprioritize, cancel, resume and remove jobs."""
+        if self.conversion_window is not None and self.conversion_window.winfo_exists():
+            self.conversion_window.lift()
             return
+        window = tk.Toplevel(self.root)
+        window.title("Conversion Queue")
+        self.conversion_window = window
 
-        self.log_event(f"Found {len(files)} screenshots to process.", level="INFO")
+        columns = ("id", "session", "range", "priority", "state", "progress")
+        widths = (40, 140, 180, 60, 80, 160)
+        tree = ttk.Treeview(window, columns=columns, show='headings', height=12)
+        for column, width in zip(columns, widths):
+            tree.heading(column, text=column.capitalize())
+            tree.column(column, width=width, anchor='w')
+        tree.pack(fill='both', expand=True, padx=10, pady=5)
+        self.conversion_tree = tree
 
-        for i, filename in enumerate(files, start=1):
-            filepath = os.path.join(session_folder, filename)
-            self.log_event(f"Processing file: {filename}", level="INFO")
-            try:
-                img = Image.open(filepath)
-                aspect_ratio = img.width / img.height
-                target_ratio = target_width / target_height
-                if aspect_ratio > target_ratio:
-                    new_width = target_width
-                    new_height = int(target_width / aspect_ratio)
-                else:
-                    new_height = target_height
-                    new_width = int(target_height * aspect_ratio)
-                img_resized = img.resize((new_width, new_height), resample=Image.LANCZOS)
-
-                new_img = Image.new("RGB", (target_width, target_height), (0,0,0))
-                x_offset = (target_width - new_width) // 2
-                y_offset = (target_height - new_height) // 2
-                new_img.paste(img_resized, (x_offset, y_offset))
-
-                new_filename = f"{session}_{i:06d}.jpeg"
-                new_filepath = os.path.join(processed_dir, new_filename)
-                new_img.save(new_filepath, "JPEG", quality=95)
-            except Exception as e:
-                self.log_event(f"Error processing {filename}: {e}", level="ERROR")
+        add_frame = ttk.Frame(window)
+        add_frame.pack(fill='x', padx=10, pady=5)
+        ttk.Label(add_frame, text="Sessions:").pack(side='left')
+        session_list = tk.Listbox(add_frame, selectmode='extended', height=4, exportselection=False)
+        for session in self.sessions:
+            session_list.insert('end', session)
+        session_list.pack(side='left', padx=(5,5))
+        ttk.Label(add_frame, text="Priority:").pack(side='left')
+        priority = tk.IntVar(value=0)
+        ttk.Spinbox(add_frame, from_=-10, to=10, increment=1, textvariable=priority, width=4).pack(side='left', padx=(5,5))
 
-        processed_files = os.listdir(processed_dir)
-        self.log_event(f"Processed {len(processed_files)} images for video conversion.", level="INFO")
+        def add_sessions():
+            save_dir = self.save_directory.get()
+            for index in session_list.curselection():
+                session = session_list.get(index)
+                output_file = self.conversion_scheduler.output_path(os.path.join(save_dir, f"{session}.mp4"))
+                self.queue_conversion(os.path.join(save_dir, session), session, output_file, priority=priority.get())
 
-        input_pattern = os.path.join(processed_dir, f"{session}_%06d.jpeg")
-        cmd = [
-            "ffmpeg", "-y",
-            "-framerate", str(fps),
-            "-i", input_pattern,
-            "-c:v", "libx264",
-            "-pix_fmt", "yuv420p",
-            "-progress", "pipe:1",
-            output_file
-        ]
+        ttk.Button(add_frame, text="Add Selected", command=add_sessions).pack(side='left', padx=(5,5))
+        ttk.Label(add_frame, text="Run at once:").pack(side='left', padx=(10,0))
+        ttk.Spinbox(
+            add_frame, from_=1, to=os.cpu_count() or 1, increment=1,
+            textvariable=self.conversion_max_concurrent, width=4
+        ).pack(side='left', padx=(5,5))
 
-        self.conversion_status.config(text="Starting conversion...")
+        def selected_jobs():
+            return [int(item) for item in tree.selection()]
 
-        def run_conversion():
-            try:
-                import subprocess
-                total_frames = len([
-                    f for f in os.listdir(processed_dir)
-                    if f.startswith(f"{session}_") and f.lower().endswith((".jpg",".jpeg"))
-                ])
-                self.log_event(f"Starting FFmpeg conversion with {total_frames} frames.", level="INFO")
-                self.log_event(f"Executing command: {' '.join(cmd)}", level="INFO")
-                process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
-                while True:
-                    line = process.stdout.readline()
-                    if not line:
-                        break
-                    if line.startswith("frame="):
-                        try:
-                            frame_num = int(line.split("=")[1].strip())
-                            percent = (frame_num / total_frames) * 100 if total_frames > 0 else 0
-                            self.root.after(0, lambda p=percent: self.conversion_status.config(text=f"{p:.2f}% of Conversion Done"))
-                        except:
-                            pass
-                    if "progress=end" in line:
-                        break
-                process.wait()
-                if process.returncode != 0:
-                    error_output = process.stdout.read()
-                    self.log_event(f"FFmpeg failed with return code {process.returncode}. Output: {error_output}", level="ERROR")
-                    self.root.after(0, lambda: messagebox.showerror("Error", "FFmpeg conversion failed."))
-                else:
-                    self.root.after(0, lambda: messagebox.showinfo("Success", f"Video file created at {output_file}"))
-                    self.log_event(f"Converted session '{session}' to video file {output_file} at {fps}fps.", level="INFO")
-                    self.root.after(0, lambda: self.conversion_status.config(text="Conversion Completed: 100%"))
-            except Exception as e:
-                self.root.after(0, lambda: messagebox.showerror("Error", f"Failed to convert video: {e}"))
-                self.log_event(f"Error converting session '{session}' to video file: {e}", level="ERROR")
+        def each_selected(action):
+            return lambda: [action(job_id) for job_id in selected_jobs()]
+
+        def shift_priority(delta):
+            def shift(job_id):
+                job = self.conversion_scheduler.jobs.get(job_id)
+                if job is not None:
+                    self.conversion_scheduler.set_priority(job_id, job.priority + delta)
+            return each_selected(shift)
+
+        def clear_finished():
+            for job in self.conversion_scheduler.sorted_jobs():
+                if job.state == "done":
+                    self.conversion_scheduler.remove(job.job_id)
+
+        action_frame = ttk.Frame(window)
+        action_frame.pack(fill='x', padx=10, pady=5)
+        actions = [
+            ("Raise", shift_priority(1)),
+            ("Lower", shift_priority(-1)),
+            ("Cancel", each_selected(self.conversion_scheduler.cancel)),
+            ("Resume", each_selected(self.conversion_scheduler.resume)),
+            ("Remove", each_selected(self.conversion_scheduler.remove)),
+            ("Clear Finished", clear_finished),
+        ]
+        for text, command in actions:
+            ttk.Button(action_frame, text=text, command=command).pack(side='left', padx=(0,5))
+        self.refresh_conversion_queue()
+
+    def on_conversion_limit_change(self):
+        """Applies a new concurrency limit to the conversion queue."""
+        try:
+            self.conversion_scheduler.set_max_concurrent(self.conversion_max_concurrent.get())
+        except tk.TclError:
+            pass
 
-        threading.Thread(target=run_conversion, daemon=True).start()
+    def refresh_conversion_queue(self):
+        """Updates the conversion status label and, if open, the queue window's job list."""
+        counts = self.conversion_scheduler.counts()
+        running = [job for job in self.conversion_scheduler.sorted_jobs() if job.state == "running"]
+        if running or counts["queued"]:
+            progress = ", ".join(f"{job.session}: {job.describe_progress()}" for job in running)
+            self.conversion_status.config(text=f"{len(running)} converting, {counts['queued']} queued. {progress}")
+        elif counts["done"] or counts["failed"]:
+            self.conversion_status.config(text=f"Conversions: {counts['done']} done, {counts['failed']} failed")
+        if self.conversion_window is None or not self.conversion_window.winfo_exists():
+            return
+        tree = self.conversion_tree
+        selection = tree.selection()
+        tree.delete(*tree.get_children())
+        for job in self.conversion_scheduler.sorted_jobs():
+            tree.insert('', 'end', iid=str(job.job_id), values=(
+                job.job_id, job.session, describe_selection(job.selection), job.priority, job.state,
+                job.describe_progress()
+            ))
+        tree.selection_set([item for item in selection if tree.exists(item)])
 
     def save_settings(self):
         """Saves the current settings to a JSON file."""
@@ -823,7 +4091,30 @@ class ScreenshotApp:
             "detect_keyboard": self.detect_keyboard.get(),
             "movement_sensitivity": self.movement_sensitivity.get(),
             "enable_motion_detection": self.enable_motion_detection.get(),
-            "enable_logging": self.enable_logging.get()
+            "enable_logging": self.enable_logging.get(),
+            "storage_backend": self.storage_backend.get(),
+            "keyframe_interval": self.keyframe_interval.get(),
+            "live_segment_minutes": self.live_segment_minutes.get(),
+            "budget_mb_per_hour": self.budget_mb_per_hour.get(),
+            "session_budget_mb": self.session_budget_mb.get(),
+            "allow_downscale": self.allow_downscale.get(),
+            "text_codec": self.text_codec.get(),
+            "photo_codec": self.photo_codec.get(),
+            "min_free_space_mb": self.min_free_space_mb.get(),
+            "backpressure_policy": self.backpressure_policy.get(),
+            "save_queue_size": self.save_queue_size.get(),
+            "live_thumbnails": self.live_thumbnails.get(),
+            "retention_rules": self.retention_rules.get(),
+            "retention_background": self.retention_background.get(),
+            "retention_frames_per_second": self.retention_frames_per_second.get(),
+            "retention_mb_per_second": self.retention_mb_per_second.get(),
+            "retention_max_cpu": self.retention_max_cpu.get(),
+            "conversion_max_concurrent": self.conversion_max_concurrent.get(),
+            "multi_region_mode": self.multi_region_mode.get(),
+            "group_commit_frames": self.group_commit_frames.get(),
+            "group_commit_ms": self.group_commit_ms.get(),
+            "control_enabled": self.control_enabled.get(),
+            "control_address": self.control_address.get()
         }
         try:
             with open(self.settings_file, 'w') as f:
@@ -846,11 +4137,34 @@ class ScreenshotApp:
                 self.movement_sensitivity.set(settings.get("movement_sensitivity", 2))
                 self.enable_motion_detection.set(settings.get("enable_motion_detection", True))
                 self.enable_logging.set(settings.get("enable_logging", True))
+                self.storage_backend.set(settings.get("storage_backend", "files"))
+                self.keyframe_interval.set(settings.get("keyframe_interval", DELTA_KEYFRAME_INTERVAL))
+                self.live_segment_minutes.set(settings.get("live_segment_minutes", LIVE_SEGMENT_MINUTES))
+                self.budget_mb_per_hour.set(settings.get("budget_mb_per_hour", 0.0))
+                self.session_budget_mb.set(settings.get("session_budget_mb", 0))
+                self.allow_downscale.set(settings.get("allow_downscale", False))
+                self.text_codec.set(settings.get("text_codec", "jpeg"))
+                self.photo_codec.set(settings.get("photo_codec", "jpeg"))
+                self.min_free_space_mb.set(settings.get("min_free_space_mb", 500))
+                self.backpressure_policy.set(settings.get("backpressure_policy", "block"))
+                self.save_queue_size.set(settings.get("save_queue_size", SAVE_QUEUE_SIZE))
+                self.live_thumbnails.set(settings.get("live_thumbnails", True))
+                self.retention_rules.set(settings.get("retention_rules", ""))
+                self.retention_background.set(settings.get("retention_background", False))
+                self.retention_frames_per_second.set(settings.get("retention_frames_per_second", RETENTION_FRAMES_PER_SECOND))
+                self.retention_mb_per_second.set(settings.get("retention_mb_per_second", RETENTION_MB_PER_SECOND))
+                self.retention_max_cpu.set(settings.get("retention_max_cpu", RETENTION_MAX_CPU_PERCENT))
+                self.conversion_max_concurrent.set(settings.get("conversion_max_concurrent", CONVERSION_MAX_CONCURRENT))
+                self.multi_region_mode.set(settings.get("multi_region_mode", MULTI_REGION_MODES[0]))
+                self.group_commit_frames.set(settings.get("group_commit_frames", GROUP_COMMIT_FRAMES))
+                self.group_commit_ms.set(settings.get("group_commit_ms", GROUP_COMMIT_MS))
+                self.control_enabled.set(settings.get("control_enabled", False))
+                self.control_address.set(settings.get("control_address", CONTROL_DEFAULT_ADDRESS))
                 self.session_name.set("")
                 self.on_mode_change()
                 self.on_detection_toggle()
-                self.load_sessions()
                 self.update_session_dropdown()
+                self.load_sessions()
                 self.log_event("Settings loaded.")
             except Exception as e:
                 tb = traceback.format_exc()
@@ -897,6 +4211,7 @@ class ScreenshotApp:
         try:
             with self.input_lock:
                 self.input_activity = True
+                self.key_count += 1
             self.log_event(f"Keyboard activity detected: {key}", level="INFO")
             self.movement_status_label.config(text="Movement: Detected", foreground="green")
         except Exception as e:
@@ -911,6 +4226,7 @@ class ScreenshotApp:
                     self.mouse_pressed = True
                     with self.input_lock:
                         self.input_activity = True
+                        self.mouse_count += 1
                     self.log_event(f"Mouse button {event.button} pressed at ({event.x}, {event.y})", level="INFO")
                     self.movement_status_label.config(text="Movement: Detected", foreground="green")
             elif hasattr(event, 'event_type') and event.event_type == 'up':
@@ -929,6 +4245,7 @@ class ScreenshotApp:
             return
         cpu_percent = psutil.cpu_percent(interval=None)
         self.update_cpu_bar(cpu_percent)
+        self.pipeline_label.config(text=f"Pipeline: {self.format_capture_stats()}")
         self.root.after(1000, self.monitor_cpu)
 
     def update_cpu_bar(self, cpu_percent):
@@ -944,19 +4261,221 @@ class ScreenshotApp:
         if current_style != style:
             self.cpu_progress.config(style=style)
 
+    def toggle_control_server(self):
+        """Starts or stops the local control server to match the Enable checkbox."""
+        if self.control_server is not None:
+            self.control_server.close()
+            self.control_server = None
+            self.log_event("Control server stopped.")
+        if not self.control_enabled.get():
+            self.save_settings()
+            return
+        address = self.control_address.get().strip()
+        try:
+            self.control_server = ControlServer(address, self.control_commands(), log=self.log_event)
+        except (OSError, ValueError) as e:
+            self.control_enabled.set(False)
+            self.log_event(f"Could not start control server on {address}: {e}", level="ERROR")
+            messagebox.showerror("Control Server", f"Could not start control server on {address}:\n{e}")
+            return
+        self.log_event(f"Control server listening on {address}.")
+        self.save_settings()
+
+    def control_commands(self):
+        """Handlers for the control server, by command name."""
+        return {
+            "status": self.control_status,
+            "stats": self.control_stats,
+            "start": self.control_start,
+            "stop": self.control_stop,
+            "session": self.control_session,
+            "set": self.control_set,
+        }
+
+    def call_in_main_thread(self, func, *args):
+        """Runs func in the Tk main thread and returns its result (or raises its exception)."""
+        result = queue.Queue(maxsize=1)
+
+        def run():
+            try:
+                result.put((True, func(*args)))
+            except Exception as e:
+                result.put((False, e))
+
+        self.root.after(0, run)
+        try:
+            ok, value = result.get(timeout=CONTROL_CALL_TIMEOUT)
+        except queue.Empty:
+            raise TimeoutError("The application did not respond in time.")
+        if not ok:
+            raise value
+        return value
+
+    def control_status(self, request):
+        return {
+            "ok": True, "running": self.is_running, "session": self.session_name.get(),
+            "save_directory": self.save_directory.get(), "sessions": list(self.sessions),
+            "interval": self.interval.get(), "sensitivity": self.movement_sensitivity.get(),
+            "detection": self.movement_detection_mode.get() if self.enable_motion_detection.get() else "none",
+            "storage": self.storage_backend.get(),
+        }
+
+    def control_stats(self, request):
+        """Pipeline counters and stage latencies; reads what the capture loop already records."""
+        stats = dict(self.capture_stats)
+        elapsed = time.monotonic() - stats["started"]
+        save_queue = self.save_queue
+        return {
+            "ok": True, "time": time.time(), "running": self.is_running, "session": self.session_name.get(),
+            "captured": stats["captured"], "saved": stats["saved"], "skipped": stats["skipped"],
+            "dropped": stats["dropped"], "late": stats["late"], "bytes": stats["bytes"],
+            "fps": stats["saved"] / elapsed if self.is_running and elapsed > 0 else 0.0,
+            "queue": len(save_queue) if save_queue is not None else 0, "queue_max": stats["queue_max"],
+            "latency_ms": {"grab": dict(stats["grab_ms"]), "tick": stats["tick_ms"], "save": stats["save_ms"]},
+        }
+
+    def control_start(self, request):
+        """Starts capture without dialogs; "pending" means it starts once earlier work has stopped."""
+        if not self.session_name.get():
+            return {"ok": False, "error": "No session is selected; send a 'session' command first."}
+        if not self.is_running:
+            error = self.call_in_main_thread(self.start_capturing, True)
+            if error:
+                return {"ok": False, "error": error}
+        return {"ok": True, "running": self.is_running, "pending": not self.is_running,
+                "session": self.session_name.get()}
+
+    def control_stop(self, request):
+        self.call_in_main_thread(self.stop_capturing)
+        return {"ok": True, "running": self.is_running}
+
+    def control_session(self, request):
+        """Selects an existing session or names a new one, created when capture starts."""
+        name = str(request.get("name", "")).strip()
+        if not name or name in (".", "..") or any(sep in name for sep in ("/", "\\")):
+            return {"ok": False, "error": "A session 'name' without path separators is required."}
+        if self.is_running:
+            return {"ok": False, "error": "Stop capture before switching sessions."}
+        self.call_in_main_thread(self.on_session_select, name)
+        return {"ok": True, "session": name, "exists": name in self.sessions}
+
+    def control_set(self, request):
+        """Changes the interval and/or movement sensitivity; both apply to a running capture on the next tick."""
+        changes = {}
+        if "interval" in request:
+            interval = float(request["interval"])
+            if interval <= 0:
+                return {"ok": False, "error": "interval must be a positive number of seconds."}
+            changes["interval"] = interval
+        if "sensitivity" in request:
+            sensitivity = int(request["sensitivity"])
+            if not 1 <= sensitivity <= 100:
+                return {"ok": False, "error": "sensitivity must be between 1 and 100."}
+            changes["sensitivity"] = sensitivity
+        if not changes:
+            return {"ok": False, "error": "Nothing to set; use interval and/or sensitivity."}
+
+        def apply():
+            if "interval" in changes:
+                self.interval.set(changes["interval"])
+                self.log_event(f"Interval set to {changes['interval']}s via control server.")
+            if "sensitivity" in changes:
+                self.on_sensitivity_change(changes["sensitivity"])
+
+        self.call_in_main_thread(apply)
+        return {"ok": True, **changes}
+
     def on_close(self):
         """Handles the application closing event."""
+        if self.quitting:
+            return
         if self.is_running:
-            if messagebox.askokcancel("Quit", "Screenshot capture is running. Do you want to quit?"):
-                self.stop_capturing()
-                self.save_settings()
-                self.root.destroy()
-        else:
-            self.save_settings()
-            self.root.destroy()
+            if not messagebox.askokcancel("Quit", "Screenshot capture is running. Do you want to quit?"):
+                return
+            self.stop_capturing()
+        self.quitting = True
+        self.retention_stop.set()
+        self.conversion_scheduler.shutdown()
+        if self.control_server is not None:
+            self.control_server.close()
+        self.save_settings()
+        self.destroy_when_idle(time.monotonic() + QUIT_WAIT_SECONDS)
+
+    def destroy_when_idle(self, deadline):
+        """Destroys the window once the capture thread has saved its queue and closed the frame store.
+
+        Polls with root.after rather than joining, since the finishing threads still post status updates.
+        """
+        busy = [thread for thread in (self.thread, self.retention_thread) if thread is not None and thread.is_alive()]
+        if busy and time.monotonic() < deadline:
+            self.update_status("Finishing queued frames before quitting")
+            self.root.after(START_RETRY_MS, self.destroy_when_idle, deadline)
+            return
+        if busy:
+            self.log_event("Quit before the capture pipeline finished; recent frames may be lost.", level="WARNING")
+        self.root.destroy()
+
+def measure_startup(import_started):
+    """Builds the application window and prints how long import, first paint and background loading took."""
+    imported = time.perf_counter()
+    root = tk.Tk()
+    app = ScreenshotApp(root)
+    root.update()
+    shown = time.perf_counter()
+    # Without saved settings there is no save directory, so no session scan is started.
+    while any(thread is not None and thread.is_alive() for thread in (app.session_thread, app.monitor_thread)):
+        root.update()
+        time.sleep(0.005)
+    root.update()
+    ready = time.perf_counter()
+    app.retention_stop.set()
+    root.destroy()
+    print(json.dumps({"import": imported - import_started, "window": shown - imported, "ready": ready - imported}))
+
+def benchmark_startup(runs=5):
+    """Measures startup in fresh interpreters and compares the medians against the startup budgets.
+
+    Returns a non-zero exit status if import or window time is over budget, so it can guard against
+    regressions (run with --benchmark-startup).
+    """
+    module_dir, module_file = os.path.split(os.path.abspath(__file__))
+    module = os.path.splitext(module_file)[0]
+    probe = (
+        f"import sys, time; sys.path.insert(0, {module_dir!r}); started = time.perf_counter(); "
+        f"import {module}; {module}.measure_startup(started)"
+    )
+    samples = collections.defaultdict(list)
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True)
+        for key, value in json.loads(result.stdout.strip().splitlines()[-1]).items():
+            samples[key].append(value)
+    medians = {key: statistics.median(values) for key, values in samples.items()}
+    budgets = {"import": STARTUP_IMPORT_BUDGET_SECONDS, "window": STARTUP_WINDOW_BUDGET_SECONDS}
+    over_budget = False
+    for key in ("import", "window", "ready"):
+        budget = budgets.get(key)
+        verdict = ""
+        if budget is not None:
+            verdict = f" (budget {budget * 1000:.0f} ms{', OVER' if medians[key] > budget else ''})"
+            over_budget |= medians[key] > budget
+        print(f"{key:>6}: median {medians[key] * 1000:.1f} ms over {runs} runs{verdict}")
+    return 1 if over_budget else 0
 
 def main():
     """Main function to start the application."""
+    parser = argparse.ArgumentParser(description="zmxTOOL Screen(shot) Recorder")
+    parser.add_argument("--benchmark-startup", action="store_true",
+                        help="measure import and window startup time against the startup budgets")
+    parser.add_argument("--control", nargs="+", metavar="ARG",
+                        help="send a command to a running recorder's control server, e.g. "
+                             "--control set interval=2, and print the replies")
+    parser.add_argument("--control-address", default=None,
+                        help=f"control server socket path or host:port (default: {CONTROL_DEFAULT_ADDRESS})")
+    args = parser.parse_args()
+    if args.benchmark_startup:
+        sys.exit(benchmark_startup())
+    if args.control:
+        sys.exit(run_control_client(args.control, args.control_address))
     try:
         root = tk.Tk()
         app = ScreenshotApp(root)